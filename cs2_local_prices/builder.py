@@ -6,7 +6,9 @@ import logging
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Optional, Set, Tuple
+from typing import Iterable, List, Mapping, Optional, Set, Tuple
+
+from tradeup.registry import WEAR_INDEX, ItemRegistry
 
 from .cache import JSONCache, PriceCache, SQLiteCache
 from .catalog import read_catalog
@@ -14,40 +16,125 @@ from .config import AppConfig
 from .csfloat_client import CSFloatClient
 from .logging_setup import get_logger
 from .metrics import Metrics
-from .mhn import build_mhn, dedupe_sorted, parse_mhn
+from .mhn import dedupe_sorted, normalize_name, parse_mhn
 from .models import PriceRecordA, PriceRecordB, SchemaOption, StatTrakMode
 from .state import StateStore
 from .wears import valid_wears_for_range
-from .writer import CSVWriter
+from .writer import CSVWriter, PriceJournal
 
 logger = get_logger(__name__)
 
 
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    raw = headers.get(name)
+    if raw is None:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
 class TokenBucket:
-    """Enforce a minimum interval between requests across workers.
+    """Token bucket whose rate is tuned by AIMD (additive increase, multiplicative decrease).
 
-    This simple rate limiter ensures at least `interval` seconds elapse between
-    successive acquisitions, regardless of concurrency.
+    - `acquire()` waits for a token (`burst` tokens max) and for any global pause.
+    - Each successful response raises the rate so it grows by about `increase_qps` per
+      second of clean traffic, up to `max_rate`.
+    - A 429 or 5xx multiplies the rate by `decrease` (at most once per cooldown, so a
+      burst of errors from concurrent workers counts once), down to `min_rate`.
+    - `pause()` stops every worker until a deadline (Retry-After, or an exhausted
+      X-RateLimit-Remaining until X-RateLimit-Reset).
+
+    With `max_rate == rate` the rate never rises above the starting one.
     """
 
-    def __init__(self, interval_seconds: float) -> None:
-        self.interval = interval_seconds
+    def __init__(
+        self,
+        rate: float,
+        burst: float = 1.0,
+        max_rate: Optional[float] = None,
+        min_rate: float = 1.0 / 60.0,
+        increase_qps: float = 0.01,
+        decrease: float = 0.5,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.rate = rate
+        self.max_rate = max(rate, max_rate if max_rate is not None else rate)
+        self.min_rate = min(min_rate, rate)
+        self.burst = max(1.0, burst)
+        self.increase_qps = increase_qps
+        self.decrease = decrease
+        self.metrics = metrics
         self._lock = asyncio.Lock()
-        self._last = 0.0
+        self._tokens = self.burst
+        self._last = time.time()
+        self._paused_until = 0.0
+        self._last_cut = 0.0
+        self._publish()
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate
+
+    def _publish(self) -> None:
+        if self.metrics is not None:
+            self.metrics.rate_qps = self.rate
+
+    def _refill(self, now: float) -> None:
+        start = max(self._last, self._paused_until)
+        if now > start:
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._last = now
 
     async def acquire(self) -> None:
         async with self._lock:
-            now = time.time()
-            # If first use, allow immediately and set last
-            if self._last == 0.0:
-                self._last = now
-                return
-            elapsed = now - self._last
-            if elapsed < self.interval:
-                await asyncio.sleep(self.interval - elapsed)
-                self._last = time.time()
-            else:
-                self._last = now
+            while True:
+                now = time.time()
+                if self._paused_until > now:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every worker for `seconds` (never shortens a longer pause already set)."""
+        until = time.time() + max(0.0, seconds)
+        if until > self._paused_until:
+            self._paused_until = until
+            self._tokens = 0.0
+            if self.metrics is not None:
+                self.metrics.rate_pauses += 1
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase_qps / self.rate)
+        self._publish()
+
+    def on_throttle(self) -> None:
+        now = time.time()
+        if now - self._last_cut < max(1.0, 2.0 / self.rate):
+            return
+        self._last_cut = now
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._tokens = min(self._tokens, 1.0)
+        if self.metrics is not None:
+            self.metrics.rate_decreases += 1
+        self._publish()
+
+    def observe(self, status: int, headers: Mapping[str, str]) -> None:
+        """Feed one HTTP response into the controller."""
+        if status == 429 or 500 <= status < 600:
+            self.on_throttle()
+        elif 200 <= status < 300:
+            self.on_success()
+        remaining = _header_float(headers, "x-ratelimit-remaining")
+        reset = _header_float(headers, "x-ratelimit-reset")
+        if remaining is not None and remaining <= 0 and reset is not None:
+            # Reset may be an epoch timestamp or seconds from now
+            self.pause(reset - time.time() if reset > 1e9 else reset)
 
 
 @dataclass
@@ -64,27 +151,45 @@ class PriceBuilder:
         if str(cfg.cache_store).endswith(".sqlite") or str(cfg.cache_store).endswith(".sqlite3"):
             self.cache = SQLiteCache(cfg.cache_store)
         else:
-            self.cache = JSONCache(cfg.cache_store)
+            self.cache = JSONCache(cfg.cache_store, cfg.cache_compact_after)
         self.state = StateStore(cfg.resume_state)
         self.metrics = Metrics()
         self.client = client
-        self.token_bucket = TokenBucket(cfg.effective_interval_seconds())
+        start_rate = 1.0 / cfg.effective_interval_seconds()
+        self.token_bucket = TokenBucket(
+            start_rate,
+            burst=cfg.burst,
+            max_rate=cfg.max_qps if cfg.max_qps is not None else 4 * start_rate,
+            metrics=self.metrics,
+        )
         self._io_lock = asyncio.Lock()
+        # Resolved prices go through a batched journal instead of a CSV rewrite per record
+        self.journal = PriceJournal(cfg.out_csv, cfg.schema)
+        # (name, wear, stattrak) <-> dense ids; MHN strings are only built for the final list
+        self.registry = ItemRegistry()
+
+    def attach_limiter(self, client: CSFloatClient) -> None:
+        """Route every request of a real client (retries included) through the AIMD bucket."""
+        if isinstance(client, CSFloatClient) and client.limiter is None:
+            client.limiter = self.token_bucket
 
     def derive_mhns_from_catalog(self) -> List[str]:
         rows = read_catalog(self.cfg.catalog)
-        mhns: List[str] = []
+        ids: Set[int] = set()
         target_rarities = set(self.cfg.rarities)
+        nost = self.cfg.st_mode in (StatTrakMode.both, StatTrakMode.nost)
+        st = self.cfg.st_mode in (StatTrakMode.both, StatTrakMode.st)
         for r in rows:
             if r.Grado not in target_rarities:
                 continue
+            name_id = self.registry.intern(normalize_name(r.Arma))
             wears = valid_wears_for_range(r.FloatMin, r.FloatMax)
             for w in wears:
-                if self.cfg.st_mode in (StatTrakMode.both, StatTrakMode.nost):
-                    mhns.append(build_mhn(r.Arma, w, False))
-                if self.cfg.st_mode in (StatTrakMode.both, StatTrakMode.st):
-                    mhns.append(build_mhn(r.Arma, w, True))
-        mhns = dedupe_sorted(mhns)
+                if nost:
+                    ids.add(ItemRegistry.item_id(name_id, WEAR_INDEX[w], False))
+                if st:
+                    ids.add(ItemRegistry.item_id(name_id, WEAR_INDEX[w], True))
+        mhns = dedupe_sorted(self.registry.mhn(i) for i in ids)
         if self.cfg.limit and self.cfg.limit > 0:
             mhns = mhns[: self.cfg.limit]
         return mhns
@@ -99,8 +204,9 @@ class PriceBuilder:
         if not matched_files:
             logger.warning("only_from_contracts matched no files: %s", pattern)
             return mhns
-        needed: Set[str] = set()
+        needed: Set[int] = set()
         import csv
+        from .wears import wear_from_float
 
         for file in matched_files:
             try:
@@ -112,15 +218,15 @@ class PriceBuilder:
                             flt = float(row.get("Float") or 0.0)
                             st_raw = (row.get("StatTrak") or "false").strip().lower()
                             st = st_raw == "true"
-                            from .wears import wear_from_float
 
-                            wear = wear_from_float(flt)
-                            needed.add(build_mhn(name, wear, st))
+                            item_id = self.registry.encode(normalize_name(name), wear_from_float(flt), st)
+                            if item_id is not None:
+                                needed.add(item_id)
                         except Exception:
                             continue
             except Exception:
                 continue
-        shrink = [m for m in mhns if m in needed]
+        shrink = [m for m in mhns if self.registry.parse_mhn(m) in needed]
         return dedupe_sorted(shrink)
 
     def build_pending_set(self) -> List[str]:
@@ -128,19 +234,25 @@ class PriceBuilder:
         if self.cfg.only_from_contracts:
             base = self.shrink_by_contracts(base)
         # remove any already cached
-        out = [m for m in base if not self.cache.contains(m)]
-        return out
+        cached = self.cache.contains_many(base)
+        return [m for m in base if m not in cached]
 
-    def _prepopulate_from_cache(self, base_mhns: List[str]) -> None:
-        """Write cached prices to CSV for MHNs in base set (idempotent)."""
+    def split_mhn(self, mhn: str) -> Tuple[str, str, bool]:
+        """(name, wear, stattrak) of an MHN, via the catalog registry when it knows it."""
+        item_id = self.registry.parse_mhn(mhn)
+        if item_id is None:
+            return parse_mhn(mhn)
+        return self.registry.decode(item_id)
+
+    def _prepopulate_from_cache(self, base_mhns: List[str]) -> Set[str]:
+        """Write cached prices to CSV for MHNs in base set (idempotent); returns the cached MHNs."""
         cached_records: List[PriceRecordA | PriceRecordB] = []
+        cached = self.cache.get_many(base_mhns)
         for m in base_mhns:
-            if not self.cache.contains(m):
-                continue
-            price = self.cache.get(m)
+            price = cached.get(m)
             if price is None:
                 continue
-            name, wear, st = parse_mhn(m)
+            name, wear, st = self.split_mhn(m)
             if self.cfg.schema == SchemaOption.A:
                 cached_records.append(
                     PriceRecordA(Name=name, Wear=wear, PriceCents=int(price), StatTrak=st)
@@ -150,6 +262,14 @@ class PriceBuilder:
         if cached_records:
             writer = CSVWriter(self.cfg.out_csv, self.cfg.schema)
             writer.append_records(cached_records)
+        return set(cached)
+
+    def _mark_done(self, mhn: str, failed: bool) -> None:
+        if failed:
+            # Add to retry queue
+            self.state.add_retry(mhn)
+        self.state.mark_processed(mhn)
+        self.state.advance_cursor()
 
     async def _worker(self, idx: int, queue: asyncio.Queue[str], client: CSFloatClient) -> None:
         while True:
@@ -160,42 +280,41 @@ class PriceBuilder:
             if mhn is None:  # type: ignore
                 queue.task_done()
                 return
-            await self.token_bucket.acquire()
+            if getattr(client, "limiter", None) is None:
+                await self.token_bucket.acquire()
             t_req = time.time()
             self.metrics.record_request(t_req)
             price_cents, meta = await client.fetch_lowest_price(mhn)
             self.metrics.record_latency(meta.get("latency_ms", 0.0))
+            self.metrics.total_retries += int(meta.get("retries", 0))
             if meta.get("status") == 429:
                 self.metrics.total_429 += 1
             self.metrics.total_seen += 1
 
             async with self._io_lock:
+                rec: Optional[PriceRecordA | PriceRecordB] = None
                 if price_cents is not None and isinstance(price_cents, int):
                     # Persist
                     self.cache.set(mhn, price_cents)
-                    name, wear, st = parse_mhn(mhn)
+                    name, wear, st = self.split_mhn(mhn)
                     if self.cfg.schema == SchemaOption.A:
                         rec = PriceRecordA(Name=name, Wear=wear, PriceCents=price_cents, StatTrak=st)
                     else:
                         rec = PriceRecordB(MarketHashName=mhn, PriceCents=price_cents)
-                    writer = CSVWriter(self.cfg.out_csv, self.cfg.schema)
-                    writer.append_records([rec])
                     self.metrics.total_resolved += 1
                 else:
                     self.metrics.total_failed += 1
-                    # Add to retry queue
-                    self.state.add_retry(mhn)
                     if len(self.metrics.unresolved_sample) < 20:
                         self.metrics.unresolved_sample.append(mhn)
-
-                self.state.mark_processed(mhn)
-                self.state.advance_cursor()
+                # State advances only once the record (and everything before it) is in the
+                # fsynced journal; failures go through the same queue to keep the cursor in order
+                self.journal.submit(rec, lambda m=mhn, failed=rec is None: self._mark_done(m, failed))
             # Periodic flush
             if (self.metrics.total_seen % 10) == 0:
                 async with self._io_lock:
                     self.cache.flush()
                     self.metrics.export_atomic(self.cfg.metrics_out)
-                    self.state.save()
+                    self.state.flush()
             queue.task_done()
 
     async def run(self) -> BuilderResult:
@@ -207,9 +326,9 @@ class PriceBuilder:
             if self.cfg.only_from_contracts:
                 base = self.shrink_by_contracts(base)
             # Prepopulate CSV from cache for base universe
-            self._prepopulate_from_cache(base)
+            cached = self._prepopulate_from_cache(base)
             # Now compute pending (excluding cached)
-            pending = [m for m in base if not self.cache.contains(m)]
+            pending = [m for m in base if m not in cached]
             # Initialize state deterministically
             self.state.set_pending(pending)
         else:
@@ -223,7 +342,9 @@ class PriceBuilder:
 
         # Create client if not provided
         client = self.client or CSFloatClient(self.cfg)
+        self.attach_limiter(client)
 
+        await self.journal.start()
         queue: asyncio.Queue[str] = asyncio.Queue()
         for m in remaining:
             await queue.put(m)
@@ -262,6 +383,7 @@ class PriceBuilder:
                     w.cancel()
             if not monitor_task.done():
                 monitor_task.cancel()
+            await self.journal.close()
             self.cache.flush()
             self.metrics.export_atomic(self.cfg.metrics_out)
             self.state.save()
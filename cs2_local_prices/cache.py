@@ -6,7 +6,7 @@ import sqlite3
 import tempfile
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterable, Mapping, Optional, Set
 
 
 class PriceCache(ABC):
@@ -30,11 +30,42 @@ class PriceCache(ABC):
     def flush(self) -> None:
         ...
 
+    def get_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Prices for the keys that are cached (missing keys are left out)."""
+        out: Dict[str, int] = {}
+        for k in keys:
+            v = self.get(k)
+            if v is not None:
+                out[k] = v
+        return out
+
+    def contains_many(self, keys: Iterable[str]) -> Set[str]:
+        """Subset of `keys` present in the cache."""
+        return set(self.get_many(keys))
+
+    def set_many(self, items: Mapping[str, int]) -> None:
+        for k, v in items.items():
+            self.set(k, v)
+
 
 class JSONCache(PriceCache):
-    def __init__(self, path: Path) -> None:
+    """JSON snapshot plus an append-only NDJSON log (`<path>.log`, one `[key, cents]` per line).
+
+    `set` only marks the key dirty; `flush` appends the dirty entries to the log, so its
+    cost scales with new data rather than cache size. Once the log holds `compact_after`
+    entries it is folded into a fresh snapshot (atomic replace) and removed. Loading
+    replays the log over the snapshot; replay is idempotent, so a crash between writing
+    the snapshot and removing the log is harmless, and a torn last line is truncated away
+    before anything else is appended.
+    """
+
+    def __init__(self, path: Path, compact_after: int = 5000) -> None:
         self.path = path
+        self.log_path = path.with_name(path.name + ".log")
+        self.compact_after = max(1, compact_after)
         self._store: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._log_entries = 0
         self._load()
 
     def _load(self) -> None:
@@ -51,6 +82,26 @@ class JSONCache(PriceCache):
                 self._store = {}
         else:
             self._store = {}
+        if self.log_path.exists():
+            good = 0
+            with self.log_path.open("rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated line")
+                        key, value = json.loads(line)
+                        self._store[str(key)] = int(value)
+                    except Exception:
+                        # torn last line from a crash mid-append
+                        break
+                    good += len(line)
+                    self._log_entries += 1
+            if good < self.log_path.stat().st_size:
+                # Drop the torn tail so the next append starts on a clean line
+                with self.log_path.open("r+b") as f:
+                    f.truncate(good)
+                    f.flush()
+                    os.fsync(f.fileno())
 
     def _atomic_write(self) -> None:
         self.path.parent.mkdir(parents=True, exist_ok=True)
@@ -68,30 +119,77 @@ class JSONCache(PriceCache):
             except Exception:
                 pass
 
+    def _append_log(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.log_path.open("a", encoding="utf-8") as f:
+            f.write("".join(json.dumps([k, self._store[k]], ensure_ascii=False) + "\n" for k in sorted(self._dirty)))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_entries += len(self._dirty)
+        self._dirty.clear()
+
+    def compact(self) -> None:
+        """Write a full snapshot and drop the log."""
+        self._atomic_write()
+        self._dirty.clear()
+        try:
+            os.remove(self.log_path)
+        except FileNotFoundError:
+            pass
+        self._log_entries = 0
+
     def get(self, key: str) -> Optional[int]:
         return self._store.get(key)
 
     def set(self, key: str, price_cents: int) -> None:
-        self._store[key] = int(price_cents)
+        value = int(price_cents)
+        if self._store.get(key) != value:
+            self._store[key] = value
+            self._dirty.add(key)
 
     def contains(self, key: str) -> bool:
         return key in self._store
 
+    def get_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        store = self._store
+        return {k: store[k] for k in keys if k in store}
+
     def size(self) -> int:
         return len(self._store)
 
     def flush(self) -> None:
-        self._atomic_write()
+        if self._dirty:
+            self._append_log()
+        if self._log_entries >= self.compact_after or not self.path.exists():
+            self.compact()
 
 
 class SQLiteCache(PriceCache):
-    def __init__(self, path: Path) -> None:
+    """SQLite-backed cache in WAL mode.
+
+    Single `set` calls are grouped into one transaction that commits every
+    `commit_every` writes or on `flush()`. The bulk methods use one statement each:
+    `set_many` is an `executemany` upsert, and `get_many`/`contains_many` load the keys
+    into a temp table and join it against `prices`.
+    """
+
+    _UPSERT = (
+        "INSERT INTO prices(key, price_cents) VALUES(?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET price_cents=excluded.price_cents"
+    )
+
+    def __init__(self, path: Path, commit_every: int = 256) -> None:
         self.path = path
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.commit_every = max(1, commit_every)
+        self._uncommitted = 0
         self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
         self._conn.execute(
             "CREATE TABLE IF NOT EXISTS prices (key TEXT PRIMARY KEY, price_cents INTEGER NOT NULL)"
         )
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (key TEXT)")
         self._conn.commit()
 
     def get(self, key: str) -> Optional[int]:
@@ -100,11 +198,25 @@ class SQLiteCache(PriceCache):
         return int(row[0]) if row else None
 
     def set(self, key: str, price_cents: int) -> None:
-        self._conn.execute(
-            "INSERT INTO prices(key, price_cents) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET price_cents=excluded.price_cents",
-            (key, int(price_cents)),
-        )
-        self._conn.commit()
+        self._conn.execute(self._UPSERT, (key, int(price_cents)))
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.flush()
+
+    def set_many(self, items: Mapping[str, int]) -> None:
+        self._conn.executemany(self._UPSERT, ((k, int(v)) for k, v in items.items()))
+        self.flush()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        self._conn.execute("DELETE FROM lookup_keys")
+        self._conn.executemany("INSERT INTO lookup_keys(key) VALUES(?)", ((k,) for k in keys))
+        rows = self._conn.execute(
+            "SELECT p.key, p.price_cents FROM lookup_keys k JOIN prices p ON p.key = k.key"
+        ).fetchall()
+        self._conn.execute("DELETE FROM lookup_keys")
+        # End the implicit transaction so the read snapshot doesn't pin the WAL
+        self.flush()
+        return {k: int(v) for k, v in rows}
 
     def contains(self, key: str) -> bool:
         cur = self._conn.execute("SELECT 1 FROM prices WHERE key = ?", (key,))
@@ -116,9 +228,11 @@ class SQLiteCache(PriceCache):
 
     def flush(self) -> None:
         self._conn.commit()
+        self._uncommitted = 0
 
     def close(self) -> None:
         try:
+            self._conn.commit()
             self._conn.close()
         except Exception:
             pass
@@ -2,17 +2,49 @@ from __future__ import annotations
 
 import csv
 from pathlib import Path
-from typing import Iterable, Iterator, List
+from typing import Iterable, Iterator, List, Optional
 
 from .models import SkinRow
 
 
+def _rows_from_snapshot(path: Path) -> Optional[List[SkinRow]]:
+    """Rows from the compiled catalog snapshot (see `tradeup.catalog_snapshot`), if fresh.
+
+    The snapshot was validated when compiled, so rows are built with `model_construct`
+    instead of running pydantic validation per row.
+    """
+    try:
+        from tradeup.catalog_snapshot import open_snapshot
+    except ImportError:
+        return None
+    snap = open_snapshot(path)
+    if snap is None:
+        return None
+    strings = snap.strings()
+    return [
+        SkinRow.model_construct(
+            Arma=strings[n], Coleccion=strings[c], Grado=strings[r], FloatMin=fmin, FloatMax=fmax
+        )
+        for n, c, r, fmin, fmax in zip(
+            snap.item_name.tolist(),
+            snap.item_coll.tolist(),
+            snap.item_rarity.tolist(),
+            snap.float_min.tolist(),
+            snap.float_max.tolist(),
+        )
+    ]
+
+
 def read_catalog(path: Path) -> List[SkinRow]:
     """Read the catalog CSV into a list of SkinRow.
 
     Expects header: Arma,Coleccion,Grado,FloatMin,FloatMax
+    Uses the compiled snapshot next to the CSV when it matches the CSV contents.
     """
-    rows: List[SkinRow] = []
+    rows: List[SkinRow] = _rows_from_snapshot(path) or []
+    if rows:
+        rows.sort(key=lambda r: (r.Arma, r.Coleccion, r.Grado))
+        return rows
     with path.open("r", encoding="utf-8", newline="") as f:
         reader = csv.DictReader(f)
         required = {"Arma", "Coleccion", "Grado", "FloatMin", "FloatMax"}
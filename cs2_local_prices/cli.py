@@ -28,7 +28,9 @@ def print_config(
     rarities: str = typer.Option("restricted,classified,covert", help="Comma-separated rarities"),
     st: str = typer.Option("both", help="nost|st|both"),
     sleep: float = typer.Option(2.0, help="Sleep seconds between requests"),
-    qps_cap: float = typer.Option(0.5, help="Max requests per second"),
+    qps_cap: float = typer.Option(0.5, help="Starting max requests per second (adapted at runtime)"),
+    burst: float = typer.Option(1.0, help="Token bucket burst (requests)"),
+    max_qps: Optional[float] = typer.Option(None, help="Adaptive rate ceiling (default 4x the starting rate; set equal to qps-cap for a fixed rate)"),
     concurrency: int = typer.Option(1, help="Concurrent workers"),
     backoff: float = typer.Option(60.0, help="Initial backoff seconds"),
     backoff_max: float = typer.Option(600.0, help="Max backoff seconds"),
@@ -51,6 +53,8 @@ def print_config(
         sleep=sleep,
         qps_cap=qps_cap,
         concurrency=concurrency,
+        burst=burst,
+        max_qps=max_qps,
         backoff=backoff,
         backoff_max=backoff_max,
         max_pages=max_pages,
@@ -75,7 +79,9 @@ def build(
     rarities: str = typer.Option("restricted,classified,covert", help="Comma-separated rarities"),
     st: str = typer.Option("both", help="nost|st|both"),
     sleep: float = typer.Option(2.0, help="Sleep seconds between requests"),
-    qps_cap: float = typer.Option(0.5, help="Max requests per second"),
+    qps_cap: float = typer.Option(0.5, help="Starting max requests per second (adapted at runtime)"),
+    burst: float = typer.Option(1.0, help="Token bucket burst (requests)"),
+    max_qps: Optional[float] = typer.Option(None, help="Adaptive rate ceiling (default 4x the starting rate; set equal to qps-cap for a fixed rate)"),
     concurrency: int = typer.Option(1, help="Concurrent workers"),
     backoff: float = typer.Option(60.0, help="Initial backoff seconds"),
     backoff_max: float = typer.Option(600.0, help="Max backoff seconds"),
@@ -99,6 +105,8 @@ def build(
         sleep=sleep,
         qps_cap=qps_cap,
         concurrency=concurrency,
+        burst=burst,
+        max_qps=max_qps,
         backoff=backoff,
         backoff_max=backoff_max,
         max_pages=max_pages,
@@ -127,7 +135,9 @@ def resume(
     metrics_out: Optional[str] = typer.Option("state/prices_metrics.json", help="Metrics JSON output"),
     log_level: str = typer.Option("INFO", help="Log level"),
     concurrency: int = typer.Option(1, help="Concurrent workers"),
-    qps_cap: float = typer.Option(0.5, help="Max requests per second"),
+    qps_cap: float = typer.Option(0.5, help="Starting max requests per second (adapted at runtime)"),
+    burst: float = typer.Option(1.0, help="Token bucket burst (requests)"),
+    max_qps: Optional[float] = typer.Option(None, help="Adaptive rate ceiling (default 4x the starting rate; set equal to qps-cap for a fixed rate)"),
     sleep: float = typer.Option(2.0, help="Sleep seconds between requests"),
 ):
     setup_logging(log_level)
@@ -138,6 +148,8 @@ def resume(
         sleep=sleep,
         qps_cap=qps_cap,
         concurrency=concurrency,
+        burst=burst,
+        max_qps=max_qps,
         backoff=60.0,
         backoff_max=600.0,
         max_pages=1,
@@ -157,6 +169,77 @@ def resume(
     console.print(f"Resumed. total={res.total} resolved={res.resolved} failed={res.failed}")
 
 
+@app.command()
+def sweep(
+    catalog: str = typer.Option("data/skins_fixed.csv", help="Path to catalog CSV"),
+    rarities: str = typer.Option("restricted,classified,covert", help="Comma-separated rarities"),
+    st: str = typer.Option("both", help="nost|st|both (one sweep per CSFloat category)"),
+    sleep: float = typer.Option(2.0, help="Sleep seconds between requests"),
+    qps_cap: float = typer.Option(0.5, help="Starting max requests per second (adapted at runtime)"),
+    burst: float = typer.Option(1.0, help="Token bucket burst (requests)"),
+    max_qps: Optional[float] = typer.Option(None, help="Adaptive rate ceiling (default 4x the starting rate; set equal to qps-cap for a fixed rate)"),
+    backoff: float = typer.Option(60.0, help="Initial backoff seconds"),
+    backoff_max: float = typer.Option(600.0, help="Max backoff seconds"),
+    timeout: float = typer.Option(15.0, help="HTTP timeout seconds"),
+    page_size: int = typer.Option(50, help="Listings per request"),
+    max_pages: int = typer.Option(0, help="Stop after N pages in this run (0 = until the end; resume later)"),
+    checkpoint_every: int = typer.Option(10, help="Pages between checkpoints (cursor + minimums)"),
+    out: Optional[str] = typer.Option("docs/local_prices.csv", help="Output CSV path"),
+    cache_store: Optional[str] = typer.Option("state/prices_cache.json", help="Cache store path (json/sqlite)"),
+    sweep_state: str = typer.Option("state/prices_sweep_state.json", help="Sweep checkpoint (one file per category)"),
+    counts_out: Optional[str] = typer.Option(None, help="Optional CSV with listings seen per MHN"),
+    metrics_out: Optional[str] = typer.Option("state/prices_metrics.json", help="Metrics JSON output"),
+    log_level: str = typer.Option("INFO", help="Log level"),
+    schema: str = typer.Option("A", help="CSV schema: A or B"),
+    restart: bool = typer.Option(False, "--restart", help="Discard an unfinished sweep and start a new one"),
+):
+    """Build min prices for the whole catalog by paging through all listings sorted by price.
+
+    Re-running resumes an unfinished sweep; once every category finished, the next run starts a new one.
+    """
+    from .sweep import ListingSweep
+
+    setup_logging(log_level)
+    cfg = load_config_from_env_and_args(
+        catalog=catalog,
+        rarities=rarities,
+        st=st,
+        sleep=sleep,
+        qps_cap=qps_cap,
+        concurrency=1,
+        burst=burst,
+        max_qps=max_qps,
+        backoff=backoff,
+        backoff_max=backoff_max,
+        max_pages=1,
+        timeout=timeout,
+        limit=0,
+        only_from_contracts=None,
+        out=out,
+        resume=None,
+        cache_store=cache_store,
+        metrics_out=metrics_out,
+        log_level=log_level,
+        schema=schema,
+        safe_stop_after=None,
+    )
+    runner = ListingSweep(
+        cfg,
+        Path(sweep_state),
+        page_size=page_size,
+        max_pages=max_pages,
+        checkpoint_every=checkpoint_every,
+        counts_out=Path(counts_out) if counts_out else None,
+        restart=restart,
+    )
+    res = asyncio.run(runner.run())
+    status = "complete" if res.done else "partial (run again to resume)"
+    console.print(
+        f"Sweep {status}. pages={res.pages} listings={res.listings_seen} "
+        f"mhns_priced={res.mhns_priced} cache_updates={res.cache_updates}"
+    )
+
+
 @app.command()
 def validate(
     csv_path: str = typer.Argument(..., help="Path to local prices CSV"),
@@ -200,8 +283,9 @@ def clear_cache(
         if not confirm:
             console.print("Aborted.")
             raise typer.Exit(code=1)
-    if p.exists():
-        p.unlink()
+    for f in (p, p.with_name(p.name + ".log")):
+        if f.exists():
+            f.unlink()
     console.print("Cache cleared.")
 
 
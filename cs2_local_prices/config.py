@@ -19,6 +19,8 @@ class AppConfig(BaseModel):
     st_mode: StatTrakMode = StatTrakMode.both
     sleep_seconds: float = 2.0
     qps_cap: float = 0.5  # max requests per second
+    burst: float = 1.0  # token bucket capacity (requests)
+    max_qps: Optional[float] = None  # AIMD ceiling; None -> 4x the starting rate
     concurrency: int = 1
     backoff_initial_seconds: float = 60.0
     backoff_max_seconds: float = 600.0
@@ -29,6 +31,7 @@ class AppConfig(BaseModel):
     out_csv: Path = Path("docs/local_prices.csv")
     resume_state: Path = Path("state/prices_build_state.json")
     cache_store: Path = Path("state/prices_cache.json")
+    cache_compact_after: int = 5000  # JSON cache: log entries before folding into the snapshot
     metrics_out: Path = Path("state/prices_metrics.json")
     log_level: str = "INFO"
     schema: SchemaOption = SchemaOption.A
@@ -59,6 +62,20 @@ class AppConfig(BaseModel):
             raise ValueError("qps_cap must be > 0")
         return v
 
+    @field_validator("burst")
+    @classmethod
+    def check_burst(cls, v: float) -> float:
+        if v < 1:
+            raise ValueError("burst must be >= 1")
+        return v
+
+    @field_validator("max_qps")
+    @classmethod
+    def check_max_qps(cls, v: Optional[float]) -> Optional[float]:
+        if v is not None and v <= 0:
+            raise ValueError("max_qps must be > 0")
+        return v
+
     @field_validator("sleep_seconds", "backoff_initial_seconds", "backoff_max_seconds", "timeout_seconds")
     @classmethod
     def check_positive(cls, v: float) -> float:
@@ -83,6 +100,8 @@ def load_config_from_env_and_args(
     sleep: float = 2.0,
     qps_cap: float = 0.5,
     concurrency: int = 1,
+    burst: float = 1.0,
+    max_qps: Optional[float] = None,
     backoff: float = 60.0,
     backoff_max: float = 600.0,
     max_pages: int = 1,
@@ -104,6 +123,7 @@ def load_config_from_env_and_args(
     api_key = os.getenv("CSFLOAT_API_KEY") or None
     api_base = os.getenv("CSFLOAT_API_BASE") or os.getenv("CSFLOAT_BASE") or "https://csfloat.com"
     auth_style = os.getenv("CSFLOAT_AUTH_STYLE", "both")
+    compact_after = int(os.getenv("CS2PRICES_CACHE_COMPACT_AFTER", "5000"))
 
     rarities_list = [x.strip() for x in rarities.split(",") if x.strip()]
 
@@ -113,6 +133,8 @@ def load_config_from_env_and_args(
         st_mode=StatTrakMode(st),
         sleep_seconds=float(sleep),
         qps_cap=float(qps_cap),
+        burst=float(burst),
+        max_qps=float(max_qps) if max_qps is not None else None,
         concurrency=int(concurrency),
         backoff_initial_seconds=float(backoff),
         backoff_max_seconds=float(backoff_max),
@@ -123,6 +145,7 @@ def load_config_from_env_and_args(
         out_csv=Path(out) if out else AppConfig.model_fields["out_csv"].default,
         resume_state=Path(resume) if resume else AppConfig.model_fields["resume_state"].default,
         cache_store=Path(cache_store) if cache_store else AppConfig.model_fields["cache_store"].default,
+        cache_compact_after=compact_after,
         metrics_out=Path(metrics_out) if metrics_out else AppConfig.model_fields["metrics_out"].default,
         log_level=log_level,
         schema=SchemaOption(schema),
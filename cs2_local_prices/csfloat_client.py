@@ -6,10 +6,12 @@ import random
 import time
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
-from typing import Any, Dict, Optional, Tuple, Iterable
+from typing import Any, Dict, List, Optional, Tuple, Iterable
 
 import httpx
 
+from tradeup.csfloat_api import extract_next_cursor
+
 from .config import AppConfig
 from .logging_setup import get_logger
 
@@ -121,9 +123,43 @@ def extract_lowest_price(json_data: Dict[str, Any]) -> Optional[int]:
     return min_cents
 
 
+def listing_mhn(item: Dict[str, Any]) -> Optional[str]:
+    """MarketHashName of a listing (top-level or nested under "item")."""
+    for obj in (item.get("item"), item):
+        if isinstance(obj, dict):
+            for k in ("market_hash_name", "name"):
+                v = obj.get(k)
+                if isinstance(v, str) and v:
+                    return v
+    return None
+
+
+def listing_price_cents(item: Dict[str, Any]) -> Optional[int]:
+    for k in ("price", "price_cents", "priceCents"):
+        if k in item:
+            cents = to_cents(item.get(k))
+            if cents is not None and cents > 0:
+                return cents
+    return None
+
+
 class CSFloatClient:
-    def __init__(self, cfg: AppConfig, transport: Optional[httpx.BaseTransport] = None) -> None:
+    """Async client for /api/v1/listings.
+
+    If `limiter` is set (e.g. `builder.TokenBucket`: `acquire()`, `observe(status, headers)`,
+    `pause(seconds)`), every HTTP request, retries and param variants included, waits for
+    it and reports its response, and a 429 pauses the limiter for all workers instead of
+    sleeping only the request that got it.
+    """
+
+    def __init__(
+        self,
+        cfg: AppConfig,
+        transport: Optional[httpx.BaseTransport] = None,
+        limiter: Optional[Any] = None,
+    ) -> None:
         self.cfg = cfg
+        self.limiter = limiter
         # Build headers according to auth style expected by CSFloat
         base_headers: Dict[str, str] = {
             "Accept": "application/json",
@@ -148,6 +184,75 @@ class CSFloatClient:
     async def close(self) -> None:
         await self.client.aclose()
 
+    async def _get(self, params: Dict[str, Any]) -> httpx.Response:
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        resp = await self.client.get("/api/v1/listings", params=params)
+        if self.limiter is not None:
+            self.limiter.observe(resp.status_code, resp.headers)
+        return resp
+
+    async def _throttled(self, sleep_s: float) -> None:
+        # Shared limiter: the next acquire() of every worker waits out the pause
+        if self.limiter is not None:
+            self.limiter.pause(sleep_s)
+        else:
+            await asyncio.sleep(sleep_s)
+
+    async def fetch_listings_page(
+        self, params: Dict[str, Any]
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str], Dict[str, Any]]:
+        """Fetch one page of /api/v1/listings.
+
+        Returns (listings or None on failure, next cursor or None, meta dict). The cursor
+        comes from the X-Next-Cursor header or a "cursor" field in the body, like
+        `tradeup.csfloat_api.CsfloatClient.iter_listings`. 429/5xx/timeouts are retried
+        with the same backoff policy as `fetch_lowest_price`.
+        """
+        meta: Dict[str, Any] = {"retries": 0, "status": None, "latency_ms": 0.0}
+        backoff = self.cfg.backoff_initial_seconds
+        start_ts = time.time()
+        while time.time() - start_ts <= self.cfg.timeout_seconds * 4 + self.cfg.backoff_max_seconds:
+            try:
+                t0 = time.time()
+                resp = await self._get(params)
+                meta["latency_ms"] = (time.time() - t0) * 1000.0
+                meta["status"] = resp.status_code
+                if resp.status_code == 200:
+                    data = resp.json()
+                    if isinstance(data, list):
+                        data = {"data": data}
+                    items = data.get("data") if isinstance(data, dict) else None
+                    if not isinstance(items, list):
+                        items = data.get("listings") if isinstance(data, dict) else None
+                    cursor = extract_next_cursor(resp.headers, data)
+                    return [it for it in (items or []) if isinstance(it, dict)], cursor, meta
+                if resp.status_code == 429:
+                    retry_after = resp.headers.get("Retry-After")
+                    sleep_s = parse_retry_after(retry_after) if retry_after is not None else None
+                    if sleep_s is None:
+                        sleep_s = random.uniform(0, min(self.cfg.backoff_max_seconds, backoff))
+                        backoff = min(self.cfg.backoff_max_seconds, backoff * 2)
+                    meta["retries"] += 1
+                    await self._throttled(sleep_s)
+                    continue
+                if 500 <= resp.status_code < 600:
+                    sleep_s = random.uniform(0, min(self.cfg.backoff_max_seconds, backoff))
+                    backoff = min(self.cfg.backoff_max_seconds, backoff * 2)
+                    meta["retries"] += 1
+                    await asyncio.sleep(sleep_s)
+                    continue
+                return None, None, meta
+            except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.ConnectError):
+                sleep_s = random.uniform(0, min(self.cfg.backoff_max_seconds, backoff))
+                backoff = min(self.cfg.backoff_max_seconds, backoff * 2)
+                meta["retries"] += 1
+                await asyncio.sleep(sleep_s)
+                continue
+            except Exception:
+                return None, None, meta
+        return None, None, meta
+
     async def fetch_lowest_price(self, mhn: str) -> Tuple[Optional[int], Dict[str, Any]]:
         """Fetch lowest price in cents for the given MarketHashName.
 
@@ -186,7 +291,7 @@ class CSFloatClient:
 
                 last_resp = None
                 for vp in variants:
-                    resp = await self.client.get("/api/v1/listings", params=vp)
+                    resp = await self._get(vp)
                     last_resp = resp
                     latency = (time.time() - t0) * 1000.0
                     meta["latency_ms"] = latency
@@ -239,7 +344,7 @@ class CSFloatClient:
                         sleep_s = random.uniform(0, sleep_s)
                         backoff = min(self.cfg.backoff_max_seconds, backoff * 2)
                     meta["retries"] += 1
-                    await asyncio.sleep(sleep_s)
+                    await self._throttled(sleep_s)
                     continue
                 if 500 <= resp.status_code < 600:
                     sleep_s = random.uniform(0, min(self.cfg.backoff_max_seconds, backoff))
@@ -16,6 +16,9 @@ class Metrics:
     total_failed: int = 0
     total_429: int = 0
     total_retries: int = 0
+    rate_qps: float = 0.0  # current adaptive request rate (builder.TokenBucket)
+    rate_decreases: int = 0
+    rate_pauses: int = 0
     latencies_ms: List[float] = field(default_factory=list)
     request_timestamps: List[float] = field(default_factory=list)
     unresolved_sample: List[str] = field(default_factory=list)
@@ -52,6 +55,9 @@ class Metrics:
             "total_retries": self.total_retries,
             "avg_latency_ms": self.avg_latency_ms(),
             "qps": self.qps(),
+            "rate_qps": round(self.rate_qps, 4),
+            "rate_decreases": self.rate_decreases,
+            "rate_pauses": self.rate_pauses,
             "unresolved_sample": list(self.unresolved_sample)[:20],
         }
 
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+import base64
 from enum import Enum
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 class StatTrakMode(str, Enum):
@@ -55,12 +56,53 @@ class MetricsSnapshot(BaseModel):
     total_retries: int = 0
     avg_latency_ms: float = 0.0
     qps: float = 0.0
+    rate_qps: float = 0.0
+    rate_decreases: int = 0
+    rate_pauses: int = 0
     unresolved_sample: List[str] = Field(default_factory=list)
 
 
 class StateModel(BaseModel):
+    """Builder resume state; MHNs are referred to by their index in `pending`.
+
+    Version 1 files stored `processed` and `retry_queue` as lists of MHN strings; they
+    are migrated on load (entries not in `pending` are dropped).
+    """
+
+    version: int = 2
     pending: List[str] = Field(default_factory=list)  # sorted MHNs pending fetch
-    processed: List[str] = Field(default_factory=list)
-    retry_queue: List[str] = Field(default_factory=list)
+    processed_bits: str = ""  # base64 bitmap over `pending` indices (bit i = pending[i] processed)
+    retry: List[int] = Field(default_factory=list)  # sorted `pending` indices queued for retry
     cursor: int = 0
     timestamp: float = 0.0
+    wal_seq: int = 0  # last write-ahead log entry included in this checkpoint (see StateStore)
+
+    @model_validator(mode="before")
+    @classmethod
+    def migrate_v1(cls, data: Any) -> Any:
+        if not isinstance(data, dict) or ("processed" not in data and "retry_queue" not in data):
+            return data
+        data = dict(data)
+        index = {m: i for i, m in enumerate(data.get("pending") or [])}
+        bits = bytearray((len(index) + 7) // 8)
+        for m in data.pop("processed", None) or []:
+            i = index.get(m)
+            if i is not None:
+                bits[i >> 3] |= 1 << (i & 7)
+        data["processed_bits"] = base64.b64encode(bytes(bits)).decode("ascii")
+        data["retry"] = sorted({index[m] for m in data.pop("retry_queue", None) or [] if m in index})
+        data["version"] = 2
+        return data
+
+
+class SweepStateModel(BaseModel):
+    """Checkpoint of a listing sweep (see `cs2_local_prices.sweep`)."""
+
+    category: int = 1
+    cursor: Optional[str] = None
+    pages: int = 0
+    listings_seen: int = 0
+    done: bool = False
+    min_price: Dict[str, int] = Field(default_factory=dict)  # MHN -> lowest price seen (cents)
+    counts: Dict[str, int] = Field(default_factory=dict)  # MHN -> listings seen
+    timestamp: float = 0.0
@@ -1,21 +1,44 @@
 from __future__ import annotations
 
+import base64
+import bisect
 import json
 import os
 import tempfile
 import time
-from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import IO, Dict, List, Optional, Union
 
 from .models import StateModel
 
 
 class StateStore:
-    def __init__(self, path: Path) -> None:
+    """Resume state for the price builder.
+
+    The JSON file is a checkpoint; transitions after it (processed, cursor advance,
+    retry) are appended to a write-ahead log next to it (`<state>.wal`, one JSON array
+    per line) so each MHN costs O(1) I/O instead of a full rewrite. Every
+    `checkpoint_every` transitions, and on `save()`, the model is checkpointed and the
+    log truncated. Each entry carries a sequence number and the checkpoint records the
+    last one it includes, so `load()` replays only newer entries: a crash between the
+    checkpoint and the truncate never applies a transition twice, and a torn last line
+    is truncated away on load before anything else is appended. Log lines are flushed to the OS on every append and fsynced on `flush()`
+    and at checkpoints.
+
+    Processed MHNs are a bitmap over `pending` indices and retries a sorted index list,
+    so state size and update cost depend on the catalog, not on run history.
+    """
+
+    def __init__(self, path: Path, checkpoint_every: int = 1000) -> None:
         self.path = path
+        self.wal_path = path.with_name(path.name + ".wal")
+        self.checkpoint_every = max(1, checkpoint_every)
         self.model = StateModel()
         self._loaded = False
+        self._wal: Optional[IO[str]] = None
+        self._since_checkpoint = 0
+        self._processed = bytearray()
+        self._index: Dict[str, int] = {}
 
     def load(self) -> None:
         if self.path.exists():
@@ -28,11 +51,90 @@ class StateStore:
                 self.model = StateModel()
         else:
             self.model = StateModel()
+        self._reset_index()
+        try:
+            raw = base64.b64decode(self.model.processed_bits)
+        except ValueError:
+            raw = b""
+        k = min(len(raw), len(self._processed))
+        self._processed[:k] = raw[:k]
+        self._replay()
         self._loaded = True
 
+    def _reset_index(self) -> None:
+        self._index = {m: i for i, m in enumerate(self.model.pending)}
+        self._processed = bytearray((len(self._index) + 7) // 8)
+
+    def _replay(self) -> None:
+        if not self.wal_path.exists():
+            return
+        good = 0
+        with self.wal_path.open("rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    entry = json.loads(line)
+                    seq, op = int(entry[0]), entry[1]
+                except Exception:
+                    # torn last line from a crash mid-append
+                    break
+                good += len(line)
+                if seq <= self.model.wal_seq:
+                    continue
+                self._apply(op, entry[2] if len(entry) > 2 else None)
+                self.model.wal_seq = seq
+                self._since_checkpoint += 1
+        if good < self.wal_path.stat().st_size:
+            # Drop the torn tail so new entries start on a clean line
+            with self.wal_path.open("r+b") as f:
+                f.truncate(good)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _apply(self, op: str, ref: Union[int, str, None]) -> None:
+        # Version 1 logs referred to MHNs by string
+        i = self._index.get(ref) if isinstance(ref, str) else ref
+        if op == "c":
+            self.model.cursor += 1
+        elif i is None:
+            return
+        elif op == "p":
+            self._processed[i >> 3] |= 1 << (i & 7)
+        elif op == "r":
+            self._insert_retry(i)
+
+    def _insert_retry(self, i: int) -> bool:
+        retry = self.model.retry
+        pos = bisect.bisect_left(retry, i)
+        if pos < len(retry) and retry[pos] == i:
+            return False
+        retry.insert(pos, i)
+        return True
+
+    def _log(self, op: str, i: Optional[int] = None) -> None:
+        self.model.wal_seq += 1
+        entry = [self.model.wal_seq, op] if i is None else [self.model.wal_seq, op, i]
+        if self._wal is None:
+            self.wal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._wal = self.wal_path.open("a", encoding="utf-8")
+        self._wal.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._wal.flush()
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.save()
+
+    def flush(self) -> None:
+        """Make logged transitions durable (fsync the log) without a checkpoint."""
+        if self._wal is not None:
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+
     def save(self) -> None:
+        """Checkpoint the full model and truncate the log."""
         self.path.parent.mkdir(parents=True, exist_ok=True)
         self.model.timestamp = time.time()
+        self.model.processed_bits = base64.b64encode(bytes(self._processed)).decode("ascii")
         tmp_fd, tmp_name = tempfile.mkstemp(prefix="state_", suffix=".json", dir=str(self.path.parent))
         try:
             with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmpf:
@@ -46,11 +148,21 @@ class StateStore:
                     os.remove(tmp_name)
             except Exception:
                 pass
+        # Entries up to model.wal_seq are now in the checkpoint
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+        try:
+            os.remove(self.wal_path)
+        except FileNotFoundError:
+            pass
+        self._since_checkpoint = 0
 
     def set_pending(self, mhns: List[str]) -> None:
         self.model.pending = list(mhns)
         self.model.cursor = 0
-        self.model.retry_queue = []
+        self.model.retry = []
+        self._reset_index()
         self.save()
 
     def next_pending(self) -> str | None:
@@ -60,13 +172,26 @@ class StateStore:
 
     def advance_cursor(self) -> None:
         self.model.cursor += 1
-        self.save()
+        self._log("c")
 
     def mark_processed(self, mhn: str) -> None:
-        self.model.processed.append(mhn)
-        self.save()
+        i = self._index.get(mhn)
+        if i is None:
+            return
+        self._processed[i >> 3] |= 1 << (i & 7)
+        self._log("p", i)
 
     def add_retry(self, mhn: str) -> None:
-        if mhn not in self.model.retry_queue:
-            self.model.retry_queue.append(mhn)
-            self.save()
+        i = self._index.get(mhn)
+        if i is not None and self._insert_retry(i):
+            self._log("r", i)
+
+    def is_processed(self, mhn: str) -> bool:
+        i = self._index.get(mhn)
+        return i is not None and bool(self._processed[i >> 3] & (1 << (i & 7)))
+
+    def processed_count(self) -> int:
+        return sum(bin(b).count("1") for b in self._processed)
+
+    def retry_mhns(self) -> List[str]:
+        return [self.model.pending[i] for i in self.model.retry]
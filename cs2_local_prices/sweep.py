@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from .builder import PriceBuilder
+from .config import AppConfig
+from .csfloat_client import CSFloatClient, listing_mhn, listing_price_cents
+from .logging_setup import get_logger
+from .models import PriceRecordA, PriceRecordB, SchemaOption, StatTrakMode, SweepStateModel
+from .writer import CSVWriter
+
+logger = get_logger(__name__)
+
+
+# Listing sweep: instead of one request per MHN, page through /api/v1/listings sorted by
+# lowest price (50 listings per request) and keep the minimum price per MHN. Because the
+# pages are sorted ascending, the first listing seen for an MHN is its lowest price, so
+# even a partial sweep yields exact minimums for every MHN it reached.
+
+
+@dataclass
+class SweepResult:
+    pages: int
+    listings_seen: int
+    mhns_priced: int
+    cache_updates: int
+    done: bool
+
+
+class ListingSweep:
+    def __init__(
+        self,
+        cfg: AppConfig,
+        state_path: Path,
+        page_size: int = 50,
+        max_pages: int = 0,
+        checkpoint_every: int = 10,
+        counts_out: Optional[Path] = None,
+        client: Optional[CSFloatClient] = None,
+        restart: bool = False,
+    ) -> None:
+        self.cfg = cfg
+        self.restart = restart
+        self.state_path = state_path
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.counts_out = counts_out
+        self.client = client
+        # Reuse the builder's cache, token bucket, metrics and MHN universe
+        self.builder = PriceBuilder(cfg, client=client)
+
+    def categories(self) -> List[int]:
+        # CSFloat category: 1 = normal, 2 = StatTrak
+        out: List[int] = []
+        if self.cfg.st_mode in (StatTrakMode.both, StatTrakMode.nost):
+            out.append(1)
+        if self.cfg.st_mode in (StatTrakMode.both, StatTrakMode.st):
+            out.append(2)
+        return out
+
+    def _state_file(self, category: int) -> Path:
+        return self.state_path.with_name(f"{self.state_path.stem}.cat{category}{self.state_path.suffix or '.json'}")
+
+    def _load_state(self, category: int) -> SweepStateModel:
+        p = self._state_file(category)
+        if p.exists():
+            try:
+                state = SweepStateModel(**json.loads(p.read_text(encoding="utf-8")))
+                if state.category == category:
+                    return state
+            except Exception:
+                logger.warning("Sweep state %s is corrupted; starting over", p)
+        return SweepStateModel(category=category)
+
+    def _load_states(self) -> List[SweepStateModel]:
+        """Checkpoints of every category; a new sweep (empty minimums and counts) starts
+        once all categories finished, or when `restart` is set."""
+        states = [self._load_state(c) for c in self.categories()]
+        if self.restart or all(st.done for st in states):
+            if any(st.pages for st in states):
+                logger.info("Starting a new sweep (previous one %s)", "discarded" if self.restart else "complete")
+            states = [SweepStateModel(category=c) for c in self.categories()]
+        return states
+
+    def _save_state(self, state: SweepStateModel) -> None:
+        p = self._state_file(state.category)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        state.timestamp = time.time()
+        tmp_fd, tmp_name = tempfile.mkstemp(prefix="sweep_", suffix=".json", dir=str(p.parent))
+        try:
+            with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmpf:
+                json.dump(state.model_dump(), tmpf, ensure_ascii=False, separators=(",", ":"))
+                tmpf.flush()
+                os.fsync(tmpf.fileno())
+            os.replace(tmp_name, p)
+        finally:
+            try:
+                if os.path.exists(tmp_name):
+                    os.remove(tmp_name)
+            except Exception:
+                pass
+
+    def _publish(self, state: SweepStateModel) -> int:
+        """Write the minimums found so far into the builder's cache and output CSV."""
+        cache = self.builder.cache
+        current = cache.get_many(state.min_price)
+        changed: Dict[str, int] = {}
+        records: List[PriceRecordA | PriceRecordB] = []
+        for mhn, cents in state.min_price.items():
+            if current.get(mhn) == cents:
+                continue
+            changed[mhn] = cents
+            if self.cfg.schema == SchemaOption.A:
+                name, wear, st = self.builder.split_mhn(mhn)
+                records.append(PriceRecordA(Name=name, Wear=wear, PriceCents=cents, StatTrak=st))
+            else:
+                records.append(PriceRecordB(MarketHashName=mhn, PriceCents=cents))
+        cache.set_many(changed)
+        cache.flush()
+        if records:
+            # Upsert: a sweep minimum replaces a stale row so the CSV matches the cache
+            CSVWriter(self.cfg.out_csv, self.cfg.schema).upsert_records(records)
+        return len(changed)
+
+    def _write_counts(self, states: List[SweepStateModel]) -> None:
+        if self.counts_out is None:
+            return
+        counts: Dict[str, int] = {}
+        for st in states:
+            counts.update(st.counts)
+        self.counts_out.parent.mkdir(parents=True, exist_ok=True)
+        with self.counts_out.open("w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["MarketHashName", "Listings"])
+            for mhn in sorted(counts):
+                w.writerow([mhn, counts[mhn]])
+
+    async def run(self) -> SweepResult:
+        universe: Set[str] = set(self.builder.derive_mhns_from_catalog())
+        client = self.client or CSFloatClient(self.cfg)
+        self.builder.attach_limiter(client)
+        metrics = self.builder.metrics
+        pages = 0
+        listings = 0
+        updates = 0
+        states = self._load_states()
+        try:
+            for state in states:
+                category = state.category
+                if state.done:
+                    logger.info("Sweep for category %d already complete (%d pages)", category, state.pages)
+                    continue
+                while not self.max_pages or pages < self.max_pages:
+                    params = {"sort_by": "lowest_price", "category": str(category), "limit": str(self.page_size)}
+                    if state.cursor:
+                        params["cursor"] = state.cursor
+                    if getattr(client, "limiter", None) is None:
+                        await self.builder.token_bucket.acquire()
+                    metrics.record_request(time.time())
+                    items, cursor, meta = await client.fetch_listings_page(params)
+                    metrics.record_latency(meta.get("latency_ms", 0.0))
+                    metrics.total_retries += int(meta.get("retries", 0))
+                    if items is None:
+                        # Leave the cursor where it was so the next run retries this page
+                        logger.warning("Sweep page failed (status=%s); stopping at page %d", meta.get("status"), state.pages)
+                        break
+                    pages += 1
+                    state.pages += 1
+                    for it in items:
+                        mhn = listing_mhn(it)
+                        cents = listing_price_cents(it)
+                        if mhn is None or cents is None or mhn not in universe:
+                            continue
+                        listings += 1
+                        state.listings_seen += 1
+                        state.counts[mhn] = state.counts.get(mhn, 0) + 1
+                        prev = state.min_price.get(mhn)
+                        if prev is None or cents < prev:
+                            state.min_price[mhn] = cents
+                    metrics.total_seen += len(items)
+                    state.cursor = cursor
+                    if not cursor or not items:
+                        state.done = True
+                    if state.done or state.pages % self.checkpoint_every == 0:
+                        self._save_state(state)
+                        updates += self._publish(state)
+                        metrics.total_resolved = sum(len(s.min_price) for s in states)
+                        metrics.export_atomic(self.cfg.metrics_out)
+                    if state.done:
+                        break
+                self._save_state(state)
+                updates += self._publish(state)
+                if not state.done:
+                    break
+        finally:
+            metrics.export_atomic(self.cfg.metrics_out)
+            self._write_counts(states)
+            if self.client is None:
+                await client.close()
+        return SweepResult(
+            pages=pages,
+            listings_seen=listings,
+            mhns_priced=len({m for s in states for m in s.min_price}),
+            cache_updates=updates,
+            done=bool(states) and all(s.done for s in states),
+        )
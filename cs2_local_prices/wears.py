@@ -64,22 +64,31 @@ def valid_wears_for_range(float_min: float, float_max: float) -> List[str]:
     return out
 
 
+def _wear_label_mapping() -> dict:
+    mapping = {b.name.lower(): b.name for b in BUCKETS}
+    for b in BUCKETS:
+        mapping[b.short.lower()] = b.name
+    # also accept parentheses forms like (Field-Tested) or 'Field Tested'
+    for key, val in list(mapping.items()):
+        mapping.setdefault(key.replace("-", " "), val)
+    return mapping
+
+
+# Built once at import; normalize_wear_label sits on the MHN build/parse hot path
+_WEAR_LABELS = _wear_label_mapping()
+
+
 def normalize_wear_label(label: str) -> str:
     """Normalize wear labels to the canonical names.
 
     Accepts case-insensitive names and shorts.
     """
     l = label.strip().lower()
-    mapping = {b.name.lower(): b.name for b in BUCKETS}
-    for b in BUCKETS:
-        mapping[b.short.lower()] = b.name
-    if l in mapping:
-        return mapping[l]
-    # also accept parentheses forms like (Field-Tested) or 'Field Tested'
+    val = _WEAR_LABELS.get(l)
+    if val is not None:
+        return val
     l2 = l.replace("(", "").replace(")", "").replace("-", " ")
-    l2 = " ".join(l2.split())
-    for key, val in mapping.items():
-        key2 = key.replace("-", " ")
-        if l2 == key2:
-            return val
+    val = _WEAR_LABELS.get(" ".join(l2.split()))
+    if val is not None:
+        return val
     raise ValueError(f"Unknown wear label: {label}")
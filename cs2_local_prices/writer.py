@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import asyncio
 import csv
+import json
 import os
 import tempfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Set, Tuple
+from typing import Callable, Iterable, List, Optional, Set, Tuple
 
 from .models import PriceRecordA, PriceRecordB, SchemaOption
 from .wears import VALID_WEAR_NAMES
@@ -76,20 +78,21 @@ class CSVWriter:
             except Exception:
                 pass
 
+    def _read_rows(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        with self.path.open("r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != self._header():
+                raise ValueError(
+                    f"CSV header mismatch. Expected {self._header()} got {reader.fieldnames}"
+                )
+            return list(reader)
+
     def append_records(self, records: Iterable[PriceRecordA | PriceRecordB]) -> int:
         # Read existing, append non-duplicates, atomic replace
-        existing_rows: List[dict] = []
-        keys = set()
-        if self.path.exists():
-            with self.path.open("r", encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                if reader.fieldnames != self._header():
-                    raise ValueError(
-                        f"CSV header mismatch. Expected {self._header()} got {reader.fieldnames}"
-                    )
-                for row in reader:
-                    existing_rows.append(row)
-                    keys.add(self._row_key(row))
+        existing_rows = self._read_rows()
+        keys = {self._row_key(row) for row in existing_rows}
         new_rows: List[dict] = []
         added = 0
         for rec in records:
@@ -106,6 +109,25 @@ class CSVWriter:
         self._atomic_write_all(all_rows)
         return added
 
+    def upsert_records(self, records: Iterable[PriceRecordA | PriceRecordB]) -> int:
+        """Like `append_records`, but a record whose key is already present replaces that row.
+
+        Returns the number of rows added or changed.
+        """
+        rows = {self._row_key(row): row for row in self._read_rows()}
+        changed = 0
+        for rec in records:
+            data = rec.model_dump()
+            k = self._row_key(data)
+            old = rows.get(k)
+            if old is not None and str(old["PriceCents"]) == str(data["PriceCents"]):
+                continue
+            rows[k] = data
+            changed += 1
+        if changed:
+            self._atomic_write_all(list(rows.values()))
+        return changed
+
     def validate(self) -> None:
         # read and validate types
         if not self.path.exists():
@@ -121,3 +143,124 @@ class CSVWriter:
                     PriceRecordA(**{**row, "PriceCents": int(row["PriceCents"]), "StatTrak": row["StatTrak"].lower() == "true"})
                 else:
                     PriceRecordB(**{**row, "PriceCents": int(row["PriceCents"])})
+
+
+class PriceJournal:
+    """Append-only journal in front of a `CSVWriter`.
+
+    Workers call `submit()` (non-blocking); a single writer task drains the queue in
+    batches and appends them as JSON lines to `<out>.journal` off the event loop, with
+    one fsync per batch. Every `compact_every` records, and on `close()`, the journal is
+    compacted into the CSV with one `append_records` call (same sorted, deduplicated
+    output as before) and truncated. A journal left behind by a crash is compacted on
+    `start()`; replaying it is idempotent because `append_records` skips existing keys.
+
+    `submit()` takes an optional `on_durable` callback that runs on the event loop once
+    everything submitted up to it is fsynced to the journal, in submission order. The
+    builder advances its resume state there, so a crash never marks an MHN processed
+    whose price only existed in memory. `record=None` submits just the callback.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        schema: SchemaOption = SchemaOption.A,
+        journal_path: Optional[Path] = None,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        compact_every: int = 2000,
+    ) -> None:
+        self.csv = CSVWriter(path, schema)
+        self.journal_path = journal_path or path.with_name(path.name + ".journal")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.compact_every = max(1, compact_every)
+        self.records_written = 0
+        self.compactions = 0
+        self._since_compact = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _record(self, data: dict) -> PriceRecordA | PriceRecordB:
+        return PriceRecordA(**data) if self.csv.schema == SchemaOption.A else PriceRecordB(**data)
+
+    def _append_journal(self, records: List[PriceRecordA | PriceRecordB]) -> None:
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.journal_path.open("a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r.model_dump(), ensure_ascii=False) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self) -> int:
+        """Fold the journal into the CSV and truncate it. Returns rows added to the CSV."""
+        if not self.journal_path.exists():
+            return 0
+        records: List[PriceRecordA | PriceRecordB] = []
+        with self.journal_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(self._record(json.loads(line)))
+                except Exception:
+                    # torn last line from a crash mid-append
+                    continue
+        added = self.csv.append_records(records) if records else 0
+        os.remove(self.journal_path)
+        self.compactions += 1
+        self._since_compact = 0
+        return added
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.compact)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def submit(
+        self,
+        record: Optional[PriceRecordA | PriceRecordB],
+        on_durable: Optional[Callable[[], None]] = None,
+    ) -> None:
+        assert self._queue is not None, "PriceJournal.start() was not awaited"
+        self._queue.put_nowait((record, on_durable))
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            batch: List[Tuple[Optional[PriceRecordA | PriceRecordB], Optional[Callable[[], None]]]] = []
+            if item is None:
+                closing = True
+            else:
+                batch.append(item)
+                # Linger briefly so a burst of results lands in one write
+                deadline = asyncio.get_running_loop().time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - asyncio.get_running_loop().time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+            records = [rec for rec, _ in batch if rec is not None]
+            if records:
+                await asyncio.to_thread(self._append_journal, records)
+                self.records_written += len(records)
+                self._since_compact += len(records)
+            for _, on_durable in batch:
+                if on_durable is not None:
+                    on_durable()
+            if self._since_compact >= self.compact_every:
+                await asyncio.to_thread(self.compact)
+
+    async def close(self) -> None:
+        """Flush queued records and compact the journal into the CSV."""
+        if self._task is not None and self._queue is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+        await asyncio.to_thread(self.compact)
@@ -4,6 +4,14 @@
 Evaluador de contratos (secuencial, con diagnósticos, reintentos y logging rico).
 
 - Llama a: python -m tradeup.cli --contract <file> --catalog <csv> --json --fees <rate> [extra flags]
+  o, con --in-process, evalúa en el mismo proceso con `tradeup.evaluator.Evaluator`
+  (catálogo y precios se cargan una sola vez). En modo en proceso las tablas de outcomes
+  con precio se memoizan por clave canónica (--memo-size / --memo-store).
+- Con --dep-index persiste un índice inverso MHN → contratos; con --reprice-from <csv viejo>
+  solo re-evalúa (y re-clasifica) los contratos cuyos precios cambiaron respecto de --local-prices.
+- Shards empaquetados (*.tucorp, ver tradeup.corpus) dentro de --contracts-dir se recorren registro a
+  registro vía mmap (requiere --in-process); en vez de mover archivos, cada contrato se agrega al shard
+  homónimo dentro de OK / FAIL / ERROR y se anota en `<shard>.consumed`, así una nueva corrida lo saltea.
 - Clasifica: OK / FAIL (no rentable) / ERROR:<code> (rate-limit, timeout, net, json, etc.)
 - Reintenta con backoff errores transitorios (rate-limit / timeout / red), respetando Retry-After si aparece.
 - Mueve preservando subcarpetas a OK / FAIL / ERROR.
@@ -22,11 +30,13 @@ import json
 import re
 import shutil
 import subprocess
+import sys
 import time
 import shlex
+import traceback
 from pathlib import Path
 import os
-from typing import Optional
+from typing import Dict, Optional
 from textwrap import shorten
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
@@ -38,6 +48,11 @@ except Exception:  # pragma: no cover
     Console = None  # type: ignore
     Progress = None  # type: ignore
 
+# Permite importar `tradeup` al ejecutar el script como `python scripts/evaluate_all_contracts.py`
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
 # Patrones de diagnóstico
 RATE_LIMIT_PATTERNS = re.compile(
     r"(429|too\s*many\s*requests|rate[-\s]*limit|ratelimit|retry[-\s]*after)",
@@ -136,7 +151,12 @@ def main() -> None:
     ap.add_argument("--ok-dir", default="contracts/OK", help="Carpeta para contratos rentables")
     ap.add_argument("--fail-dir", default="contracts/FAIL", help="Carpeta para contratos NO rentables")
     ap.add_argument("--error-dir", default="contracts/ERROR", help="Carpeta para contratos con errores")
-    ap.add_argument("--sleep", type=float, default=1.5, help="Pausa entre contratos (segundos)")
+    ap.add_argument(
+        "--sleep",
+        type=float,
+        default=None,
+        help="Pausa entre contratos (segundos; por defecto 1.5, o 0 con --in-process)",
+    )
     ap.add_argument("--max", type=int, default=0, help="Máximo a evaluar (0=todos)")
     ap.add_argument("--fees", type=float, default=0.02, help="Fee de venta (2%% CSFloat)")
     ap.add_argument(
@@ -144,6 +164,60 @@ def main() -> None:
         default="",
         help="Flags extra para tradeup.cli (ej: --no-fetch-prices --local-prices local.csv)",
     )
+    ap.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Evaluar en el mismo proceso (sin subprocess por contrato). Usa --local-prices/--fetch-prices en vez de --extra-cli-flags",
+    )
+    ap.add_argument("--local-prices", default=None, help="CSV local de precios (solo con --in-process)")
+    ap.add_argument(
+        "--fetch-prices",
+        action="store_true",
+        help="Consultar CSFloat para completar precios (solo con --in-process)",
+    )
+    ap.add_argument(
+        "--price-cache",
+        default=None,
+        help=(
+            "SQLite compartido con la caché de precios de CSFloat (TTL por entrada): cada MHN se consulta "
+            "una vez por TTL en toda la corrida, también entre los procesos del CLI"
+        ),
+    )
+    ap.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help=(
+            "Requests/minuto a CSFloat compartidas por todos los workers y procesos del CLI (token bucket con "
+            "lock de archivo; un 429 pausa a todos una vez). 0 = sin limitador global"
+        ),
+    )
+    ap.add_argument(
+        "--rate-limit-file",
+        default=".cache/csfloat_ratelimit.bin",
+        help="Archivo de estado del limitador compartido (con --rate-limit)",
+    )
+    ap.add_argument(
+        "--memo-size",
+        type=int,
+        default=4096,
+        help="Tablas de outcomes memoizadas en memoria (solo con --in-process; 0 = sin memo)",
+    )
+    ap.add_argument(
+        "--memo-store",
+        default=None,
+        help="SQLite para persistir el memo de outcomes entre corridas (solo con --in-process y precios locales)",
+    )
+    ap.add_argument(
+        "--dep-index",
+        default=None,
+        help="SQLite con el índice MHN → contratos (solo con --in-process); se actualiza en cada evaluación",
+    )
+    ap.add_argument(
+        "--reprice-from",
+        default=None,
+        help="CSV de precios anterior: re-evalúa solo los contratos del --dep-index afectados por el diff contra --local-prices",
+    )
     ap.add_argument("--retries", type=int, default=2, help="Reintentos para errores transitorios (rate-limit/red/timeout)")
     ap.add_argument("--backoff", type=float, default=5.0, help="Backoff base (segundos) para reintentos transitorios")
     ap.add_argument(
@@ -170,10 +244,135 @@ def main() -> None:
     log_path = Path("scan_results.csv")
     error_csv = Path("errors/errors.csv")
 
-    files = sorted(src.rglob("*.csv"))
-    if not files:
-        print(f"No hay contratos en {src}")
-        return
+    if args.in_process and not args.local_prices and not args.fetch_prices:
+        # Sin fuente de precios todo contrato saldría incompleto y se movería a FAIL
+        ap.error("--in-process requiere --local-prices o --fetch-prices")
+    if args.sleep is None:
+        # La pausa protegía a la API entre subprocesos; en proceso solo frena la corrida
+        args.sleep = 0.0 if args.in_process else 1.5
+    if args.dep_index and not args.in_process:
+        ap.error("--dep-index requiere --in-process")
+    if args.reprice_from and (not args.dep_index or not args.local_prices or args.fetch_prices):
+        ap.error("--reprice-from requiere --dep-index y --local-prices (sin --fetch-prices)")
+
+    if args.price_cache:
+        # CsfloatClient la toma del entorno, tanto en proceso como en cada subprocess del CLI
+        os.environ["CSFLOAT_PRICE_CACHE"] = str(Path(args.price_cache).resolve())
+    if args.rate_limit > 0:
+        # Igual que la caché: el limitador se comparte vía entorno con los subprocess del CLI
+        os.environ["CSFLOAT_RATE_LIMIT"] = str(args.rate_limit)
+        os.environ["CSFLOAT_RATE_LIMIT_FILE"] = str(Path(args.rate_limit_file).resolve())
+
+    # Evaluador en proceso: catálogo y precios se cargan una única vez
+    evaluator = None
+    memo = None
+    if args.in_process:
+        from tradeup.evaluator import Evaluator
+        from tradeup.cli import resolve_catalog_path
+        from tradeup.memo import OutcomeMemo
+
+        if args.extra_cli_flags:
+            print("[WARN] --extra-cli-flags se ignora con --in-process (usar --local-prices/--fetch-prices)")
+        memo_store = args.memo_store
+        if memo_store and args.fetch_prices:
+            # Los precios en vivo no tienen versión estable: el memo queda solo en memoria
+            print("[WARN] --memo-store se ignora con --fetch-prices (precios en vivo)")
+            memo_store = None
+        if args.memo_size > 0:
+            memo = OutcomeMemo(maxsize=args.memo_size, store_path=memo_store)
+        evaluator = Evaluator.from_paths(
+            resolve_catalog_path(args.catalog),
+            local_prices=None if args.fetch_prices else args.local_prices,
+            fetch_prices=args.fetch_prices,
+            fees_rate=args.fees,
+            memo=memo,
+        )
+    elif args.memo_store:
+        print("[WARN] --memo-store solo aplica con --in-process")
+
+    dep_index = None
+    if args.dep_index:
+        from tradeup.depindex import DependencyIndex
+
+        dep_index = DependencyIndex(args.dep_index)
+
+    # Shards empaquetados abiertos (lectura vía mmap) y shards de salida por estado
+    readers: Dict[Path, object] = {}
+    status_writers: Dict[Path, object] = {}
+    # Registros de cada shard de origen ya ubicados en OK/FAIL/ERROR: se saltean en la próxima corrida
+    consumed: Dict[Path, object] = {}
+    placed_since_flush = 0
+
+    def open_reader(shard: Path):
+        from tradeup.corpus import CorpusReader
+
+        reader = readers.get(shard)
+        if reader is None:
+            reader = readers[shard] = CorpusReader(shard, evaluator.catalog)
+        return reader
+
+    def open_consumed(shard: Path):
+        from tradeup.corpus import ConsumedRecords
+
+        done = consumed.get(shard)
+        if done is None:
+            done = consumed[shard] = ConsumedRecords(shard)
+        return done
+
+    def flush_placed() -> None:
+        """Flushea los shards por estado y recién después marca sus registros como consumidos."""
+        nonlocal placed_since_flush
+        for writer in status_writers.values():
+            writer.flush()
+        for done in consumed.values():
+            done.flush()
+        placed_since_flush = 0
+
+    # Trabajos: (archivo, ruta relativa, registro); para contratos empaquetados el archivo es el shard,
+    # el registro su índice y la ruta relativa es virtual (`<carpeta>/<shard>__<idx>.csv`, ver record_name)
+    if args.reprice_from:
+        from tradeup.depindex import price_diff
+        from tradeup.pricing import load_local_prices_csv
+
+        # Solo los contratos que dependen de algún precio cambiado, desde su ubicación actual
+        changed = price_diff(load_local_prices_csv(args.reprice_from), load_local_prices_csv(args.local_prices))
+        affected = dep_index.affected(changed)
+        jobs = []
+        for rel, loc, _ in affected:
+            shard, sep, k = loc.rpartition("#")
+            if sep and Path(shard).exists():
+                jobs.append((Path(shard), Path(rel), int(k)))
+            elif not sep and Path(loc).exists():
+                jobs.append((Path(loc), Path(rel), None))
+        print(f"[REPRICE] {len(changed)} precios cambiados → {len(affected)} contratos afectados ({len(jobs)} presentes)")
+        if not jobs:
+            dep_index.close()
+            return
+        n_jobs = len(jobs)
+    else:
+        files = sorted(src.rglob("*.csv"))
+        shards = sorted(src.rglob("*.tucorp"))
+        if shards and not args.in_process:
+            print(f"[WARN] {len(shards)} shards empaquetados se ignoran sin --in-process")
+            shards = []
+        if not files and not shards:
+            print(f"No hay contratos en {src}")
+            return
+        n_jobs = len(files) + sum(len(open_reader(sh)) - len(open_consumed(sh)) for sh in shards)
+
+        def iter_jobs():
+            from tradeup.corpus import record_name
+
+            for fp in files:
+                yield fp, fp.relative_to(src), None
+            for sh in shards:
+                parent = sh.relative_to(src).parent
+                done = open_consumed(sh)
+                for k in range(len(open_reader(sh))):
+                    if k not in done:
+                        yield sh, parent / record_name(sh, k), k
+
+        jobs = iter_jobs()
 
     if not log_path.exists():
         with log_path.open("w", encoding="utf-8", newline="") as f:
@@ -222,9 +421,8 @@ def main() -> None:
     # Locks para I/O concurrente
     io_lock = threading.Lock()
 
-    def process_one(fp: Path) -> None:
-        nonlocal total, ok_count, fail_count, error_count
-        rel = fp.relative_to(src)
+    def run_cli(fp: Path):
+        """Ejecuta tradeup.cli en un subproceso → (returncode, stdout, stderr, payload)."""
         cmd = [
             "python", "-m", "tradeup.cli",
             "--contract", str(fp),
@@ -235,19 +433,89 @@ def main() -> None:
         if args.extra_cli_flags:
             # En Windows, usar posix=False para no tratar '\\' como carácter de escape
             cmd.extend(shlex.split(args.extra_cli_flags, posix=False))
+        p = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=child_env,
+        )
+        stdout, stderr = p.stdout or "", p.stderr or ""
+        payload = last_json_from_stdout(stdout) if p.returncode == 0 else None
+        return p.returncode, stdout, stderr, payload, None
+
+    def run_in_process(fp: Path, record: Optional[int] = None):
+        """Evalúa con el Evaluator compartido → (returncode, stdout, stderr, payload, mhns).
+
+        Replica los códigos de salida de la CLI: 2 para errores de contrato/archivo, 1 para el resto.
+        `mhns` son los precios de los que depende el resultado (solo con --dep-index).
+        """
+        from tradeup.contracts import ContractValidationError
+        from tradeup.csv_loader import read_contract_csv
+        from tradeup.depindex import contract_mhns
+        from tradeup.evaluator import result_payload
+
+        try:
+            entries = open_reader(fp).entries(record) if record is not None else read_contract_csv(str(fp))
+            priced_inputs = [i for i, e in enumerate(entries) if e.price_cents is None]
+            res = evaluator.evaluate(entries)
+        except ContractValidationError as e:
+            return 2, "", f"Error de contrato: {e}", None, None
+        except FileNotFoundError as e:
+            return 2, "", f"Archivo no encontrado: {e}", None, None
+        except Exception as e:
+            return 1, "", f"Error no esperado: {e}\n{traceback.format_exc()}", None, None
+        payload = result_payload(res)
+        stdout = ""
+        if args.save_cli_output or args.echo_cli == "always":
+            stdout = json.dumps(payload, ensure_ascii=False, indent=2)
+        mhns = None
+        if dep_index is not None:
+            mhns = contract_mhns(entries, res.outcomes, entries[0].stattrak, priced_inputs)
+        return 0, stdout, "", payload, mhns
+
+    def place(fp: Path, rel: Path, record: Optional[int], dest_dir: Path) -> str:
+        """Mueve el contrato a `dest_dir` (o lo agrega al shard homónimo) → ubicación para el índice.
+
+        Llamar con `io_lock` tomado. Los registros empaquetados se ubican siempre por su shard de
+        origen (inmutable) y se marcan como consumidos en `<shard>.consumed`; con --reprice-from no
+        se vuelven a agregar a los shards por estado.
+        """
+        nonlocal placed_since_flush
+        if record is not None:
+            if not args.no_move and not args.reprice_from:
+                from tradeup.corpus import CorpusWriter
+
+                dest = dest_dir / rel
+                writer = status_writers.get(dest)
+                if writer is None:
+                    writer = status_writers[dest] = CorpusWriter(dest, evaluator.catalog)
+                writer.append_entries(open_reader(fp).entries(record))
+                open_consumed(fp).add(record)
+                placed_since_flush += 1
+                if placed_since_flush >= 1024:
+                    flush_placed()
+            return f"{fp.resolve()}#{record}"
+        dest = dest_dir / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if not args.no_move and fp.exists() and fp.resolve() != dest.resolve():
+            shutil.move(str(fp), str(dest))
+            return str(dest.resolve())
+        return str(fp.resolve())
+
+    def process_one(fp: Path, rel: Path, record: Optional[int] = None) -> None:
+        nonlocal total, ok_count, fail_count, error_count
+        # Los contratos empaquetados van al shard homónimo dentro de OK / FAIL / ERROR
+        dest_rel = rel.parent / fp.name if record is not None else rel
 
         attempts = 0
         while True:
             attempts += 1
-            p = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                env=child_env,
-            )
-            stdout, stderr = p.stdout or "", p.stderr or ""
+            if evaluator is not None:
+                returncode, stdout, stderr, payload, mhns = run_in_process(fp, record)
+            else:
+                returncode, stdout, stderr, payload, mhns = run_cli(fp)
 
             # Guardar CLI output si fue solicitado
             if args.save_cli_output:
@@ -259,8 +527,7 @@ def main() -> None:
                     out_path.write_text(stdout, encoding="utf-8", errors="ignore")
                     err_path.write_text(stderr, encoding="utf-8", errors="ignore")
 
-            if p.returncode == 0:
-                payload = last_json_from_stdout(stdout)
+            if returncode == 0:
                 if payload:
                     decision = payload.get("decision", "")
                     summary = payload.get("summary", {}) or {}
@@ -286,11 +553,10 @@ def main() -> None:
                         rentable = False
 
                     status = "OK" if rentable else "FAIL"
-                    dest = (ok if rentable else fail) / rel
                     with io_lock:
-                        dest.parent.mkdir(parents=True, exist_ok=True)
-                        if not args.no_move and fp.exists():
-                            shutil.move(str(fp), str(dest))
+                        location = place(fp, dest_rel, record, ok if rentable else fail)
+                        if dep_index is not None:
+                            dep_index.record(rel.as_posix(), location, status, mhns or ())
                         append_result_csv(
                             log_path, rel, decision, status,
                             total_cost, ev_gross, ev_net, pnl_net, roi_net, prob, be
@@ -323,7 +589,7 @@ def main() -> None:
                 else:
                     print(msg)
             else:
-                code, suggested, transitory = classify_error(stdout, stderr, p.returncode)
+                code, suggested, transitory = classify_error(stdout, stderr, returncode)
                 # Echo del CLI en error si corresponde
                 if args.echo_cli in ("always", "on_error"):
                     print(stdout)
@@ -338,7 +604,7 @@ def main() -> None:
                     time.sleep(max(0.0, sleep_for))
 
             # Manejo de reintentos
-            if p.returncode != 0 or code == "JSON_MISSING":
+            if returncode != 0 or code == "JSON_MISSING":
                 if transitory and attempts <= args.retries:
                     if code in ("TIMEOUT", "NETWORK", "UNKNOWN"):
                         sleep_for = args.backoff * (2 ** (attempts - 1))
@@ -355,14 +621,14 @@ def main() -> None:
                 with io_lock:
                     write_error_artifacts(err, rel, stdout, stderr)
                     append_error_csv(
-                        error_csv, rel, code, p.returncode,
+                        error_csv, rel, code, returncode,
                         reason=code, stdout=stdout, stderr=stderr,
                         retries_used=attempts-1,
                     )
-                    dest = err / rel
-                    dest.parent.mkdir(parents=True, exist_ok=True)
-                    if not args.no_move and fp.exists():
-                        shutil.move(str(fp), str(dest))
+                    location = place(fp, dest_rel, record, err)
+                    if dep_index is not None:
+                        # Un error no depende de precios: queda fuera de futuros --reprice-from
+                        dep_index.record(rel.as_posix(), location, "ERROR", ())
                     error_count += 1
                     err_tag = "[ERROR]" if args.no_emoji else "🟥"
                     msg = f"{err_tag} ERROR:{code} → {rel}"
@@ -389,47 +655,72 @@ def main() -> None:
         if args.rich and progress is not None:
             # Crear barra de progreso con total conocido
             with progress:
-                task_id = progress.add_task("eval", total=len(files))
+                task_id = progress.add_task("eval", total=n_jobs)
                 if args.workers <= 1:
-                    for fp in files:
-                        process_one(fp)
+                    for fp, rel, record in jobs:
+                        process_one(fp, rel, record)
                         if args.max and total >= args.max:
                             break
                 else:
                     with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
                         futures = []
-                        for fp in files:
+                        for fp, rel, record in jobs:
                             if args.max and total >= args.max:
                                 break
-                            futures.append(ex.submit(process_one, fp))
+                            futures.append(ex.submit(process_one, fp, rel, record))
                         for fut in as_completed(futures):
                             _ = fut.result()
                             if args.max and total >= args.max:
                                 break
         elif args.workers <= 1:
-            for fp in files:
-                process_one(fp)
+            for fp, rel, record in jobs:
+                process_one(fp, rel, record)
                 if args.max and total >= args.max:
                     break
         else:
             with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
                 futures = []
-                for fp in files:
+                for fp, rel, record in jobs:
                     if args.max and total >= args.max:
                         break
-                    futures.append(ex.submit(process_one, fp))
+                    futures.append(ex.submit(process_one, fp, rel, record))
                 for fut in as_completed(futures):
                     _ = fut.result()  # propagar excepciones si ocurrieran
                     if args.max and total >= args.max:
                         break
     except KeyboardInterrupt:
         print(f"\n[INTERRUPT] Cortado por usuario tras {total} contratos evaluados.")
+    finally:
+        if memo is not None:
+            memo.close()
+        if dep_index is not None:
+            dep_index.close()
+        flush_placed()
+        for writer in status_writers.values():
+            writer.close()
 
     summary = f"Evaluados {total} contratos. OK -> {ok_count}, FAIL -> {fail_count}, ERROR -> {error_count}. Log -> {log_path}"
     if console is not None:
         console.print(f"[bold green]{summary}[/bold green]")
     else:
         print(summary)
+    if memo is not None:
+        memo_line = f"[MEMO] {memo.summary()}"
+        if console is not None:
+            console.print(memo_line)
+        else:
+            print(memo_line)
+    client = evaluator.client if evaluator is not None else None
+    if client is not None:
+        st = client.stats
+        prices_line = (
+            f"[PRICES] CSFloat: {st['lookups']} consultas, {st['hits']} en memoria, "
+            f"{st['coalesced']} agrupadas (single-flight), {st['fetched']} resueltas (disco/API)"
+        )
+        if console is not None:
+            console.print(prices_line)
+        else:
+            print(prices_line)
 
 
 if __name__ == "__main__":
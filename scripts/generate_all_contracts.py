@@ -2,34 +2,69 @@
 # Genera TODAS las combinaciones con repetición (multisets) de 10 skins para una rareza,
 # usando TODAS las skins de TODAS las colecciones presentes en data/skins_fixed.csv.
 # Es 100% OFFLINE. Usa --offset/--limit para correr por tandas y no explotar el disco.
+# --offset salta directo al rango N (unrank, tradeup.multiset) sin recorrer las combinaciones previas.
+# --shards K --shard-index i genera solo el i-ésimo tramo contiguo del espacio de rangos; con
+# --workers N lo reparte en tramos de --slice-size entre N procesos y guarda un checkpoint
+# (checkpoint__<rarity>__shardIIIofKKK.json) para que una corrida interrumpida se reanude.
+# En ese modo, con --format packed cada tramo escribe su propio shard (contract__<rarity>__r<inicio>.tucorp).
+# Con --enforce-max-total/--min-total-usd las skins se ordenan por precio y la enumeración poda por
+# prefijo de costo (tradeup.multiset.iter_multisets_bounded): los subárboles que no pueden quedar
+# dentro de [piso, tope] no se recorren. El orden de rangos pasa a ser el de las skins por precio.
+# --compositions enumera composiciones por colección (cuántas entradas de cada una) en vez de
+# multisets de skins: el pool de outcomes solo depende de n_c y f_norm_avg, así que cada colección
+# aporta su entrada más barata (precios locales) en el wear del contrato → C(K+9,10) con K colecciones.
 #
 # Esquema EXACTO del CSV de salida:
 # Name,Collection,Rarity,Float,PriceCents,StatTrak
 # ... PriceCents vacío, StatTrak "true"/"false"
+# Con --format packed los contratos se escriben en un shard binario (tradeup.corpus), que se recrea
+# en cada corrida salvo con --append:
+#   <out-dir>/<rarity>/<ST|NoST>/contract__<rarity>.tucorp
 #
 # Floats:
 #   --float-mode mid   → punto medio del rango de cada skin (determinista)
 #   --float-mode fnorm → f = min + (max-min) * f_norm (un f_norm global por contrato)
+#   --fnorm-regimes    → un contrato por cada régimen de wears de outcomes de la combinación
+#                        (tramos exactos de f_norm_avg, ver tradeup.contracts.wear_breakpoints)
 #
 # Ejemplos:
 #   python generate_all_contracts.py --catalog data/skins_fixed.csv --rarity restricted --out-dir contracts/all --offset 0 --limit 100000
 #   python generate_all_contracts.py --catalog data/skins_fixed.csv --rarity restricted --stattrak --float-mode fnorm --fnorm 0.25 --limit 50000
+#   python generate_all_contracts.py --catalog data/skins_fixed.csv --rarity restricted --shards 8 --shard-index 0 --workers 4 --format packed
 
 from __future__ import annotations
 
 import argparse
 import csv
 import itertools
+import json
 import math
+import os
 import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Set
+from typing import Dict, Iterator, List, Tuple, Optional, Set
 from collections import defaultdict
 
 
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+from tradeup.catalog_snapshot import load_catalog, read_catalog_rows  # noqa: E402
+from tradeup.contracts import regime_representatives, wear_breakpoints  # noqa: E402
+from tradeup.corpus import CORPUS_SUFFIX, CorpusWriter  # noqa: E402
+from tradeup.csv_loader import Catalog  # noqa: E402
+from tradeup.multiset import iter_multisets, iter_multisets_bounded, multiset_count, shard_range  # noqa: E402
+from tradeup.registry import ItemRegistry, PriceTable, load_price_table  # noqa: E402
+
+
 def read_catalog(path: Path) -> List[Dict[str, str]]:
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        return list(csv.DictReader(f))
+    # Usa el snapshot compilado (python -m tradeup.cli compile-catalog) si está al día
+    return read_catalog_rows(path)
 
 
 def sanitize(s: str) -> str:
@@ -97,77 +132,54 @@ def wear_from_float(f: float) -> str:
     return "Field-Tested"  # fallback razonable
 
 
-def build_mhn(name: str, wear: str, stattrak: bool) -> str:
-    prefix = "StatTrak™ " if stattrak else ""
-    return f"{prefix}{name} ({wear})"
-
-
-def load_local_prices(path: Path) -> Dict[str, int]:
-    """Lee CSV MarketHashName,PriceCents → dict."""
+def load_local_prices(path: Path) -> PriceTable:
+    """Lee CSV MarketHashName,PriceCents (o Name,Wear,PriceCents[,StatTrak]) → PriceTable."""
     if not path.exists():
-        return {}
-    prices: Dict[str, int] = {}
-    with path.open("r", encoding="utf-8", newline="") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            mhn = (row.get("MarketHashName") or "").strip()
-            pc = row.get("PriceCents")
-            if not mhn or pc in (None, ""):
-                continue
-            try:
-                prices[mhn] = int(pc)
-            except Exception:
-                continue
-    return prices
-
-
-def main() -> None:
-    ap = argparse.ArgumentParser("Generador EXHAUSTIVO (multisets de 10) por rareza")
-    ap.add_argument("--catalog", required=True, help="Ruta a skins_fixed.csv")
-    ap.add_argument("--rarity", required=True, help="Rareza (ej: restricted|classified|covert)")
-    ap.add_argument("--stattrak", action="store_true", help="Si se setea, StatTrak=true en todas las entradas")
-    ap.add_argument(
-        "--float-mode",
-        choices=["mid", "fnorm"],
-        default="mid",
-        help="Cómo fijar el float de las entradas",
-    )
-    ap.add_argument("--fnorm", type=float, default=0.25, help="f_norm (0..1) si --float-mode fnorm")
-    ap.add_argument("--out-dir", default="contracts/all", help="Carpeta de salida")
-    ap.add_argument("--offset", type=int, default=0, help="Saltar los primeros N contratos")
-    ap.add_argument("--limit", type=int, default=0, help="Generar a lo sumo N contratos (0 = sin límite)")
-    # Nueva: tope de costo total y origen de precios locales
-    ap.add_argument(
-        "--enforce-max-total",
-        action="store_true",
-        help="Si se setea, descarta contratos cuyo costo total supere --max-total-usd (requiere --local-prices)",
-    )
-    ap.add_argument("--max-total-usd", type=float, default=200.0, help="Tope USD por contrato (0 = desactiva)")
-    ap.add_argument(
-        "--local-prices",
-        default="docs/local_prices_median7d_or_min.csv",
-        help="CSV MarketHashName,PriceCents para estimar costo total",
-    )
-    args = ap.parse_args()
-
+        return PriceTable(ItemRegistry())
+    return load_price_table(str(path))
+
+
+@dataclass
+class Plan:
+    """Estado preparado una vez por proceso: skins elegibles, precios y catálogo."""
+
+    rarity: str
+    skins: List[Dict[str, str]]
+    pre: List[Dict[str, object]]
+    price_map: PriceTable
+    catalog: Optional[Catalog]
+    base_out: Path
+    skin_ids: List[int]
+    # Tope/piso de costo total en centavos (None = sin límite) y costo por skin, ordenado de
+    # menor a mayor, cuando el float de cada skin es fijo (poda por prefijo en la enumeración)
+    cap_cents: Optional[int] = None
+    floor_cents: Optional[int] = None
+    costs: Optional[List[int]] = None
+    # --compositions con --fnorm-regimes: candidatas (fila, skin id) por colección; la más barata
+    # depende del wear de cada régimen y se elige al generar
+    members: Optional[List[List[Tuple[Dict[str, str], int]]]] = None
+    regimes_cache: Dict[Tuple[str, ...], List[float]] = field(default_factory=dict)
+    members_cache: Dict[Tuple[int, float], Optional[Tuple[Dict[str, str], int, float, int]]] = field(default_factory=dict)
+
+
+def prepare(args: argparse.Namespace, verbose: bool = True) -> Optional[Plan]:
+    """Filtra skins elegibles (colección con next tier, precio/tope) y carga lo necesario para generar."""
+    log = print if verbose else (lambda *a, **k: None)
     rows = read_catalog(Path(args.catalog))
     rarity = args.rarity.strip().lower()
-    if args.float_mode == "fnorm" and not (0.0 <= args.fnorm <= 1.0):
-        print(f"[EXH] Aviso: --fnorm {args.fnorm} fuera de [0,1]. Se recorta al rango.")
-        args.fnorm = max(0.0, min(1.0, args.fnorm))
 
     # Filtrar por rareza exacta
     skins = [r for r in rows if r.get("Grado", "").strip().lower() == rarity]
     S = len(skins)
     if not S:
-        print("No hay skins para la rareza indicada.")
-        return
+        log("No hay skins para la rareza indicada.")
+        return None
 
     # Validación fija: el rarity elegido debe tener upgrade posible
     next_rar = next_rarity_name(rarity)
     if next_rar is None:
-        print(f"[EXH] La rareza '{rarity}' no tiene nivel superior para trade-up. No se generarán contratos.")
-        return
+        log(f"[EXH] La rareza '{rarity}' no tiene nivel superior para trade-up. No se generarán contratos.")
+        return None
 
     # Índices por colección → rarezas presentes (para validar múltiples rangos y existencia de next tier)
     coll_to_rarities: Dict[str, Set[str]] = defaultdict(set)
@@ -184,27 +196,34 @@ def main() -> None:
             eligible_collections.add(coll)
 
     # Precios locales (opcional)
-    price_map: Dict[str, int] = {}
+    price_map: PriceTable = PriceTable(ItemRegistry())
+    cap_cents: Optional[int] = None
+    floor_cents: Optional[int] = None
     if args.enforce_max_total and args.max_total_usd and args.max_total_usd > 0:
+        cap_cents = int(round(args.max_total_usd * 100))
+    if args.min_total_usd and args.min_total_usd > 0:
+        floor_cents = int(round(args.min_total_usd * 100))
+    if args.compositions:
+        price_map = load_local_prices(Path(args.local_prices))
+        if not price_map:
+            log(f"[EXH] --compositions requiere precios locales y no se pudieron cargar de '{args.local_prices}'. Abortando.")
+            return None
+    elif cap_cents is not None or floor_cents is not None:
         price_map = load_local_prices(Path(args.local_prices))
         if not price_map:
-            print(
-                f"[EXH] Aviso: --enforce-max-total activo pero no se pudieron cargar precios locales de '{args.local_prices}'. Se desactiva el tope."
+            log(
+                f"[EXH] Aviso: tope/piso de costo activo pero no se pudieron cargar precios locales de '{args.local_prices}'. Se desactiva."
             )
-            args.enforce_max_total = False
+            cap_cents = floor_cents = None
+    bounded = cap_cents is not None or floor_cents is not None
 
     base_out = Path(args.out_dir) / sanitize(args.rarity) / ("ST" if args.stattrak else "NoST")
     base_out.mkdir(parents=True, exist_ok=True)
 
     total_multisets = math.comb(S + 10 - 1, 10)
-    print(f"[EXH] Rareza={args.rarity} | Skins={S} | Multisets(10)≈{total_multisets:,}")
+    log(f"[EXH] Rareza={args.rarity} | Skins={S} | Multisets(10)≈{total_multisets:,}")
 
     # Optimización: precomputar para cada skin si es elegible y su costo por ítem según float seleccionado
-    # Además, si hay tope de costo, filtrar skins cuyo precio por ítem > promedio permitido (max_total/10)
-    avg_cents_cap: Optional[int] = None
-    if args.enforce_max_total and args.max_total_usd and args.max_total_usd > 0:
-        avg_cents_cap = int(round((args.max_total_usd * 100.0) / 10.0))
-
     precomputed: List[Dict[str, object]] = []
     for r in skins:
         coll = (r.get("Coleccion") or "").strip()
@@ -213,17 +232,13 @@ def main() -> None:
         fmin, fmax = get_float_range(r)
         f = midpoint(fmin, fmax) if args.float_mode == "mid" else (fmin + (fmax - fmin) * args.fnorm)
         wear = wear_from_float(f)
-        # Si necesitamos costo, calcularlo una vez
+        # Si necesitamos costo, calcularlo una vez (con --fnorm-regimes el float varía por régimen)
         cents: Optional[int] = None
-        if args.enforce_max_total and price_map:
-            mhn = build_mhn(str(r.get("Arma") or "").strip(), wear, args.stattrak)
-            cents = price_map.get(mhn)
+        if (bounded or args.compositions) and not args.fnorm_regimes:
+            cents = price_map.price(str(r.get("Arma") or "").strip(), wear, args.stattrak)
             if cents is None:
                 # Si no hay precio para esta skin, no la consideramos para contratos con tope
                 continue
-            if avg_cents_cap is not None and cents > avg_cents_cap:
-                # Muy cara para cumplir el promedio objetivo
-                continue
         precomputed.append({
             "row": r,
             "float": f,
@@ -231,74 +246,449 @@ def main() -> None:
             "cents": cents,  # puede ser None si no se aplica tope
         })
 
+    if args.compositions and precomputed:
+        # El pool de outcomes solo depende de n_c y f_norm_avg: una entrada por colección (la más
+        # barata en su wear; con --fnorm-regimes se elige por régimen al generar)
+        by_coll: Dict[str, List[Dict[str, object]]] = {}
+        for x in precomputed:
+            by_coll.setdefault(str(x["row"]["Coleccion"]).strip(), []).append(x)  # type: ignore
+        if args.fnorm_regimes:
+            groups = [by_coll[c] for c in sorted(by_coll)]
+            precomputed = [g[0] for g in groups]
+        else:
+            precomputed = [min(by_coll[c], key=lambda x: int(x["cents"])) for c in sorted(by_coll)]  # type: ignore
+        log(
+            f"[EXH] Composiciones: {len(precomputed)} colecciones → {multiset_count(len(precomputed), 10):,} "
+            f"(en lugar de multisets de skins)"
+        )
+
+    costs: Optional[List[int]] = None
+    if bounded and not args.fnorm_regimes and precomputed:
+        # Una skin entra en algún contrato válido solo si, con las otras 9 al precio mínimo, no pasa el tope
+        min_cents = min(int(x["cents"]) for x in precomputed)  # type: ignore
+        if cap_cents is not None:
+            precomputed = [x for x in precomputed if int(x["cents"]) + 9 * min_cents <= cap_cents]  # type: ignore
+        # Orden por costo (estable): habilita la poda por prefijo de iter_multisets_bounded
+        precomputed.sort(key=lambda x: int(x["cents"]))  # type: ignore
+        costs = [int(x["cents"]) for x in precomputed]  # type: ignore
+
     if not precomputed:
-        print("[EXH] No hay skins elegibles tras validaciones de colección/precio. Abortando.")
-        return
+        log("[EXH] No hay skins elegibles tras validaciones de colección/precio. Abortando.")
+        return None
 
     # Reescribir 'skins' a la lista prefiltrada para acelerar combinaciones
     skins = [x["row"] for x in precomputed]  # type: ignore
-    pre_map = {id(x["row"]): x for x in precomputed}  # type: ignore
-    S = len(skins)
-    print(f"[EXH] Skins elegibles tras filtro: {S}")
+    log(f"[EXH] Skins elegibles tras filtro: {len(skins)}")
+
+    # --fnorm-regimes: f_norm representativos por conjunto de colecciones (cacheados)
+    catalog = load_catalog(args.catalog) if (args.fnorm_regimes or args.format == "packed") else None
+    skin_ids: List[int] = []
+    ids: Dict[Tuple[str, str], int] = {}
+    if args.format == "packed":
+        ids = {(it.name, it.collection): i for i, it in enumerate(catalog.items)}
+        skin_ids = [ids[(str(r["Arma"]).strip(), str(r["Coleccion"]).strip())] for r in skins]
+    members: Optional[List[List[Tuple[Dict[str, str], int]]]] = None
+    if args.compositions and args.fnorm_regimes:
+        members = [
+            [(x["row"], ids.get((str(x["row"]["Arma"]).strip(), str(x["row"]["Coleccion"]).strip()), -1)) for x in g]  # type: ignore
+            for g in groups
+        ]
+    return Plan(
+        rarity, skins, precomputed, price_map, catalog, base_out, skin_ids, cap_cents, floor_cents, costs, members
+    )
 
-    seen = 0
+
+def cheapest_member(
+    plan: Plan, idx: int, u: float, stattrak: bool
+) -> Optional[Tuple[Dict[str, str], int, float, int]]:
+    """(fila, skin id, float, centavos) de la entrada con precio más barata de la colección idx en f_norm u."""
+    key = (idx, u)
+    if key in plan.members_cache:
+        return plan.members_cache[key]
+    best: Optional[Tuple[Dict[str, str], int, float, int]] = None
+    for row, sid in plan.members[idx]:  # type: ignore
+        fmin, fmax = get_float_range(row)
+        f = fmin + (fmax - fmin) * u
+        cents = plan.price_map.price(str(row.get("Arma") or "").strip(), wear_from_float(f), stattrak)
+        if cents is not None and (best is None or cents < best[3]):
+            best = (row, sid, f, cents)
+    plan.members_cache[key] = best
+    return best
+
+
+def generate_range(
+    plan: Plan,
+    args: argparse.Namespace,
+    start: int,
+    stop: int,
+    limit: int = 0,
+    shard_path: Optional[Path] = None,
+    fresh_shard: bool = False,
+    verbose: bool = True,
+) -> Tuple[int, int, int, bool]:
+    """Genera los contratos de los multisets con rango en [start, stop).
+
+    Devuelve (generados, podados, descartados, cortó por limit): podados son los multisets del rango
+    que la poda por prefijo de costo nunca construyó; descartados, los contratos armados y
+    rechazados después (precio faltante o costo total fuera de rango con --fnorm-regimes).
+
+    El rango es el índice de la combinación en el orden de `itertools.combinations_with_replacement`
+    sobre las skins elegibles; la enumeración arranca directo en `start` (unrank), sin recorrer las previas.
+    """
+    skins = plan.skins
+    writer: Optional[CorpusWriter] = None
+    cost_check = plan.cap_cents is not None or plan.floor_cents is not None
+    if plan.costs is not None:
+        # Costos fijos por skin: solo se recorren los subárboles que pueden cumplir tope y piso
+        walk = iter_multisets_bounded(plan.costs, 10, plan.floor_cents, plan.cap_cents, start, stop)
+    else:
+        walk = iter_multisets(len(skins), 10, start, stop)
     generated = 0
-    for combo in itertools.combinations_with_replacement(range(S), 10):
-        if seen < args.offset:
-            seen += 1
-            continue
-        seen += 1
-
-        rows_out: List[List[str]] = []
-        # Validaciones por contrato
-        skip = False
-        total_cents = 0
-        for idx in combo:
-            row = skins[idx]
-            # Usar precomputado
-            meta = pre_map.get(id(row))
-            f = float(meta["float"]) if meta else midpoint(*get_float_range(row))  # type: ignore
-            cents = meta.get("cents") if meta else None  # type: ignore
-
-            if args.enforce_max_total and price_map:
-                if cents is None:
-                    skip = True
-                    break
-                total_cents += int(cents)
-
-            rows_out.append(
-                [
-                    row["Arma"],
-                    row["Coleccion"],
-                    row["Grado"],
-                    f"{f:.12f}",
-                    "",
-                    "true" if args.stattrak else "false",
-                ]
-            )
+    discarded = 0
+    candidates = 0
+    covered = stop
 
-        if skip:
-            continue
+    def pruned() -> int:
+        return max(0, covered - start) - candidates
 
-        if args.enforce_max_total and args.max_total_usd and (total_cents > int(round(args.max_total_usd * 100))):
-            # Excede el tope
-            continue
+    try:
+        for rank, combo in walk:
+            candidates += 1
+            if args.fnorm_regimes:
+                colls = tuple(sorted({skins[idx]["Coleccion"] for idx in combo}))
+                fnorms = plan.regimes_cache.get(colls)
+                if fnorms is None:
+                    fnorms = regime_representatives(wear_breakpoints(colls, plan.rarity, plan.catalog))
+                    plan.regimes_cache[colls] = fnorms
+                variants: List[Tuple[str, Optional[float]]] = [(f"__r{k:02d}", u) for k, u in enumerate(fnorms)]
+            else:
+                variants = [("", None)]
+
+            for suffix, u in variants:
+                rows_out: List[List[str]] = []
+                ids_out: List[int] = []
+                # Validaciones por contrato
+                skip = False
+                total_cents = 0
+                for idx in combo:
+                    row = skins[idx]
+                    sid = plan.skin_ids[idx] if plan.skin_ids else -1
+                    if u is None:
+                        # Usar precomputado
+                        meta = plan.pre[idx]
+                        f = float(meta["float"])  # type: ignore
+                        cents = meta.get("cents")  # type: ignore
+                    elif plan.members is not None:
+                        # Composición: la entrada más barata de la colección en el wear de este régimen
+                        picked = cheapest_member(plan, idx, u, args.stattrak)
+                        if picked is None:
+                            skip = True
+                            break
+                        row, sid, f, cents = picked
+                    else:
+                        fmin, fmax = get_float_range(row)
+                        f = fmin + (fmax - fmin) * u
+                        cents = None
+                        if cost_check:
+                            cents = plan.price_map.price(str(row.get("Arma") or "").strip(), wear_from_float(f), args.stattrak)
+
+                    ids_out.append(sid)
+                    if cost_check:
+                        if cents is None:
+                            skip = True
+                            break
+                        total_cents += int(cents)
+
+                    rows_out.append(
+                        [
+                            row["Arma"],
+                            row["Coleccion"],
+                            row["Grado"],
+                            f"{f:.12f}",
+                            "",
+                            "true" if args.stattrak else "false",
+                        ]
+                    )
+
+                if skip:
+                    discarded += 1
+                    continue
+
+                if (plan.cap_cents is not None and total_cents > plan.cap_cents) or (
+                    plan.floor_cents is not None and total_cents < plan.floor_cents
+                ):
+                    # Fuera del rango de costo total
+                    discarded += 1
+                    continue
+
+                if shard_path is not None:
+                    if writer is None:
+                        writer = CorpusWriter(shard_path, plan.catalog, truncate=fresh_shard)
+                    # Mismo float que el CSV (12 decimales), para que ambos formatos evalúen igual
+                    writer.append(ids_out, [float(r[3]) for r in rows_out], args.stattrak)
+                else:
+                    fname = f"contract__{sanitize(args.rarity)}__{rank}{suffix}.csv"
+                    with (plan.base_out / fname).open("w", encoding="utf-8", newline="") as f:
+                        w = csv.writer(f)
+                        w.writerow(["Name", "Collection", "Rarity", "Float", "PriceCents", "StatTrak"])
+                        w.writerows(rows_out)
+
+                generated += 1
+                if limit and generated >= limit:
+                    covered = rank + 1
+                    return generated, pruned(), discarded, True
+
+                if verbose and generated % 1000 == 0:
+                    print(f"[EXH] Progreso: {generated} generados (offset={args.offset})")
+    finally:
+        if writer is not None:
+            writer.close()
+    return generated, pruned(), discarded, False
+
+
+# --- Generación por tramos de rango (--shards / --workers) con checkpoints ---
+
+_PLAN: Optional[Plan] = None
+_ARGS: Optional[argparse.Namespace] = None
+
+
+def _init_worker(args: argparse.Namespace) -> None:
+    global _PLAN, _ARGS
+    _ARGS = args
+    _PLAN = prepare(args, verbose=False)
+
+
+def _slice_shard_path(plan: Plan, args: argparse.Namespace, start: int) -> Optional[Path]:
+    if args.format != "packed":
+        return None
+    return plan.base_out / f"contract__{sanitize(args.rarity)}__r{start:020d}{CORPUS_SUFFIX}"
+
+
+def _run_slice(start: int, stop: int) -> Tuple[int, int, int, int, int]:
+    """Tramo [start, stop) en un worker → (start, stop, generados, podados, descartados).
+
+    Rehacer un tramo es idempotente.
+    """
+    plan, args = _PLAN, _ARGS
+    generated, pruned, discarded, _ = generate_range(
+        plan, args, start, stop, shard_path=_slice_shard_path(plan, args, start), fresh_shard=True, verbose=False
+    )
+    return start, stop, generated, pruned, discarded
+
+
+class Checkpoint:
+    """Tramos completados de un shard de rangos, persistidos en JSON (escritura atómica).
+
+    `watermark` es el inicio del primer tramo no completado; `done` guarda los tramos
+    completados fuera de orden (con varios workers terminan desordenados).
+    """
+
+    def __init__(self, path: Path, lo: int, hi: int, slice_size: int, signature: str) -> None:
+        self.path = path
+        self.lo, self.hi, self.slice_size, self.signature = lo, hi, slice_size, signature
+        self.watermark = lo
+        self.done: Dict[int, int] = {}
+        self.generated = 0
+        self.pruned = 0
+        self.discarded = 0
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            if [data.get("lo"), data.get("hi"), data.get("slice_size"), data.get("signature")] == [
+                str(lo), str(hi), slice_size, signature
+            ]:
+                self.watermark = int(data["watermark"])
+                self.done = {int(k): int(v) for k, v in data.get("done", {}).items()}
+                self.generated = int(data.get("generated", 0))
+                self.pruned = int(data.get("pruned", 0))
+                self.discarded = int(data.get("discarded", 0))
+            else:
+                print(f"[EXH] Aviso: checkpoint {path} es de otra corrida (rango/parámetros). Se ignora.")
+
+    def pending(self) -> Iterator[Tuple[int, int]]:
+        s = self.watermark
+        while s < self.hi:
+            e = min(self.hi, s + self.slice_size)
+            if s not in self.done:
+                yield s, e
+            s = e
+
+    def complete(self, start: int, stop: int, generated: int, pruned: int = 0, discarded: int = 0) -> None:
+        self.done[start] = stop
+        self.generated += generated
+        self.pruned += pruned
+        self.discarded += discarded
+        while self.watermark in self.done:
+            self.watermark = self.done.pop(self.watermark)
+        self.save()
+
+    def save(self) -> None:
+        data = {
+            "lo": str(self.lo),
+            "hi": str(self.hi),
+            "slice_size": self.slice_size,
+            "signature": self.signature,
+            "watermark": self.watermark,
+            "done": {str(k): v for k, v in self.done.items()},
+            "generated": self.generated,
+            "pruned": self.pruned,
+            "discarded": self.discarded,
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def run_sliced(plan: Plan, args: argparse.Namespace, lo: int, hi: int) -> None:
+    """Recorre [lo, hi) en tramos de --slice-size, en --workers procesos, con checkpoint para reanudar."""
+    # Los parámetros que cambian el contenido de un tramo invalidan el checkpoint
+    signature = "|".join(
+        str(x)
+        for x in (
+            len(plan.skins), args.stattrak, args.float_mode, args.fnorm, args.fnorm_regimes, args.format, args.compositions,
+            args.enforce_max_total, args.max_total_usd, args.min_total_usd,
+        )
+    )
+    ck_path = plan.base_out / f"checkpoint__{sanitize(args.rarity)}__shard{args.shard_index:03d}of{args.shards:03d}.json"
+    ck = Checkpoint(ck_path, lo, hi, max(1, args.slice_size), signature)
+    if ck.watermark > lo or ck.done:
+        print(f"[EXH] Reanudando desde rango {ck.watermark:,} ({ck.generated} generados previos). Checkpoint: {ck_path}")
+    pending = ck.pending()
+
+    def report(start: int, stop: int, generated: int, pruned: int, discarded: int) -> None:
+        ck.complete(start, stop, generated, pruned, discarded)
+        print(f"[EXH] Tramo [{start:,}, {stop:,}) → {generated} contratos (acumulado {ck.generated}, próximo rango {ck.watermark:,})")
+
+    if args.workers <= 1:
+        _init_worker(args)
+        for start, stop in pending:
+            report(*_run_slice(start, stop))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args,)) as ex:
+            # A lo sumo 2 tramos en vuelo por worker: el espacio de rangos puede ser enorme
+            inflight = {ex.submit(_run_slice, s, e) for s, e in itertools.islice(pending, 2 * args.workers)}
+            while inflight:
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    report(*fut.result())
+                for s, e in itertools.islice(pending, len(finished)):
+                    inflight.add(ex.submit(_run_slice, s, e))
+    print(f"[EXH] Generados {ck.generated} contratos en {plan.base_out} (rangos [{lo:,}, {hi:,}))")
+    print_cost_stats(plan, ck.pruned, ck.discarded, ck.generated)
+
+
+def print_cost_stats(plan: Plan, pruned: int, discarded: int, generated: int) -> None:
+    if plan.cap_cents is None and plan.floor_cents is None:
+        return
+    print(f"[EXH] Costo total: podados {pruned:,} multisets sin construir, descartados {discarded:,}, emitidos {generated:,}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser("Generador EXHAUSTIVO (multisets de 10) por rareza")
+    ap.add_argument("--catalog", required=True, help="Ruta a skins_fixed.csv")
+    ap.add_argument("--rarity", required=True, help="Rareza (ej: restricted|classified|covert)")
+    ap.add_argument("--stattrak", action="store_true", help="Si se setea, StatTrak=true en todas las entradas")
+    ap.add_argument(
+        "--float-mode",
+        choices=["mid", "fnorm"],
+        default="mid",
+        help="Cómo fijar el float de las entradas",
+    )
+    ap.add_argument("--fnorm", type=float, default=0.25, help="f_norm (0..1) si --float-mode fnorm")
+    ap.add_argument(
+        "--fnorm-regimes",
+        action="store_true",
+        help=(
+            "En vez de un único --fnorm, genera un contrato por cada régimen de wears de outcomes "
+            "(implica --float-mode fnorm; el f_norm de cada régimen es su extremo superior)"
+        ),
+    )
+    ap.add_argument(
+        "--compositions",
+        action="store_true",
+        help=(
+            "Enumera composiciones de 10 por colección (n_c) en vez de multisets de skins: cada colección "
+            "aporta su entrada más barata en el wear del contrato (requiere --local-prices)"
+        ),
+    )
+    ap.add_argument("--out-dir", default="contracts/all", help="Carpeta de salida")
+    ap.add_argument(
+        "--format",
+        choices=["csv", "packed"],
+        default="csv",
+        help="csv = un archivo por contrato; packed = un shard binario append-only (.tucorp)",
+    )
+    ap.add_argument(
+        "--append",
+        action="store_true",
+        help="Con --format packed, agregar al shard existente en vez de recrearlo (p.ej. tandas con otro --offset)",
+    )
+    ap.add_argument("--offset", type=int, default=0, help="Empezar en la combinación de rango N (salto directo)")
+    ap.add_argument("--limit", type=int, default=0, help="Generar a lo sumo N contratos (0 = sin límite)")
+    ap.add_argument("--shards", type=int, default=1, help="Partir el espacio de rangos en K shards contiguos")
+    ap.add_argument("--shard-index", type=int, default=0, help="Shard a generar (0..K-1)")
+    ap.add_argument("--workers", type=int, default=1, help="Procesos en paralelo (con checkpoint para reanudar)")
+    ap.add_argument("--slice-size", type=int, default=100000, help="Rangos por tramo de trabajo/checkpoint")
+    # Nueva: tope de costo total y origen de precios locales
+    ap.add_argument(
+        "--enforce-max-total",
+        action="store_true",
+        help=(
+            "Si se setea, descarta contratos cuyo costo total supere --max-total-usd (requiere --local-prices). "
+            "Las skins se ordenan por precio y se podan subárboles completos que no pueden cumplirlo"
+        ),
+    )
+    ap.add_argument("--max-total-usd", type=float, default=200.0, help="Tope USD por contrato (0 = desactiva)")
+    ap.add_argument(
+        "--min-total-usd",
+        type=float,
+        default=0.0,
+        help="Piso USD de costo total por contrato, con la misma poda que el tope (0 = desactiva)",
+    )
+    ap.add_argument(
+        "--local-prices",
+        default="docs/local_prices_median7d_or_min.csv",
+        help="CSV MarketHashName,PriceCents para estimar costo total",
+    )
+    args = ap.parse_args()
 
-        fname = f"contract__{sanitize(args.rarity)}__{seen-1}.csv"
-        with (base_out / fname).open("w", encoding="utf-8", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["Name", "Collection", "Rarity", "Float", "PriceCents", "StatTrak"])
-            w.writerows(rows_out)
+    if args.shards < 1 or not (0 <= args.shard_index < args.shards):
+        ap.error("--shard-index debe estar en 0..--shards-1")
+    sliced = args.shards > 1 or args.workers > 1
+    if sliced and args.limit:
+        ap.error("--limit no se combina con --shards/--workers (acotar con --offset y --shards)")
 
-        generated += 1
-        if args.limit and generated >= args.limit:
-            print(f"[EXH] STOP: limit alcanzado ({generated}). Carpeta: {base_out}")
-            return
+    if args.fnorm_regimes:
+        args.float_mode = "fnorm"
+    if args.float_mode == "fnorm" and not (0.0 <= args.fnorm <= 1.0):
+        print(f"[EXH] Aviso: --fnorm {args.fnorm} fuera de [0,1]. Se recorta al rango.")
+        args.fnorm = max(0.0, min(1.0, args.fnorm))
 
-        if generated % 1000 == 0:
-            print(f"[EXH] Progreso: {generated} generados (offset={args.offset})")
+    plan = prepare(args)
+    if plan is None:
+        return
 
-    print(f"[EXH] Generados {generated} contratos en {base_out}")
+    total = multiset_count(len(plan.skins), 10)
+    start = min(max(0, args.offset), total)
+    lo, hi = shard_range(start, total, args.shards, args.shard_index)
+    if sliced:
+        print(f"[EXH] Shard {args.shard_index + 1}/{args.shards}: rangos [{lo:,}, {hi:,}) con {args.workers} worker(s)")
+        run_sliced(plan, args, lo, hi)
+        return
+
+    shard_path = plan.base_out / f"contract__{sanitize(args.rarity)}{CORPUS_SUFFIX}" if args.format == "packed" else None
+    if shard_path is not None:
+        print(f"[EXH] Shard: {shard_path}")
+    generated, pruned, discarded, hit_limit = generate_range(
+        plan, args, lo, hi, limit=args.limit, shard_path=shard_path, fresh_shard=not args.append
+    )
+    if hit_limit:
+        print(f"[EXH] STOP: limit alcanzado ({generated}). Carpeta: {plan.base_out}")
+    else:
+        print(f"[EXH] Generados {generated} contratos en {plan.base_out}")
+    print_cost_stats(plan, pruned, discarded, generated)
 
 
 if __name__ == "__main__":
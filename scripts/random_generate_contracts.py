@@ -5,10 +5,15 @@
 # Esquema EXACTO del CSV de salida:
 # Name,Collection,Rarity,Float,PriceCents,StatTrak
 # ... PriceCents vacío, StatTrak "true"/"false"
+# Con --format packed los contratos se escriben en shards binarios (tradeup.corpus), uno por carpeta,
+# que se recrean en cada corrida salvo con --append:
+#   <out-dir>/<rarity>/<ST|NoST>/<k>c/contract__rand.tucorp
 #
 # Ejemplos:
 #   python random_generate_contracts.py --catalog data/skins_fixed.csv --rarity restricted --n 10000 --collections-min 1 --collections-max 3 --float-mode beta --beta-a 2 --beta-b 2
 #   python random_generate_contracts.py --catalog data/skins_fixed.csv --rarity restricted --n 10000 --float-mode fnorm --fnorm-values 0.12,0.25,0.60 --fnorm-per contract --st both
+#   python random_generate_contracts.py --catalog data/skins_fixed.csv --rarity restricted --n 10000 --fnorm-regimes
+#     (un contrato por cada régimen de wears de outcomes de cada selección, en vez de --fnorm-values)
 
 from __future__ import annotations
 
@@ -16,13 +21,25 @@ import argparse
 import csv
 import random
 import re
+import sys
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 
 
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+from tradeup.catalog_snapshot import load_catalog, read_catalog_rows  # noqa: E402
+from tradeup.contracts import regime_representatives, wear_breakpoints  # noqa: E402
+from tradeup.corpus import CORPUS_SUFFIX, CorpusWriter  # noqa: E402
+from tradeup.registry import ItemRegistry, PriceTable, load_price_table  # noqa: E402
+
+
 def read_catalog(path: Path) -> List[Dict[str, str]]:
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        return list(csv.DictReader(f))
+    # Usa el snapshot compilado (python -m tradeup.cli compile-catalog) si está al día
+    return read_catalog_rows(path)
 
 
 def sanitize(s: str) -> str:
@@ -106,45 +123,11 @@ def wear_from_float_value(f: float) -> str:
     return "Field-Tested"
 
 
-def build_mhn(name: str, wear: str, stattrak: bool) -> str:
-    return ("StatTrak™ " if stattrak else "") + f"{name} ({wear})"
-
-
-def load_local_prices(path: Path) -> Dict[str, int]:
-    prices: Dict[str, int] = {}
+def load_local_prices(path: Path) -> PriceTable:
+    # Admite MarketHashName,PriceCents y Name,Wear,PriceCents[,StatTrak]
     if not path.exists():
-        return prices
-    with path.open("r", encoding="utf-8", newline="") as f:
-        r = csv.DictReader(f)
-        # Admitir ambos formatos, pero acá sólo usamos MarketHashName si está
-        fields = set(r.fieldnames or [])
-        if {"MarketHashName", "PriceCents"}.issubset(fields):
-            for row in r:
-                mhn = (row.get("MarketHashName") or "").strip()
-                pc = (row.get("PriceCents") or "").strip()
-                if not mhn or not pc:
-                    continue
-                try:
-                    prices[mhn] = int(pc)
-                except Exception:
-                    pass
-        else:
-            # Intentar Name/Wear/PriceCents[,StatTrak]
-            f.seek(0)
-            r = csv.DictReader(f)
-            for row in r:
-                name = (row.get("Name") or "").strip()
-                wear = (row.get("Wear") or "").strip()
-                pc = (row.get("PriceCents") or "").strip()
-                if not name or not wear or not pc:
-                    continue
-                st_raw = (row.get("StatTrak") or "").strip().lower()
-                st = st_raw in {"1", "true", "t", "yes", "y"}
-                try:
-                    prices[build_mhn(name, wear, st)] = int(pc)
-                except Exception:
-                    pass
-    return prices
+        return PriceTable(ItemRegistry())
+    return load_price_table(str(path))
 
 
 def main() -> None:
@@ -163,8 +146,27 @@ def main() -> None:
     ap.add_argument("--beta-b", type=float, default=2.0, help="beta para beta")
     ap.add_argument("--fnorm-values", default="0.12,0.25,0.60", help="Lista de f_norm (0..1) si modo=fnorm")
     ap.add_argument("--fnorm-per", choices=["contract", "entry"], default="contract", help="Elegir f_norm por contrato o por entrada")
+    ap.add_argument(
+        "--fnorm-regimes",
+        action="store_true",
+        help=(
+            "Por cada selección de skins, un contrato por régimen de wears de outcomes "
+            "(implica --float-mode fnorm --fnorm-per contract; ignora --fnorm-values)"
+        ),
+    )
     ap.add_argument("--seed", type=int, default=42, help="Semilla RNG")
     ap.add_argument("--out-dir", default="contracts/random", help="Carpeta de salida")
+    ap.add_argument(
+        "--format",
+        choices=["csv", "packed"],
+        default="csv",
+        help="csv = un archivo por contrato; packed = un shard binario append-only (.tucorp) por carpeta",
+    )
+    ap.add_argument(
+        "--append",
+        action="store_true",
+        help="Con --format packed, agregar a los shards existentes en vez de recrearlos",
+    )
     # Tope/cota de costo total con precios locales
     ap.add_argument("--enforce-total-range", action="store_true", help="Enforce rango de costo total con precios locales")
     ap.add_argument("--min-total-usd", type=float, default=0.0, help="Costo total mínimo USD (0=sin mínimo)")
@@ -176,6 +178,12 @@ def main() -> None:
 
     rows = read_catalog(Path(args.catalog))
     rarity = args.rarity.strip().lower()
+    if args.fnorm_regimes:
+        args.float_mode = "fnorm"
+        args.fnorm_per = "contract"
+    catalog = load_catalog(args.catalog) if (args.fnorm_regimes or args.format == "packed") else None
+    writers: Dict[Path, CorpusWriter] = {}
+    regimes_cache: Dict[Tuple[str, ...], List[float]] = {}
 
     # Skins agrupadas por colección (para variedad "real")
     by_coll: Dict[str, List[Dict[str, str]]] = {}
@@ -192,7 +200,7 @@ def main() -> None:
     base_out.mkdir(parents=True, exist_ok=True)
 
     # Cargar precios si hay enforcement
-    prices_by_mhn: Dict[str, int] = {}
+    prices_by_mhn: PriceTable = PriceTable(ItemRegistry())
     min_cents = int(round(args.min_total_usd * 100)) if args.min_total_usd and args.min_total_usd > 0 else None  # type: ignore
     max_cents = int(round(args.max_total_usd * 100)) if args.max_total_usd and args.max_total_usd > 0 else None  # type: ignore
     if args.enforce_total_range and (min_cents or max_cents):
@@ -252,26 +260,46 @@ def main() -> None:
         if not out_dir.exists():
             out_dir.mkdir(parents=False, exist_ok=True)
 
-        cached_contract_fnorm: Optional[float] = None
-        if args.float_mode == "fnorm" and args.fnorm_per == "contract":
-            cached_contract_fnorm = random.choice(f_norm_choices)
-
-        rows_out: List[List[str]] = []
-        total_cents = 0
-        missing_price = False
-        for coll, cnt in zip(chosen_cols, counts):
-            skins_list = by_coll[coll]
-            for _ in range(cnt):
-                row = random.choice(skins_list)
-                f = sample_float(
-                    row,
-                    args.float_mode,
-                    args.beta_a,
-                    args.beta_b,
-                    f_norm_choices,
-                    args.fnorm_per,
-                    cached_contract_fnorm,
-                )
+        # Cada variante es una lista (fila, float) que se escribe como un contrato
+        variants: List[List[Tuple[Dict[str, str], float]]] = []
+        if args.fnorm_regimes:
+            picked = [random.choice(by_coll[coll]) for coll, cnt in zip(chosen_cols, counts) for _ in range(cnt)]
+            key = tuple(sorted(chosen_cols))
+            fnorms = regimes_cache.get(key)
+            if fnorms is None:
+                fnorms = regime_representatives(wear_breakpoints(key, rarity, catalog))
+                regimes_cache[key] = fnorms
+            for u in fnorms:
+                variants.append([(row, sample_float(row, "fnorm", 0.0, 0.0, [u], "contract", u)) for row in picked])
+        else:
+            cached_contract_fnorm: Optional[float] = None
+            if args.float_mode == "fnorm" and args.fnorm_per == "contract":
+                cached_contract_fnorm = random.choice(f_norm_choices)
+
+            entries_f: List[Tuple[Dict[str, str], float]] = []
+            for coll, cnt in zip(chosen_cols, counts):
+                skins_list = by_coll[coll]
+                for _ in range(cnt):
+                    row = random.choice(skins_list)
+                    f = sample_float(
+                        row,
+                        args.float_mode,
+                        args.beta_a,
+                        args.beta_b,
+                        f_norm_choices,
+                        args.fnorm_per,
+                        cached_contract_fnorm,
+                    )
+                    entries_f.append((row, f))
+            variants.append(entries_f)
+
+        for entries_f in variants:
+            if generated >= args.n:
+                break
+            rows_out: List[List[str]] = []
+            total_cents = 0
+            missing_price = False
+            for row, f in entries_f:
                 rows_out.append(
                     [
                         row["Arma"],
@@ -284,32 +312,46 @@ def main() -> None:
                 )
                 if args.enforce_total_range and prices_by_mhn:
                     wear = wear_from_float_value(f)
-                    mhn = build_mhn(str(row["Arma"]).strip(), wear, is_st)
-                    pc = prices_by_mhn.get(mhn)
+                    pc = prices_by_mhn.price(str(row["Arma"]).strip(), wear, is_st)
                     if pc is None:
                         missing_price = True
                     else:
                         total_cents += int(pc)
 
-        # Enforcement de rango de costo total si corresponde
-        if args.enforce_total_range and prices_by_mhn:
-            if missing_price:
-                attempts += 1
-                continue
-            if (min_cents is not None and total_cents < min_cents) or (max_cents is not None and total_cents > max_cents):
-                attempts += 1
-                continue
-
-        fname = f"contract__rand__{generated:07d}.csv"
-        with (out_dir / fname).open("w", encoding="utf-8", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["Name", "Collection", "Rarity", "Float", "PriceCents", "StatTrak"])
-            w.writerows(rows_out)
-
-        generated += 1
-        if generated % 1000 == 0:
-            print(f"[RND] Generados {generated}/{args.n}")
+            # Enforcement de rango de costo total si corresponde
+            if args.enforce_total_range and prices_by_mhn:
+                if missing_price:
+                    attempts += 1
+                    continue
+                if (min_cents is not None and total_cents < min_cents) or (max_cents is not None and total_cents > max_cents):
+                    attempts += 1
+                    continue
 
+            if args.format == "packed":
+                writer = writers.get(out_dir)
+                if writer is None:
+                    writer = writers[out_dir] = CorpusWriter(
+                        out_dir / f"contract__rand{CORPUS_SUFFIX}", catalog, truncate=not args.append
+                    )
+                # Mismo float que el CSV (12 decimales), para que ambos formatos evalúen igual
+                writer.append(
+                    [writer.skin_id(str(r[0]).strip(), str(r[1]).strip()) for r in rows_out],
+                    [float(r[3]) for r in rows_out],
+                    is_st,
+                )
+            else:
+                fname = f"contract__rand__{generated:07d}.csv"
+                with (out_dir / fname).open("w", encoding="utf-8", newline="") as f:
+                    w = csv.writer(f)
+                    w.writerow(["Name", "Collection", "Rarity", "Float", "PriceCents", "StatTrak"])
+                    w.writerows(rows_out)
+
+            generated += 1
+            if generated % 1000 == 0:
+                print(f"[RND] Generados {generated}/{args.n}")
+
+    for writer in writers.values():
+        writer.close()
     print(f"[RND] Generados {generated} contratos en {base_out}")
 
 
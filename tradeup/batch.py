@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .contracts import ContractValidationError, validate_entries, fill_ranges_from_catalog, wear_thresholds
+from .csv_loader import Catalog
+from .models import ContractEntry, RARITY_NEXT, WEAR_BUCKETS, wear_from_float
+from .registry import PriceTable
+
+
+# Índice de wear "Unknown" en las tablas (los buckets válidos son 0..4)
+WEAR_UNKNOWN = len(WEAR_BUCKETS)
+
+
+@dataclass
+class ContractBatch:
+    """Contratos empaquetados como arrays.
+
+    - `coll_ids`: id de colección de cada entrada (N, 10).
+    - `f_norm`: float normalizado de cada entrada respecto de su rango (N, 10).
+    - `total_cost`: costo total de entradas en centavos (N,), NaN si falta algún precio.
+    - `valid`: máscara de contratos válidos para el tier del evaluador (N,).
+    """
+
+    coll_ids: np.ndarray
+    f_norm: np.ndarray
+    total_cost: np.ndarray
+    valid: np.ndarray
+    n_collections: int
+
+    def __len__(self) -> int:
+        return int(self.coll_ids.shape[0])
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Matriz contrato×colección (N, K) con la cantidad de entradas por colección."""
+        N = len(self)
+        K = self.n_collections
+        flat = (np.arange(N, dtype=np.intp)[:, None] * K + self.coll_ids).ravel()
+        return np.bincount(flat, minlength=N * K).reshape(N, K).astype(np.uint8)
+
+    @property
+    def f_norm_avg(self) -> np.ndarray:
+        """Promedio normalizado (N,) con la misma aritmética que `compute_f_norm_avg`
+        (suma secuencial por entrada)."""
+        total = np.zeros(len(self), dtype=np.float64)
+        for j in range(self.f_norm.shape[1]):
+            total += self.f_norm[:, j]
+        return total / 10.0
+
+
+@dataclass
+class BatchResult:
+    """Métricas por contrato con los mismos nombres que `ContractResult` (NaN = None)."""
+
+    valid: np.ndarray
+    total_inputs_cost_cents: np.ndarray
+    ev_gross_cents: np.ndarray
+    ev_net_cents: np.ndarray
+    roi_net: np.ndarray
+    avg_outcome_price_cents: np.ndarray
+    roi_simple_ratio: np.ndarray
+    roi_simple_net_ratio: np.ndarray
+    pl_expected_net_cents: np.ndarray
+    prob_profit: np.ndarray
+    break_even_price_cents: np.ndarray
+    max_break_even_cost_total_cents: np.ndarray
+    max_break_even_cost_per_skin_cents: np.ndarray
+    fees_rate: float = 0.02
+
+    def __len__(self) -> int:
+        return int(self.valid.shape[0])
+
+    @property
+    def rentable(self) -> np.ndarray:
+        """Máscara con el mismo criterio que la decisión de la CLI (EV neto ≥ costo)."""
+        with np.errstate(invalid="ignore"):
+            return self.valid & (self.ev_net_cents >= self.total_inputs_cost_cents)
+
+    def row(self, i: int) -> Dict[str, Optional[float]]:
+        """Métricas del contrato `i` como dict (None donde `summary_metrics` devolvería None)."""
+        out: Dict[str, Optional[float]] = {}
+        for name in (
+            "total_inputs_cost_cents",
+            "ev_gross_cents",
+            "ev_net_cents",
+            "roi_net",
+            "avg_outcome_price_cents",
+            "roi_simple_ratio",
+            "roi_simple_net_ratio",
+            "pl_expected_net_cents",
+            "prob_profit",
+            "break_even_price_cents",
+            "max_break_even_cost_total_cents",
+            "max_break_even_cost_per_skin_cents",
+        ):
+            v = float(getattr(self, name)[i])
+            out[name] = None if math.isnan(v) else v
+        return out
+
+
+class BatchEvaluator:
+    """Evaluador vectorizado (NumPy) de N contratos de un mismo tier (rareza + StatTrak).
+
+    Precomputa, para el tier, la tabla de precios de outcomes por wear y los umbrales
+    exactos de f_norm_avg donde cambia el wear de cada outcome. Con eso cada contrato
+    se reduce a la colección de cada entrada (equivalente a su fila de conteos por
+    colección, ver `ContractBatch.counts`), su f_norm_avg y su costo, y las métricas
+    de `summary_metrics` se calculan con operaciones matriciales por bloques de
+    `chunk_size` contratos.
+
+    Los resultados coinciden con `summary_metrics`: wears, conteos y la regla
+    `round(price*(1-fee)) >= costo` son idénticos; EV y probabilidades solo pueden
+    diferir en el orden de suma de punto flotante (error relativo ~1e-15).
+    """
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        rarity: str,
+        stattrak: bool,
+        prices_by_mhn: Optional[Mapping[str, int]] = None,
+        fees_rate: float = 0.02,
+        chunk_size: int = 16384,
+    ) -> None:
+        if not RARITY_NEXT.get(rarity):
+            raise ContractValidationError("No existen contratos hacia Rare/Special (cuchillos/guantes) o no hay rareza siguiente.")
+        self.catalog = catalog
+        self.rarity = rarity
+        self.stattrak = stattrak
+        if isinstance(prices_by_mhn, PriceTable):
+            self.prices_by_mhn = prices_by_mhn
+        else:
+            self.prices_by_mhn = PriceTable.from_mapping(prices_by_mhn or {})
+        self.fees_rate = fees_rate
+        self.chunk_size = max(1, int(chunk_size))
+
+        self.collections: List[str] = sorted({it.collection for it in catalog.items})
+        self.collection_index: Dict[str, int] = {c: i for i, c in enumerate(self.collections)}
+        K = len(self.collections)
+
+        out_coll: List[int] = []
+        thresholds_rows: List[List[float]] = []
+        out_prices: List[List[float]] = []
+        m_c = np.zeros(K, dtype=np.float64)
+        for ci, coll in enumerate(self.collections):
+            outs = catalog.outcomes_for(coll, rarity)
+            m_c[ci] = len(outs)
+            for it in outs:
+                out_coll.append(ci)
+                thresholds_rows.append(wear_thresholds(it.float_min, it.float_max))
+                row = []
+                for wear_name, _, _ in WEAR_BUCKETS:
+                    price = self.prices_by_mhn.price(it.name, wear_name, stattrak)
+                    row.append(float(price) if price is not None else math.nan)
+                row.append(math.nan)  # Unknown
+                out_prices.append(row)
+
+        self.m_c = m_c
+        self.out_coll = np.asarray(out_coll, dtype=np.intp)
+        O = len(out_coll)
+
+        # Umbrales exactos de f_norm_avg por outcome y predicado de wear
+        thresholds = np.asarray(thresholds_rows, dtype=np.float64).reshape(O, len(WEAR_BUCKETS) + 1)
+        finite = thresholds[np.isfinite(thresholds)]
+        self.breakpoints = np.unique(finite)
+
+        # Wear de cada outcome en cada régimen (intervalo entre breakpoints consecutivos)
+        R = len(self.breakpoints) + 1
+        n_true = np.empty((R, O), dtype=np.int64)
+        for r in range(R):
+            rep = self.breakpoints[r - 1] if r > 0 else -math.inf
+            n_true[r] = (thresholds <= rep).sum(axis=1)
+        wear_idx = np.where((n_true == 0) | (n_true > len(WEAR_BUCKETS)), WEAR_UNKNOWN, n_true - 1)
+        price_tbl = np.asarray(out_prices, dtype=np.float64).reshape(O, WEAR_UNKNOWN + 1)
+        self.regime_wears = wear_idx
+        # (R, O): precio y precio neto redondeado (regla de prob_profit) por régimen
+        self.regime_prices = price_tbl[np.arange(O)[None, :], wear_idx] if O else np.zeros((R, 0))
+        with np.errstate(invalid="ignore"):
+            self.regime_net_prices = np.round(self.regime_prices * (1.0 - fees_rate))
+        # (R, K): suma de precios por colección y flag de precio faltante
+        onehot = np.zeros((O, K), dtype=np.float64)
+        if O:
+            onehot[np.arange(O), self.out_coll] = 1.0
+        missing = np.isnan(self.regime_prices)
+        self.regime_coll_sum = np.where(missing, 0.0, self.regime_prices) @ onehot
+        self.regime_coll_missing = (missing.astype(np.float64) @ onehot) > 0
+
+        # (R*K, M): precios netos round(price*(1-fee)) de cada colección en cada régimen,
+        # rellenados con -inf, para contar outcomes ganadores con una comparación por entrada.
+        M = int(m_c.max()) if K else 0
+        self._coll_net = np.full((R * K, max(M, 1)), -math.inf)
+        slot = np.zeros(K, dtype=np.intp)
+        for o in range(O):
+            c = self.out_coll[o]
+            net = self.regime_net_prices[:, o]
+            self._coll_net[np.arange(R) * K + c, slot[c]] = np.where(np.isnan(net), -math.inf, net)
+            slot[c] += 1
+
+    # ------------------------------------------------------------------
+    # Empaquetado
+    # ------------------------------------------------------------------
+    def regime_of(self, f_norm_avg: np.ndarray) -> np.ndarray:
+        """Índice de régimen de wear para cada f_norm_avg."""
+        return np.searchsorted(self.breakpoints, f_norm_avg, side="right")
+
+    def normalize_floats(self, floats: np.ndarray, fmins: np.ndarray, fmaxs: np.ndarray) -> np.ndarray:
+        """Floats normalizados por entrada, con la misma aritmética que `compute_f_norm_avg`."""
+        return (floats - fmins) / np.maximum(fmaxs - fmins, 1e-9)
+
+    def _collection_id(self, collection: str) -> int:
+        """Índice de la colección; las entradas con rangos explícitos pueden no estar en el catálogo."""
+        k = self.collection_index.get(collection)
+        if k is None:
+            raise ContractValidationError(f"Colección no encontrada en catálogo: '{collection}'")
+        return k
+
+    def pack(self, contracts: Sequence[List[ContractEntry]]) -> ContractBatch:
+        """Empaqueta contratos (listas de `ContractEntry`) en arrays.
+
+        Completa rangos desde el catálogo y precios de entradas faltantes desde el mapa local.
+        Los contratos inválidos o de otro tier quedan con `valid=False`.
+        """
+        N = len(contracts)
+        K = len(self.collections)
+        coll_ids = np.zeros((N, 10), dtype=np.intp)
+        floats = np.zeros((N, 10), dtype=np.float64)
+        fmins = np.zeros((N, 10), dtype=np.float64)
+        fmaxs = np.ones((N, 10), dtype=np.float64)
+        total_cost = np.full(N, math.nan, dtype=np.float64)
+        valid = np.zeros(N, dtype=bool)
+        for i, entries in enumerate(contracts):
+            try:
+                rarity, stattrak = validate_entries(entries)
+                fill_ranges_from_catalog(entries, self.catalog)
+                ids = [self._collection_id(e.collection) for e in entries]
+            except ContractValidationError:
+                continue
+            if rarity != self.rarity or stattrak != self.stattrak:
+                continue
+            cost = 0
+            for j, e in enumerate(entries):
+                coll_ids[i, j] = ids[j]
+                floats[i, j] = e.float_value
+                fmins[i, j] = e.float_min
+                fmaxs[i, j] = e.float_max
+                price = e.price_cents
+                if price is None:
+                    price = self.prices_by_mhn.price(e.name, wear_from_float(e.float_value), stattrak)
+                if cost is not None:
+                    cost = None if price is None else cost + int(price)
+            total_cost[i] = math.nan if cost is None else float(cost)
+            valid[i] = True
+        return ContractBatch(
+            coll_ids=coll_ids,
+            f_norm=self.normalize_floats(floats, fmins, fmaxs),
+            total_cost=total_cost,
+            valid=valid,
+            n_collections=K,
+        )
+
+    # ------------------------------------------------------------------
+    # Evaluación
+    # ------------------------------------------------------------------
+    def evaluate(self, batch: ContractBatch) -> BatchResult:
+        """Calcula las métricas de `summary_metrics` para todos los contratos del batch."""
+        N = len(batch)
+        cols = {
+            name: np.full(N, math.nan, dtype=np.float64)
+            for name in (
+                "ev_gross_cents",
+                "ev_net_cents",
+                "roi_net",
+                "avg_outcome_price_cents",
+                "roi_simple_ratio",
+                "roi_simple_net_ratio",
+                "pl_expected_net_cents",
+                "prob_profit",
+                "break_even_price_cents",
+                "max_break_even_cost_total_cents",
+                "max_break_even_cost_per_skin_cents",
+            )
+        }
+        valid = np.asarray(batch.valid, dtype=bool).copy()
+        f_norm_avg = batch.f_norm_avg
+        for start in range(0, N, self.chunk_size):
+            sl = slice(start, min(N, start + self.chunk_size))
+            self._evaluate_chunk(
+                np.asarray(batch.coll_ids[sl], dtype=np.intp),
+                f_norm_avg[sl],
+                np.asarray(batch.total_cost[sl], dtype=np.float64),
+                valid[sl],
+                {k: v[sl] for k, v in cols.items()},
+            )
+        total = np.where(valid, batch.total_cost, math.nan)
+        return BatchResult(valid=valid, total_inputs_cost_cents=total, fees_rate=self.fees_rate, **cols)
+
+    def _evaluate_chunk(
+        self,
+        coll_ids: np.ndarray,
+        f_norm_avg: np.ndarray,
+        total_cost: np.ndarray,
+        valid: np.ndarray,
+        out: Dict[str, np.ndarray],
+    ) -> None:
+        n = coll_ids.shape[0]
+        K = len(self.collections)
+        fee_keep = 1.0 - self.fees_rate
+        has_cost = valid & ~np.isnan(total_cost) & (total_cost > 0)
+        cost_safe = np.where(has_cost, total_cost, 1.0)
+        base = self.regime_of(f_norm_avg) * K
+
+        # Σ_c n_c·x_c = Σ_entradas x_{c(entrada)}; para el promedio simple de outcomes se
+        # cuenta cada colección una sola vez (primera aparición tras ordenar por fila).
+        ids = np.sort(coll_ids, axis=1)
+        S = np.zeros(n)
+        ev_num = np.zeros(n)
+        wins = np.zeros(n)
+        distinct_sum = np.zeros(n)
+        distinct_m = np.zeros(n)
+        missing = np.zeros(n, dtype=bool)
+        for j in range(ids.shape[1]):
+            c = ids[:, j]
+            seg = base + c
+            m = self.m_c[c]
+            coll_sum = self.regime_coll_sum.ravel()[seg]
+            S += m
+            ev_num += coll_sum
+            missing |= self.regime_coll_missing.ravel()[seg]
+            wins += (self._coll_net[seg] >= cost_safe[:, None]).sum(axis=1)
+            first = (c != ids[:, j - 1]) if j else np.ones(n, dtype=bool)
+            distinct_sum += np.where(first, coll_sum, 0.0)
+            distinct_m += np.where(first, m, 0.0)
+
+        # Sin outcomes posibles → compute_outcomes lanzaría ContractValidationError
+        valid &= S > 0
+        has_cost &= valid
+        S_safe = np.where(S > 0, S, 1.0)
+        ok_ev = valid & ~missing
+        ev_gross = np.where(ok_ev, ev_num / S_safe, math.nan)
+        avg_price = np.where(ok_ev, distinct_sum / np.where(distinct_m > 0, distinct_m, 1.0), math.nan)
+        ev_net = ev_gross * fee_keep
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            break_even = np.where(has_cost, total_cost / max(1e-9, fee_keep), math.nan)
+            roi_simple = np.where(has_cost, avg_price / cost_safe, math.nan)
+            roi_simple_net = np.where(has_cost, (avg_price * fee_keep) / cost_safe, math.nan)
+            pl = np.where(has_cost, ev_net - total_cost, math.nan)
+            roi = pl / cost_safe
+        # prob_profit: Σ n_c · #{o ∈ c : round(price*(1-fee)) >= costo} / S
+        prob = np.where(ok_ev & has_cost, wins / S_safe, math.nan)
+
+        out["ev_gross_cents"][:] = ev_gross
+        out["ev_net_cents"][:] = ev_net
+        out["avg_outcome_price_cents"][:] = avg_price
+        out["break_even_price_cents"][:] = break_even
+        out["roi_simple_ratio"][:] = roi_simple
+        out["roi_simple_net_ratio"][:] = roi_simple_net
+        out["pl_expected_net_cents"][:] = pl
+        out["roi_net"][:] = roi
+        out["prob_profit"][:] = prob
+        out["max_break_even_cost_total_cents"][:] = ev_net
+        out["max_break_even_cost_per_skin_cents"][:] = ev_net / 10.0
+
+    def evaluate_entries(self, contracts: Sequence[List[ContractEntry]]) -> BatchResult:
+        """Atajo: `pack()` + `evaluate()`."""
+        return self.evaluate(self.pack(contracts))
+
+
+__all__ = [
+    "BatchEvaluator",
+    "BatchResult",
+    "ContractBatch",
+]
@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .csv_loader import Catalog, read_catalog_csv
+from .models import RARITY_NEXT, SkinCatalogItem
+
+
+# Snapshot binario del catálogo (compilado desde data/skins_fixed.csv)
+#
+# Layout (little-endian, secciones alineadas a 8 bytes):
+#   header   : magic, versión, tamaño/mtime/sha256 del CSV de origen, conteos y offsets
+#   strings  : u32[n_strings+1] offsets + blob UTF-8 (ordenados por bytes, únicos)
+#   items    : u32 name_id[n], u32 coll_id[n], u32 rarity_id[n], f64 float_min[n], f64 float_max[n]
+#              (mismo orden que el CSV; el índice de fila es el skin id)
+#   by_name  : u32[n_keys] skin ids ordenados por (name_id, coll_id), uno por clave
+#   colls    : u32[K] string ids de colecciones; rars: u32[R] string ids de rarezas
+#   cr_index : u32[K*R+1] offsets + u32[n] skin ids agrupados por (colección, rareza)
+#   m_counts : u32[K*R] cantidad de skins por (colección, rareza)
+
+SNAPSHOT_MAGIC = b"TUCATLG\x00"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".tucat"
+
+_HEADER = struct.Struct("<8sIIQQ32sIIIII" + "Q" * 11)
+_SECTIONS = (
+    "str_offsets",
+    "str_blob",
+    "item_name",
+    "item_coll",
+    "item_rarity",
+    "item_fmin",
+    "item_fmax",
+    "by_name",
+    "colls",
+    "rarities",
+    "cr_offsets",
+)
+# cr_items y m_counts van a continuación de cr_offsets (tamaños derivables del header)
+
+
+class SnapshotError(ValueError):
+    """Snapshot ausente, corrupto, de otra versión o desactualizado respecto del CSV."""
+
+
+def default_snapshot_path(csv_path: Union[str, Path]) -> Path:
+    return Path(csv_path).with_suffix(SNAPSHOT_SUFFIX)
+
+
+def _file_sha256(path: Union[str, Path]) -> bytes:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def _align(buf: bytearray) -> int:
+    buf.extend(b"\x00" * (-len(buf) % 8))
+    return len(buf)
+
+
+def compile_catalog(csv_path: Union[str, Path], out_path: Optional[Union[str, Path]] = None) -> Path:
+    """Compila el CSV del catálogo a un snapshot binario y devuelve su ruta.
+
+    La escritura es atómica (archivo temporal + `os.replace`), así que los lectores
+    concurrentes ven el snapshot anterior o el nuevo, nunca uno a medio escribir.
+    """
+    csv_path = Path(csv_path)
+    out = Path(out_path) if out_path else default_snapshot_path(csv_path)
+    st = csv_path.stat()
+    digest = _file_sha256(csv_path)
+    items = read_catalog_csv(str(csv_path)).items
+
+    strings = sorted(
+        {s for it in items for s in (it.name, it.collection, it.rarity)},
+        key=lambda s: s.encode("utf-8"),
+    )
+    sid = {s: i for i, s in enumerate(strings)}
+    encoded = [s.encode("utf-8") for s in strings]
+    str_offsets = np.zeros(len(strings) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=str_offsets[1:])
+
+    n = len(items)
+    item_name = np.array([sid[it.name] for it in items], dtype="<u4")
+    item_coll = np.array([sid[it.collection] for it in items], dtype="<u4")
+    item_rarity = np.array([sid[it.rarity] for it in items], dtype="<u4")
+    item_fmin = np.array([it.float_min for it in items], dtype="<f8")
+    item_fmax = np.array([it.float_max for it in items], dtype="<f8")
+
+    # Igual que Catalog.by_name_collection: ante claves repetidas gana la última fila
+    last: Dict[Tuple[int, int], int] = {}
+    for i in range(n):
+        last[(int(item_name[i]), int(item_coll[i]))] = i
+    by_name = np.array([last[k] for k in sorted(last)], dtype="<u4")
+
+    colls = sorted({int(c) for c in item_coll})
+    rars = sorted({int(r) for r in item_rarity})
+    cidx = {c: i for i, c in enumerate(colls)}
+    ridx = {r: i for i, r in enumerate(rars)}
+    K, R = len(colls), len(rars)
+    groups: List[List[int]] = [[] for _ in range(K * R)]
+    for i in range(n):
+        groups[cidx[int(item_coll[i])] * R + ridx[int(item_rarity[i])]].append(i)
+    m_counts = np.array([len(g) for g in groups], dtype="<u4")
+    cr_offsets = np.zeros(K * R + 1, dtype="<u4")
+    np.cumsum(m_counts, out=cr_offsets[1:])
+    cr_items = np.array([i for g in groups for i in g], dtype="<u4")
+
+    body = bytearray()
+    offsets: List[int] = []
+    base = _HEADER.size + (-_HEADER.size % 8)
+    parts = [
+        str_offsets.tobytes(),
+        b"".join(encoded),
+        item_name.tobytes(),
+        item_coll.tobytes(),
+        item_rarity.tobytes(),
+        item_fmin.tobytes(),
+        item_fmax.tobytes(),
+        by_name.tobytes(),
+        np.array(colls, dtype="<u4").tobytes(),
+        np.array(rars, dtype="<u4").tobytes(),
+        cr_offsets.tobytes() + cr_items.tobytes() + m_counts.tobytes(),
+    ]
+    for part in parts:
+        offsets.append(base + _align(body))
+        body.extend(part)
+
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        0,
+        st.st_size,
+        st.st_mtime_ns,
+        digest,
+        len(strings),
+        n,
+        len(by_name),
+        K,
+        R,
+        *offsets,
+    )
+    fd, tmp = tempfile.mkstemp(prefix="catalog_", suffix=".tucat", dir=str(out.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(b"\x00" * (base - len(header)))
+            f.write(body)
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+
+class CatalogSnapshot:
+    """Vista de solo lectura (mmap) sobre un snapshot compilado.
+
+    Los arrays son `np.frombuffer` sobre el mmap: no se copian, y varios procesos
+    que abren el mismo archivo comparten las páginas del page cache.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # archivo vacío
+                raise SnapshotError(f"Snapshot vacío: {self.path}") from e
+        if len(self._mm) < _HEADER.size:
+            raise SnapshotError(f"Snapshot truncado: {self.path}")
+        fields = _HEADER.unpack_from(self._mm, 0)
+        magic, version = fields[0], fields[1]
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"No es un snapshot de catálogo: {self.path}")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Versión de snapshot {version} no soportada (esperada {SNAPSHOT_VERSION})")
+        (
+            self.source_size,
+            self.source_mtime_ns,
+            self.source_sha256,
+            self.n_strings,
+            self.n_items,
+            n_keys,
+            self.n_collections,
+            self.n_rarities,
+        ) = fields[3:11]
+        off = dict(zip(_SECTIONS, fields[11:]))
+        n, K, R = self.n_items, self.n_collections, self.n_rarities
+
+        def u4(name: str, count: int, skip: int = 0) -> np.ndarray:
+            return np.frombuffer(self._mm, dtype="<u4", count=count, offset=off[name] + 4 * skip)
+
+        def f8(name: str) -> np.ndarray:
+            return np.frombuffer(self._mm, dtype="<f8", count=n, offset=off[name])
+
+        self._str_offsets = u4("str_offsets", self.n_strings + 1)
+        self._str_base = off["str_blob"]
+        self.item_name = u4("item_name", n)
+        self.item_coll = u4("item_coll", n)
+        self.item_rarity = u4("item_rarity", n)
+        self.float_min = f8("item_fmin")
+        self.float_max = f8("item_fmax")
+        self._by_name = u4("by_name", n_keys)
+        self.collection_ids = u4("colls", K)
+        self.rarity_ids = u4("rarities", R)
+        self.cr_offsets = u4("cr_offsets", K * R + 1)
+        self.cr_items = u4("cr_offsets", n, skip=K * R + 1)
+        self.m_counts = u4("cr_offsets", K * R, skip=K * R + 1 + n).reshape(K, R)
+
+    # -- strings -------------------------------------------------------------
+    def _string_bytes(self, i: int) -> bytes:
+        a = self._str_base + int(self._str_offsets[i])
+        b = self._str_base + int(self._str_offsets[i + 1])
+        return self._mm[a:b]
+
+    def string(self, i: int) -> str:
+        return self._string_bytes(i).decode("utf-8")
+
+    def strings(self) -> List[str]:
+        """Tabla completa de strings decodificada (índice = string id)."""
+        return [self.string(i) for i in range(self.n_strings)]
+
+    def string_id(self, s: str) -> Optional[int]:
+        """Id interno de un string (búsqueda binaria sobre el blob ordenado)."""
+        key = s.encode("utf-8")
+        lo, hi = 0, self.n_strings
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_strings and self._string_bytes(lo) == key:
+            return lo
+        return None
+
+    # -- índices ---------------------------------------------------------------
+    def _sorted_pos(self, ids: np.ndarray, value: int) -> Optional[int]:
+        pos = int(np.searchsorted(ids, value))
+        return pos if pos < len(ids) and int(ids[pos]) == value else None
+
+    def collection_index(self, collection: str) -> Optional[int]:
+        sid = self.string_id(collection)
+        return None if sid is None else self._sorted_pos(self.collection_ids, sid)
+
+    def rarity_index(self, rarity: str) -> Optional[int]:
+        sid = self.string_id(rarity)
+        return None if sid is None else self._sorted_pos(self.rarity_ids, sid)
+
+    def skin_id(self, name: str, collection: str) -> Optional[int]:
+        """Fila del catálogo para (name, collection), o None."""
+        nid = self.string_id(name)
+        cid = self.string_id(collection)
+        if nid is None or cid is None:
+            return None
+        lo, hi = 0, len(self._by_name)
+        key = (nid, cid)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = int(self._by_name[mid])
+            if (int(self.item_name[i]), int(self.item_coll[i])) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._by_name):
+            i = int(self._by_name[lo])
+            if int(self.item_name[i]) == nid and int(self.item_coll[i]) == cid:
+                return i
+        return None
+
+    def skins_for(self, collection: str, rarity: str) -> np.ndarray:
+        """Skin ids (orden del CSV) de una colección y rareza."""
+        k = self.collection_index(collection)
+        r = self.rarity_index(rarity)
+        if k is None or r is None:
+            return self.cr_items[:0]
+        j = k * self.n_rarities + r
+        return self.cr_items[int(self.cr_offsets[j]) : int(self.cr_offsets[j + 1])]
+
+    def item(self, i: int) -> SkinCatalogItem:
+        return SkinCatalogItem(
+            name=self.string(int(self.item_name[i])),
+            collection=self.string(int(self.item_coll[i])),
+            rarity=self.string(int(self.item_rarity[i])),
+            float_min=float(self.float_min[i]),
+            float_max=float(self.float_max[i]),
+        )
+
+    # -- frescura ----------------------------------------------------------------
+    def is_fresh(self, csv_path: Union[str, Path]) -> bool:
+        """True si el snapshot corresponde al contenido actual del CSV.
+
+        Si tamaño y mtime coinciden no se relee el CSV; si no, decide el sha256.
+        """
+        try:
+            st = os.stat(csv_path)
+        except OSError:
+            return False
+        if st.st_size != self.source_size:
+            return False
+        if st.st_mtime_ns == self.source_mtime_ns:
+            return True
+        return _file_sha256(csv_path) == self.source_sha256
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"CatalogSnapshot(path={str(self.path)!r}, items={self.n_items}, collections={self.n_collections})"
+
+
+class CompiledCatalog(Catalog):
+    """`Catalog` respaldado por un snapshot: los objetos se materializan a demanda.
+
+    `get_item` y `outcomes_for` resuelven con búsquedas binarias sobre el mmap;
+    `items`, `by_name_collection` y `by_collection_rarity` se construyen completos
+    solo si algún consumidor los recorre.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot) -> None:
+        self.snapshot = snapshot
+        self._items: Optional[List[SkinCatalogItem]] = None
+        self._by_name_collection: Optional[Dict[Tuple[str, str], SkinCatalogItem]] = None
+        self._by_collection_rarity: Optional[Dict[Tuple[str, str], List[SkinCatalogItem]]] = None
+        self._outcomes: Dict[Tuple[str, str], List[SkinCatalogItem]] = {}
+
+    @property
+    def items(self) -> List[SkinCatalogItem]:
+        if self._items is None:
+            self._items = [self.snapshot.item(i) for i in range(self.snapshot.n_items)]
+        return self._items
+
+    @property
+    def by_name_collection(self) -> Dict[Tuple[str, str], SkinCatalogItem]:
+        if self._by_name_collection is None:
+            self._by_name_collection = {(it.name, it.collection): it for it in self.items}
+        return self._by_name_collection
+
+    @property
+    def by_collection_rarity(self) -> Dict[Tuple[str, str], List[SkinCatalogItem]]:
+        if self._by_collection_rarity is None:
+            groups: Dict[Tuple[str, str], List[SkinCatalogItem]] = {}
+            for it in self.items:
+                groups.setdefault((it.collection, it.rarity), []).append(it)
+            self._by_collection_rarity = groups
+        return self._by_collection_rarity
+
+    def _item(self, i: int) -> SkinCatalogItem:
+        return self._items[i] if self._items is not None else self.snapshot.item(i)
+
+    def get_item(self, name: str, collection: str) -> Optional[SkinCatalogItem]:
+        i = self.snapshot.skin_id(name, collection)
+        return None if i is None else self._item(i)
+
+    def outcomes_for(self, collection: str, source_rarity: str) -> List[SkinCatalogItem]:
+        nxt = RARITY_NEXT.get(source_rarity)
+        if not nxt:
+            return []
+        key = (collection, nxt)
+        cached = self._outcomes.get(key)
+        if cached is None:
+            cached = [self._item(int(i)) for i in self.snapshot.skins_for(collection, nxt)]
+            self._outcomes[key] = cached
+        return cached
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"CompiledCatalog(items={self.snapshot.n_items}, snapshot={str(self.snapshot.path)!r})"
+
+
+def open_snapshot(
+    csv_path: Union[str, Path], snapshot_path: Optional[Union[str, Path]] = None
+) -> Optional[CatalogSnapshot]:
+    """Abre el snapshot del CSV si existe, es válido y está al día; si no, None.
+
+    Con `TRADEUP_NO_SNAPSHOT=1` siempre devuelve None (fuerza la lectura del CSV).
+    """
+    if os.environ.get("TRADEUP_NO_SNAPSHOT", "").strip() not in ("", "0"):
+        return None
+    path = Path(snapshot_path) if snapshot_path else default_snapshot_path(csv_path)
+    if not path.exists():
+        return None
+    try:
+        snap = CatalogSnapshot(path)
+    except (OSError, SnapshotError, struct.error, ValueError):
+        return None
+    return snap if snap.is_fresh(csv_path) else None
+
+
+def load_catalog(csv_path: Union[str, Path], snapshot_path: Optional[Union[str, Path]] = None) -> Catalog:
+    """Catálogo desde el snapshot compilado; si falta o está desactualizado, desde el CSV."""
+    snap = open_snapshot(csv_path, snapshot_path)
+    if snap is None:
+        return read_catalog_csv(str(csv_path))
+    return CompiledCatalog(snap)
+
+
+def read_catalog_rows(csv_path: Union[str, Path], snapshot_path: Optional[Union[str, Path]] = None) -> List[Dict[str, str]]:
+    """Filas del catálogo como dicts con los encabezados del CSV (Arma,Coleccion,Grado,FloatMin,FloatMax).
+
+    Para los scripts que trabajan con filas crudas: usa el snapshot si está al día
+    (floats con `repr`, que ida y vuelta da el mismo double) y si no lee el CSV.
+    """
+    snap = open_snapshot(csv_path, snapshot_path)
+    if snap is None:
+        with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            return list(csv.DictReader(f))
+    strings = snap.strings()
+    return [
+        {
+            "Arma": strings[n],
+            "Coleccion": strings[c],
+            "Grado": strings[r],
+            "FloatMin": repr(fmin),
+            "FloatMax": repr(fmax),
+        }
+        for n, c, r, fmin, fmax in zip(
+            snap.item_name.tolist(),
+            snap.item_coll.tolist(),
+            snap.item_rarity.tolist(),
+            snap.float_min.tolist(),
+            snap.float_max.tolist(),
+        )
+    ]
+
+
+__all__ = [
+    "CatalogSnapshot",
+    "CompiledCatalog",
+    "SnapshotError",
+    "compile_catalog",
+    "default_snapshot_path",
+    "load_catalog",
+    "open_snapshot",
+    "read_catalog_rows",
+]
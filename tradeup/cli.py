@@ -1,30 +1,27 @@
 from __future__ import annotations
 
 import argparse
+import csv
 import os
 import sys
+from datetime import datetime
+from pathlib import Path
 from typing import Optional
 
 from rich.console import Console
 from rich.table import Table
 from rich import box
 
-from .csv_loader import read_catalog_csv, read_contract_csv
-from .contracts import (
-    ContractValidationError,
-    validate_entries,
-    fill_ranges_from_catalog,
-    compute_outcomes,
-    summarize_contract,
-)
-from .pricing import (
-    fill_entry_prices,
-    fill_outcome_prices,
-    load_local_prices_csv,
-    fill_entry_prices_local,
-    fill_outcome_prices_local,
-)
-from .csfloat_api import CsfloatClient
+from .csv_loader import read_contract_csv
+from .catalog_snapshot import compile_catalog, load_catalog
+from .price_history import PriceHistory, is_prices_by_wear_csv, parse_ts, read_prices_by_wear_csv
+from .price_index import compile_price_index, load_price_index
+from .contracts import ContractValidationError
+from .corpus import pack_contracts, unpack_contracts
+from .registry import ItemRegistry, load_price_table
+from .csfloat_api import CsfloatClient, build_market_hash_name
+from .evaluator import Evaluator, decision_label, result_payload
+from .optimizer import OBJECTIVES, ContractOptimizer
 
 console = Console()
 
@@ -77,6 +74,19 @@ def build_args() -> argparse.Namespace:
             "(1) MarketHashName,PriceCents; (2) Name,Wear,PriceCents[,StatTrak]."
         ),
     )
+    parser.add_argument(
+        "--price-history",
+        type=str,
+        default=None,
+        help="Carpeta de historial de precios (ver price-history). Se usa con --as-of en lugar de --local-prices.",
+    )
+    parser.add_argument(
+        "--as-of",
+        type=str,
+        default=None,
+        help="Fecha (ISO) o epoch de los precios a usar del historial. Default: el último snapshot.",
+    )
+    parser.add_argument("--price-source", type=str, default=None, help="Fuente del historial (default: la del snapshot elegido)")
     parser.add_argument(
         "--json",
         action="store_true",
@@ -96,6 +106,288 @@ def resolve_catalog_path(path: str) -> str:
     return candidate
 
 
+def compile_catalog_command(argv) -> None:
+    """`python -m tradeup.cli compile-catalog`: compila el catálogo CSV a snapshot binario."""
+    parser = argparse.ArgumentParser(
+        prog="python -m tradeup.cli compile-catalog",
+        description="Compila el catálogo CSV a un snapshot binario (.tucat) que la CLI y los scripts cargan vía mmap.",
+    )
+    parser.add_argument("--catalog", type=str, default="data/skins_fixed.csv", help="CSV del catálogo de origen")
+    parser.add_argument("--out", type=str, default=None, help="Ruta del snapshot. Default: junto al CSV con extensión .tucat")
+    args = parser.parse_args(argv)
+    try:
+        out = compile_catalog(resolve_catalog_path(args.catalog), args.out)
+    except FileNotFoundError as e:
+        console.print(f"[bold red]Archivo no encontrado:[/bold red] {e}")
+        sys.exit(2)
+    except ValueError as e:
+        console.print(f"[bold red]Catálogo inválido:[/bold red] {e}")
+        sys.exit(2)
+    console.print(f"[green]Snapshot generado:[/green] {out}")
+
+
+def compile_prices_command(argv) -> None:
+    """`python -m tradeup.cli compile-prices`: compila un CSV de precios locales a índice binario."""
+    parser = argparse.ArgumentParser(
+        prog="python -m tradeup.cli compile-prices",
+        description="Compila un CSV de precios locales a un índice binario (.tuprice) que --local-prices carga vía mmap.",
+    )
+    parser.add_argument("--local-prices", type=str, required=True, help="CSV de precios (MarketHashName,PriceCents o Name,Wear,PriceCents[,StatTrak])")
+    parser.add_argument("--out", type=str, default=None, help="Ruta del índice. Default: junto al CSV con extensión .tuprice")
+    args = parser.parse_args(argv)
+    try:
+        out = compile_price_index(args.local_prices, args.out)
+    except FileNotFoundError as e:
+        console.print(f"[bold red]Archivo no encontrado:[/bold red] {e}")
+        sys.exit(2)
+    except ValueError as e:
+        console.print(f"[bold red]CSV de precios inválido:[/bold red] {e}")
+        sys.exit(2)
+    console.print(f"[green]Índice generado:[/green] {out}")
+
+
+def price_history_command(argv) -> None:
+    """`python -m tradeup.cli price-history`: snapshots históricos de precios (add/list/as-of/series)."""
+    parser = argparse.ArgumentParser(
+        prog="python -m tradeup.cli price-history",
+        description="Historial append-only de precios: cada refresh se guarda como delta comprimido del anterior.",
+    )
+    parser.add_argument("--root", type=str, default="data/price_history", help="Carpeta del historial (default: data/price_history)")
+    sub = parser.add_subparsers(dest="action", required=True)
+    p_add = sub.add_parser("add", help="Agrega un CSV de precios como snapshot")
+    p_add.add_argument("csv", help="CSV de precios (formatos de --local-prices o cs2_prices_by_wear.csv)")
+    p_add.add_argument("--source", type=str, default=None, help="Fuente (default: 'source' del CSV by-wear o el nombre del archivo)")
+    p_add.add_argument("--ts", type=str, default=None, help="Fecha ISO o epoch del snapshot (default: last_updated_unix o mtime del CSV)")
+    p_add.add_argument("--column", type=str, default="sales_median_7d", help="Columna de precio para CSV by-wear (default: sales_median_7d)")
+    sub.add_parser("list", help="Lista los snapshots")
+    p_asof = sub.add_parser("as-of", help="Exporta los precios vigentes en una fecha como CSV MarketHashName,PriceCents")
+    p_asof.add_argument("ts", help="Fecha ISO o epoch")
+    p_asof.add_argument("--source", type=str, default=None)
+    p_asof.add_argument("--out", type=str, required=True, help="CSV de salida (usable con --local-prices)")
+    p_series = sub.add_parser("series", help="Cambios de precio de un market_hash_name")
+    p_series.add_argument("mhn", help="market_hash_name exacto")
+    p_series.add_argument("--source", type=str, default=None)
+    args = parser.parse_args(argv)
+
+    history = PriceHistory(args.root)
+    try:
+        if args.action == "add":
+            if is_prices_by_wear_csv(args.csv):
+                prices, ts, source = read_prices_by_wear_csv(args.csv, args.column)
+            else:
+                prices, ts, source = dict(load_price_index(args.csv)), None, None
+            ts = parse_ts(args.ts) if args.ts else (ts or os.path.getmtime(args.csv))
+            info = history.append(prices, args.source or source or Path(args.csv).stem, ts)
+            kind = "keyframe" if info.keyframe else "delta"
+            console.print(
+                f"[green]Snapshot agregado:[/green] {info.source} @ {datetime.fromtimestamp(info.ts).isoformat(timespec='seconds')} "
+                f"({kind}: {info.n_changed} cambios, {info.n_removed} bajas, {info.n_prices} precios)"
+            )
+        elif args.action == "list":
+            table = Table(title=f"Historial {args.root}")
+            for col in ("Fecha", "Fuente", "Tipo", "Precios", "Cambios", "Bajas"):
+                table.add_column(col)
+            for snap in history.snapshots:
+                table.add_row(
+                    datetime.fromtimestamp(snap.ts).isoformat(timespec="seconds"),
+                    snap.source,
+                    "keyframe" if snap.keyframe else "delta",
+                    str(snap.n_prices),
+                    str(snap.n_changed),
+                    str(snap.n_removed),
+                )
+            console.print(table)
+        elif args.action == "as-of":
+            snap, ids, prices = history.as_of_ids(parse_ts(args.ts), args.source)
+            rows = sorted((history.names[i], c) for i, c in zip(ids.tolist(), prices.tolist()))
+            Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+            with open(args.out, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["MarketHashName", "PriceCents"])
+                w.writerows(rows)
+            console.print(f"[green]{len(rows)} precios ({snap.source} @ {datetime.fromtimestamp(snap.ts).isoformat(timespec='seconds')}):[/green] {args.out}")
+        elif args.action == "series":
+            for ts, cents in history.series(args.mhn, args.source):
+                console.print(f"{datetime.fromtimestamp(ts).isoformat(timespec='seconds')}  {human_cents(cents)}")
+    except FileNotFoundError as e:
+        console.print(f"[bold red]Archivo no encontrado:[/bold red] {e}")
+        sys.exit(2)
+    except (KeyError, ValueError) as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        sys.exit(2)
+
+
+def pack_contracts_command(argv) -> None:
+    """`python -m tradeup.cli pack-contracts`: importa CSV de contratos a un shard empaquetado."""
+    parser = argparse.ArgumentParser(
+        prog="python -m tradeup.cli pack-contracts",
+        description="Empaqueta los CSV de contrato de una carpeta (recursivo) en un shard binario (.tucorp).",
+    )
+    parser.add_argument("--catalog", type=str, default="data/skins_fixed.csv", help="Ruta al catálogo de skins (CSV)")
+    parser.add_argument("--src", type=str, required=True, help="Carpeta con contratos CSV")
+    parser.add_argument("--out", type=str, required=True, help="Shard de salida (se agrega al final si ya existe)")
+    args = parser.parse_args(argv)
+    try:
+        n, skipped = pack_contracts(args.src, args.out, load_catalog(resolve_catalog_path(args.catalog)))
+    except FileNotFoundError as e:
+        console.print(f"[bold red]Archivo no encontrado:[/bold red] {e}")
+        sys.exit(2)
+    except ValueError as e:
+        console.print(f"[bold red]Error de contrato/shard:[/bold red] {e}")
+        sys.exit(2)
+    for fp, reason in skipped:
+        console.print(f"[yellow]Salteado[/yellow] {fp}: {reason}")
+    console.print(f"[green]{n} contratos empaquetados en[/green] {args.out}")
+    if skipped:
+        console.print(f"[yellow]{len(skipped)} CSV inválidos salteados[/yellow]")
+
+
+def unpack_contracts_command(argv) -> None:
+    """`python -m tradeup.cli unpack-contracts`: exporta un shard a un CSV por contrato."""
+    parser = argparse.ArgumentParser(
+        prog="python -m tradeup.cli unpack-contracts",
+        description="Exporta un shard de contratos (.tucorp) al layout de un CSV por contrato.",
+    )
+    parser.add_argument("--catalog", type=str, default="data/skins_fixed.csv", help="Ruta al catálogo de skins (CSV)")
+    parser.add_argument("--shard", type=str, required=True, help="Shard de contratos (.tucorp)")
+    parser.add_argument("--out-dir", type=str, required=True, help="Carpeta de salida para los CSV")
+    args = parser.parse_args(argv)
+    try:
+        n = unpack_contracts(args.shard, args.out_dir, load_catalog(resolve_catalog_path(args.catalog)))
+    except FileNotFoundError as e:
+        console.print(f"[bold red]Archivo no encontrado:[/bold red] {e}")
+        sys.exit(2)
+    except ValueError as e:
+        console.print(f"[bold red]Shard inválido:[/bold red] {e}")
+        sys.exit(2)
+    console.print(f"[green]{n} contratos exportados en[/green] {args.out_dir}")
+
+
+def optimize_command(argv) -> None:
+    """`python -m tradeup.cli optimize`: top-K contratos de un tier por branch-and-bound."""
+    parser = argparse.ArgumentParser(
+        prog="python -m tradeup.cli optimize",
+        description=(
+            "Busca los mejores contratos de una rareza (P&L neto esperado o ROI) con branch-and-bound "
+            "sobre cantidades por colección, bajo un tope de costo total."
+        ),
+    )
+    parser.add_argument("--catalog", type=str, default="data/skins_fixed.csv", help="Ruta al catálogo de skins (CSV)")
+    parser.add_argument("--rarity", type=str, required=True, help="Rareza de las entradas (consumer..classified)")
+    parser.add_argument(
+        "--stattrak",
+        choices=["nost", "st", "both"],
+        default="nost",
+        help="Modo StatTrak: solo no-ST (default), solo ST o ambos",
+    )
+    parser.add_argument("--local-prices", type=str, default=None, help="CSV local de precios (mismos formatos que la CLI)")
+    parser.add_argument(
+        "--fetch-prices",
+        action="store_true",
+        help="Consultar CSFloat (requiere CSFLOAT_API_KEY; pide el precio de cada skin×wear del tier)",
+    )
+    parser.add_argument("--fees", type=float, default=0.02, help="Fee de venta aplicada a los outcomes (default 0.02)")
+    parser.add_argument("--max-total-usd", type=float, default=None, help="Tope de costo total del contrato en USD")
+    parser.add_argument("--top-k", type=int, default=10, help="Cantidad de contratos a devolver (default 10)")
+    parser.add_argument(
+        "--objective",
+        choices=list(OBJECTIVES),
+        default="ev",
+        help="ev = P&L neto esperado (EV neto − costo); roi = P&L / costo",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Segundos máximos de búsqueda (anytime): al vencer devuelve lo mejor encontrado",
+    )
+    parser.add_argument("--out-dir", type=str, default=None, help="Si se indica, escribe cada contrato como CSV en esta carpeta")
+    parser.add_argument("--json", action="store_true", help="Imprime los contratos en JSON (además de la tabla)")
+    args = parser.parse_args(argv)
+
+    if not args.local_prices and not args.fetch_prices:
+        console.print("[bold red]Falta fuente de precios:[/bold red] pasá --local-prices o --fetch-prices")
+        sys.exit(2)
+    try:
+        catalog = load_catalog(resolve_catalog_path(args.catalog))
+        client = None
+        prices_by_mhn = None
+        if args.local_prices:
+            prices_by_mhn = load_price_table(args.local_prices, ItemRegistry.from_catalog(catalog))
+            price_fn = prices_by_mhn.price
+        else:
+            client = CsfloatClient()
+            price_fn = lambda name, wear, st: client.get_lowest_price_cents(  # noqa: E731
+                build_market_hash_name(name, wear, st), stattrak=st
+            )
+        optimizer = ContractOptimizer(
+            catalog,
+            args.rarity,
+            price_fn,
+            fees_rate=args.fees,
+            max_total_cents=int(round(args.max_total_usd * 100)) if args.max_total_usd is not None else None,
+            objective=args.objective,
+        )
+    except FileNotFoundError as e:
+        console.print(f"[bold red]Archivo no encontrado:[/bold red] {e}")
+        sys.exit(2)
+    except ValueError as e:
+        console.print(f"[bold red]Parámetros inválidos:[/bold red] {e}")
+        sys.exit(2)
+
+    modes = {"nost": [False], "st": [True], "both": [False, True]}[args.stattrak]
+    result = optimizer.optimize_modes(modes, top_k=args.top_k, deadline_s=args.deadline)
+
+    # Métricas finales con el evaluador estándar (mismas que `tradeup.cli --contract`)
+    evaluator = Evaluator(catalog, prices_by_mhn=prices_by_mhn, client=client, fees_rate=args.fees)
+    table = Table(title=f"Top {args.top_k} contratos ({optimizer.rarity}, objetivo {args.objective})", box=box.SIMPLE_HEAVY)
+    table.add_column("#", justify="right")
+    table.add_column("ST")
+    table.add_column("f_norm", justify="right")
+    table.add_column("Entradas")
+    table.add_column("Costo", justify="right")
+    table.add_column("EV neto", justify="right")
+    table.add_column("P&L", justify="right")
+    table.add_column("ROI", justify="right")
+    table.add_column("Prob. beneficio", justify="right")
+    payload = []
+    out_dir = args.out_dir
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    for idx, cand in enumerate(result.candidates, start=1):
+        entries = cand.entries()
+        res = evaluator.evaluate(entries)
+        inputs = ", ".join(f"{n}× {cand.skins[c].name}" for c, n in sorted(cand.counts.items(), key=lambda kv: -kv[1]))
+        table.add_row(
+            str(idx),
+            "ST" if cand.stattrak else "-",
+            f"{cand.f_norm:.6f}",
+            inputs,
+            human_cents(res.total_inputs_cost_cents),
+            human_cents(res.ev_net_cents),
+            human_cents(res.pl_expected_net_cents),
+            f"{res.roi_net*100:.2f}%" if res.roi_net is not None else "-",
+            f"{res.prob_profit*100:.2f}%" if res.prob_profit is not None else "-",
+        )
+        if out_dir:
+            path = os.path.join(out_dir, f"optimize__{optimizer.rarity}__{idx:02d}.csv")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["Name", "Collection", "Rarity", "Float", "PriceCents", "StatTrak"])
+                for e in entries:
+                    w.writerow([e.name, e.collection, e.rarity, f"{e.float_value:.12f}", "", "true" if e.stattrak else "false"])
+        payload.append({"rank": idx, "stattrak": cand.stattrak, "f_norm": cand.f_norm, "counts": cand.counts, **result_payload(res)})
+
+    console.print(table)
+    status = "completa" if result.complete else "[yellow]cortada por deadline (mejores hasta el momento)[/yellow]"
+    console.print(
+        f"[dim]Búsqueda {status}: {result.nodes} nodos, {result.regimes_searched}/{result.regimes} regímenes de wear, "
+        f"{result.elapsed_s:.2f}s.[/dim]"
+    )
+    if args.json:
+        console.print_json(data=payload)
+
+
 def print_entries_table(entries):
     table = Table(title="Entradas (10 skins)", box=box.SIMPLE_HEAVY)
     table.add_column("#", justify="right")
@@ -156,11 +448,7 @@ def print_outcomes_table(outcomes, fees_rate: float):
 
 def print_decision_and_summary(res):
     # Línea de decisión
-    decision = None
-    if res.total_inputs_cost_cents is not None and res.ev_net_cents is not None:
-        decision = "✅ RENTABLE" if res.ev_net_cents >= res.total_inputs_cost_cents else "❌ NO rentable"
-    else:
-        decision = "❔ Incompleto (faltan precios)"
+    decision = decision_label(res)
     console.print(f"[bold]{decision}[/bold]")
 
     # Tabla de KPIs (pares)
@@ -223,37 +511,56 @@ def print_decision_and_summary(res):
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compile-catalog":
+        compile_catalog_command(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "compile-prices":
+        compile_prices_command(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "price-history":
+        price_history_command(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "optimize":
+        optimize_command(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "pack-contracts":
+        pack_contracts_command(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "unpack-contracts":
+        unpack_contracts_command(sys.argv[2:])
+        return
     args = build_args()
     try:
         catalog_path = resolve_catalog_path(args.catalog)
         entries = read_contract_csv(args.contract)
-        catalog = read_catalog_csv(catalog_path)
-
-        # Validaciones y rangos
-        rarity, stattrak = validate_entries(entries)
-        fill_ranges_from_catalog(entries, catalog)
+        catalog = load_catalog(catalog_path)
 
-        # Completar precios (entradas y outcomes)
-        client = CsfloatClient()
+        # Completar precios (entradas y outcomes) con la misma fuente para ambos
         price_source_note = None
+        prices_by_mhn = None
+        client = None
         if args.fetch_prices:
-            fill_entry_prices(entries, client, stattrak)
+            client = CsfloatClient()
             price_source_note = "CSFloat"
         elif args.local_prices:
-            prices_by_mhn = load_local_prices_csv(args.local_prices)
-            fill_entry_prices_local(entries, prices_by_mhn, stattrak)
-        # Outcomes y precios
-        outcomes = compute_outcomes(entries, catalog)
-        if args.fetch_prices:
-            fill_outcome_prices(outcomes, client, stattrak)
-            price_source_note = price_source_note or "CSFloat"
-        elif args.local_prices:
-            prices_by_mhn = prices_by_mhn if 'prices_by_mhn' in locals() else load_local_prices_csv(args.local_prices)
-            fill_outcome_prices_local(outcomes, prices_by_mhn, stattrak)
+            prices_by_mhn = load_price_table(args.local_prices, ItemRegistry.from_catalog(catalog))
             price_source_note = f"CSV local ({args.local_prices})"
+        elif args.price_history:
+            ts = parse_ts(args.as_of) if args.as_of else float("inf")
+            history = PriceHistory(args.price_history)
+            try:
+                snap, _, _ = history.as_of_ids(ts, args.price_source)
+            except KeyError as e:
+                console.print(f"[bold red]Historial de precios:[/bold red] {e.args[0]}")
+                sys.exit(2)
+            prices_by_mhn = history.as_of(ts, args.price_source, ItemRegistry.from_catalog(catalog))
+            when = datetime.fromtimestamp(snap.ts).isoformat(timespec="seconds")
+            price_source_note = f"historial {args.price_history} ({snap.source} @ {when})"
 
         # Resumen y tablas
-        res = summarize_contract(entries, outcomes, fees_rate=args.fees)
+        evaluator = Evaluator(catalog, prices_by_mhn=prices_by_mhn, client=client, fees_rate=args.fees)
+        res = evaluator.evaluate(entries)
+        outcomes = res.outcomes
         # Primero la decisión + KPIs
         print_decision_and_summary(res)
         # Luego, tablas de outcomes y entradas
@@ -274,40 +581,7 @@ def main():
 
         # Export JSON opcional
         if args.json:
-            # Recalcular decisión localmente para incluir en el payload
-            if res.total_inputs_cost_cents is not None and res.ev_net_cents is not None:
-                decision = "✅ RENTABLE" if res.ev_net_cents >= res.total_inputs_cost_cents else "❌ NO rentable"
-            else:
-                decision = "❔ Incompleto (faltan precios)"
-            payload = {
-                "decision": decision,
-                "fees_rate": res.fees_rate,
-                "summary": {
-                    "total_cost_cents": res.total_inputs_cost_cents,
-                    "ev_gross_cents": res.ev_gross_cents,
-                    "ev_net_cents": res.ev_net_cents,
-                    "pl_expected_net_cents": res.pl_expected_net_cents,
-                    "roi_net": res.roi_net,
-                    "prob_profit": res.prob_profit,
-                    "break_even_price_cents": res.break_even_price_cents,
-                    "max_break_even_cost_total_cents": res.max_break_even_cost_total_cents,
-                    "max_break_even_cost_per_skin_cents": res.max_break_even_cost_per_skin_cents,
-                    "ratio_avg_cost_bruta": res.roi_simple_ratio,
-                    "ratio_avg_cost_neta": res.roi_simple_net_ratio,
-                },
-                "outcomes": [
-                    {
-                        "name": o.name,
-                        "collection": o.collection,
-                        "rarity": o.rarity,
-                        "prob": o.prob,
-                        "out_float": o.out_float,
-                        "wear": o.wear_name,
-                        "price_cents": o.price_cents,
-                    }
-                    for o in outcomes
-                ],
-            }
+            payload = result_payload(res)
             console.print_json(data=payload)
 
     except ContractValidationError as e:
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import math
 from collections import Counter, defaultdict
 from dataclasses import replace
-from typing import Dict, Iterable, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, List, Mapping, Tuple, Optional
 
-from .models import ContractEntry, Outcome, ContractResult, wear_from_float
+from .models import ContractEntry, Outcome, ContractResult, EvInterval, wear_from_float
 from .csv_loader import Catalog
-from .models import RARITY_NEXT
+from .csfloat_api import build_market_hash_name
+from .models import RARITY_NEXT, SkinCatalogItem, WEAR_BUCKETS
+from .registry import PriceTable
 
 
 class ContractValidationError(Exception):
@@ -70,12 +73,10 @@ def compute_f_norm_avg(entries: List[ContractEntry]) -> float:
     return total / 10.0
 
 
-def compute_outcomes(entries: List[ContractEntry], catalog: Catalog) -> List[Outcome]:
-    """Computa outcomes por modelo de *pool* al estilo TradeUpSpy.
-
-    - La probabilidad de cada outcome es `n_c / S`, con `S = Σ_c(n_c * m_c)`.
-    - El float de salida se obtiene remapeando el promedio normalizado al rango del outcome.
-    """
+def _outcome_pool(
+    entries: List[ContractEntry], catalog: Catalog
+) -> Tuple[str, Counter, Dict[str, List[SkinCatalogItem]], int]:
+    """(rareza_objetivo, n_c por colección, outcomes por colección, S) del contrato."""
     rarity, _ = validate_entries(entries)
     next_rarity = RARITY_NEXT.get(rarity)
     if not next_rarity:
@@ -100,6 +101,16 @@ def compute_outcomes(entries: List[ContractEntry], catalog: Catalog) -> List[Out
         S += count_by_collection[coll] * len(outs)
     if S <= 0:
         raise ContractValidationError("No hay outcomes posibles (S=0). Verificá el catálogo y las colecciones.")
+    return next_rarity, count_by_collection, coll_to_outs, S
+
+
+def compute_outcomes(entries: List[ContractEntry], catalog: Catalog) -> List[Outcome]:
+    """Computa outcomes por modelo de *pool* al estilo TradeUpSpy.
+
+    - La probabilidad de cada outcome es `n_c / S`, con `S = Σ_c(n_c * m_c)`.
+    - El float de salida se obtiene remapeando el promedio normalizado al rango del outcome.
+    """
+    next_rarity, count_by_collection, coll_to_outs, S = _outcome_pool(entries, catalog)
 
     # Promedio normalizado de entradas
     f_norm_avg = compute_f_norm_avg(entries)
@@ -218,6 +229,212 @@ def summary_metrics(entries: List[ContractEntry], outcomes: List[Outcome], fees_
     )
 
 
+# Curva de EV por tramos de f_norm_avg
+#
+# Con la mezcla de colecciones fija, el wear de cada outcome solo cambia cuando
+# out_float = min + (max-min)*f_norm_avg cruza un límite de WEAR_BUCKETS, así que
+# EV/ROI/prob_profit son funciones escalonadas de f_norm_avg.
+
+def _wear_predicates() -> List[Tuple[float, Callable[[float], bool]]]:
+    """Predicados monótonos en el float de salida que delimitan los wears de `wear_from_float`.
+
+    Devuelve pares (frontera, predicado). La cantidad de predicados verdaderos `k`
+    determina el wear: 0 → Unknown (x < 0), 1..5 → bucket k-1, 6 → Unknown
+    (x > 1 fuera de la tolerancia de Battle-Scarred).
+    """
+    preds: List[Tuple[float, Callable[[float], bool]]] = [
+        (lo, lambda x, lo=lo: x >= lo) for _, lo, _ in WEAR_BUCKETS
+    ]
+    top = WEAR_BUCKETS[-1][2]
+    preds.append((top + 1e-9, lambda x: (x - top) >= 1e-9))
+    return preds
+
+
+_WEAR_PREDICATES = _wear_predicates()
+
+
+def wear_index_from_count(n_true: int) -> Optional[int]:
+    """Índice en WEAR_BUCKETS según la cantidad de umbrales superados (None = Unknown)."""
+    if n_true == 0 or n_true > len(WEAR_BUCKETS):
+        return None
+    return n_true - 1
+
+
+def wear_thresholds(out_min: float, out_max: float) -> List[float]:
+    """Umbrales exactos de f_norm_avg (doubles) donde cambia el wear de un outcome.
+
+    `t[k]` es el menor f tal que el predicado k vale para `out_min + (out_max-out_min)*f`
+    (±inf si vale siempre / nunca). Parte de la solución analítica y la corrige ulp a
+    ulp para reproducir exactamente el redondeo de `compute_outcomes`.
+    """
+    out_rng = out_max - out_min
+    if out_rng < 0:
+        raise ValueError("Rango de float inválido en catálogo (float_max < float_min).")
+    out: List[float] = []
+    for boundary, pred in _WEAR_PREDICATES:
+        if out_rng == 0.0:
+            out.append(-math.inf if pred(out_min) else math.inf)
+            continue
+        out.append(_first_true(lambda f: pred(out_min + out_rng * f), (boundary - out_min) / out_rng))
+    return out
+
+
+def _first_true(pred: Callable[[float], bool], f0: float) -> float:
+    """Menor double f con `pred(f)` verdadero (pred monótono), partiendo de la estimación f0.
+
+    Acota el cambio alrededor de f0 con pasos que se duplican y después bisecta hasta
+    dos doubles adyacentes; terminar no depende de cuántos ulps haya entre f0 y el umbral
+    (p.ej. f0 = 0 con frontera == float_min recorrería todos los subnormales).
+    """
+    step = max(abs(f0) * 2.0 ** -52, 5e-324)
+    if pred(f0):
+        hi, lo = f0, f0 - step
+        while pred(lo):
+            hi, step = lo, step * 2.0
+            lo = hi - step
+    else:
+        lo, hi = f0, f0 + step
+        while not pred(hi):
+            lo, step = hi, step * 2.0
+            hi = lo + step
+    while True:
+        mid = lo + (hi - lo) / 2.0
+        if mid <= lo or mid >= hi:
+            return hi
+        if pred(mid):
+            hi = mid
+        else:
+            lo = mid
+
+
+def wear_breakpoints(collections: Iterable[str], rarity: str, catalog: Catalog) -> List[float]:
+    """Breakpoints de f_norm_avg en (0, 1] donde cambia algún wear de outcome.
+
+    Los tramos resultantes son [0, b0), [b0, b1), ..., [bn, 1.0].
+    """
+    points = set()
+    for coll in set(collections):
+        for it in catalog.outcomes_for(coll, rarity):
+            for t in wear_thresholds(it.float_min, it.float_max):
+                if 0.0 < t <= 1.0:
+                    points.add(t)
+    return sorted(points)
+
+
+def regime_representatives(breakpoints: List[float], margin: float = 1e-6) -> List[float]:
+    """Un f_norm_avg por tramo de wears: el extremo superior menos `margin`.
+
+    Es el punto del tramo con entradas más gastadas (en general más baratas) que
+    conserva los mismos wears de salida; el margen absorbe el redondeo de escribir
+    floats con 12 decimales. Se omiten tramos más angostos que `2 * margin`.
+    """
+    edges = [0.0] + list(breakpoints) + [1.0]
+    return [hi - margin for lo, hi in zip(edges, edges[1:]) if hi - lo >= 2 * margin]
+
+
+def ev_curve(
+    entries: List[ContractEntry],
+    catalog: Catalog,
+    prices_by_mhn: Optional[Mapping[str, int]] = None,
+    fees_rate: float = 0.02,
+    total_cost_cents: Optional[int] = None,
+) -> List[EvInterval]:
+    """EV/ROI/prob_profit del contrato para cada tramo de f_norm_avg en [0, 1].
+
+    Solo importa la mezcla de colecciones de `entries` (los floats no). El costo es
+    `total_cost_cents` o, si no se pasa, la suma de `PriceCents` de las entradas.
+    Se recorren los umbrales de todos los outcomes una sola vez, ordenados, y se
+    actualizan sumas enteras (Σ n_c·precio, Σ n_c·ganadores) por cambio de wear.
+
+    Para un f_norm_avg dentro de un tramo, `summary_metrics` da los mismos wears y
+    prob_profit; EV puede diferir solo en el orden de suma de punto flotante.
+
+    Raises:
+        ContractValidationError: si el contrato es inválido.
+    """
+    _, stattrak = validate_entries(entries)
+    next_rarity, count_by_collection, coll_to_outs, S = _outcome_pool(entries, catalog)
+    if total_cost_cents is None:
+        prices_in = [e.price_cents for e in entries if e.price_cents is not None]
+        if len(prices_in) == len(entries):
+            total_cost_cents = int(sum(prices_in))
+    has_cost = total_cost_cents is not None and total_cost_cents > 0
+    fee_keep = 1.0 - fees_rate
+    table = prices_by_mhn if isinstance(prices_by_mhn, PriceTable) else None
+
+    def price_of(name: str, wear_idx: Optional[int]) -> Optional[int]:
+        if prices_by_mhn is None or wear_idx is None:
+            return None
+        wear_name = WEAR_BUCKETS[wear_idx][0]
+        if table is not None:
+            return table.price(name, wear_name, stattrak)
+        return prices_by_mhn.get(build_market_hash_name(name, wear_name, stattrak))
+
+    # Estado por outcome (mismo orden que compute_outcomes)
+    names: List[str] = []
+    weights: List[int] = []
+    n_true: List[int] = []
+    prices: List[Optional[int]] = []
+    events: List[Tuple[float, int]] = []
+    for coll, outs in coll_to_outs.items():
+        for it in outs:
+            o = len(names)
+            names.append(it.name)
+            weights.append(count_by_collection[coll])
+            ts = wear_thresholds(it.float_min, it.float_max)
+            n_true.append(sum(1 for t in ts if t <= 0.0))
+            events.extend((t, o) for t in ts if 0.0 < t <= 1.0)
+            prices.append(price_of(it.name, wear_index_from_count(n_true[o])))
+    events.sort()
+
+    def wins(price: Optional[int]) -> bool:
+        return has_cost and price is not None and round(price * fee_keep) >= total_cost_cents
+
+    ev_num = sum(w * p for w, p in zip(weights, prices) if p is not None)
+    price_sum = sum(p for p in prices if p is not None)
+    missing = sum(1 for p in prices if p is None)
+    win_num = sum(w for w, p in zip(weights, prices) if wins(p))
+    n_out = len(names)
+
+    def interval(f_lo: float, f_hi: float) -> EvInterval:
+        wears = [
+            WEAR_BUCKETS[k][0] if k is not None else "Unknown"
+            for k in map(wear_index_from_count, n_true)
+        ]
+        seg = EvInterval(f_lo=f_lo, f_hi=f_hi, outcome_wears=wears)
+        if missing == 0:
+            seg.ev_gross_cents = ev_num / S
+            seg.ev_net_cents = seg.ev_gross_cents * fee_keep
+            seg.avg_outcome_price_cents = price_sum / n_out
+            if has_cost:
+                seg.pl_expected_net_cents = seg.ev_net_cents - total_cost_cents
+                seg.roi_net = seg.pl_expected_net_cents / total_cost_cents
+                seg.prob_profit = win_num / S
+        return seg
+
+    curve: List[EvInterval] = []
+    f_lo = 0.0
+    i = 0
+    while i < len(events):
+        t = events[i][0]
+        curve.append(interval(f_lo, t))
+        while i < len(events) and events[i][0] == t:
+            o = events[i][1]
+            old = prices[o]
+            n_true[o] += 1
+            new = price_of(names[o], wear_index_from_count(n_true[o]))
+            prices[o] = new
+            w = weights[o]
+            ev_num += w * ((new or 0) - (old or 0))
+            price_sum += (new or 0) - (old or 0)
+            missing += (new is None) - (old is None)
+            win_num += w * (wins(new) - wins(old))
+            i += 1
+        f_lo = t
+    curve.append(interval(f_lo, 1.0))
+    return curve
+
+
 def summarize_contract(entries: List[ContractEntry], outcomes: List[Outcome], fees_rate: float = 0.02) -> ContractResult:
     """Compat: wrapper que delega en `summary_metrics()` y devuelve `ContractResult`."""
     return summary_metrics(entries, outcomes, fees_rate=fees_rate)
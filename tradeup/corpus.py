@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import bisect
+import csv
+import hashlib
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .contracts import ContractValidationError, validate_entries
+from .csv_loader import Catalog, read_contract_csv
+from .models import ContractEntry
+
+
+# Corpus empaquetado de contratos (shards `.tucorp`, append-only)
+#
+# Layout (little-endian):
+#   header  : magic, versión, tamaño de registro, cantidad de skins del catálogo y
+#             sha256 del contenido del catálogo (los skin ids son índices de fila del catálogo)
+#   records : registros de tamaño fijo, uno por contrato:
+#             u32 skin[10], f64 float[10], i32 price[10] (-1 = sin PriceCents), u8 flags (bit 0 = StatTrak)
+#
+# La cantidad de contratos se deriva del tamaño del archivo; un registro final incompleto
+# (corte a mitad de un append) se ignora al leer y se trunca al volver a abrir para escribir.
+# Los floats se guardan en f64 (no f32): el float exacto decide wears y regímenes de f_norm.
+
+CORPUS_MAGIC = b"TUCORP\x00\x01"
+CORPUS_VERSION = 1
+CORPUS_SUFFIX = ".tucorp"
+
+_HEADER = struct.Struct("<8sIII32s")
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("skin", "<u4", (10,)),
+        ("float", "<f8", (10,)),
+        ("price", "<i4", (10,)),
+        ("flags", "u1"),
+        ("pad", "u1", (7,)),
+    ]
+)
+FLAG_STATTRAK = 1
+NO_PRICE = -1
+
+
+class CorpusError(ValueError):
+    """Shard inválido o generado con otro catálogo."""
+
+
+def catalog_digest(catalog: Catalog) -> bytes:
+    """sha256 del contenido del catálogo (mismo valor para el CSV y su snapshot compilado)."""
+    h = hashlib.sha256()
+    for it in catalog.items:
+        h.update(f"{it.name}\x1f{it.collection}\x1f{it.rarity}\x1f{it.float_min!r}\x1f{it.float_max!r}\x1e".encode("utf-8"))
+    return h.digest()
+
+
+def _read_header(path: Path) -> Tuple[int, bytes]:
+    with path.open("rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise CorpusError(f"Shard truncado: {path}")
+    magic, version, record_size, n_skins, digest = _HEADER.unpack_from(raw)
+    if magic != CORPUS_MAGIC or version != CORPUS_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise CorpusError(f"No es un shard de contratos compatible: {path}")
+    return n_skins, digest
+
+
+class CorpusWriter:
+    """Agrega contratos a un shard (lo crea si no existe). Usar como context manager o llamar a `close()`.
+
+    Los registros se acumulan en un buffer de `buffer_size` contratos y se escriben en bloque.
+    Con `truncate=True` se descarta el shard existente (y su `<shard>.consumed`, cuyos índices
+    dejarían de corresponder) en vez de agregar al final.
+    """
+
+    def __init__(
+        self, path: Union[str, Path], catalog: Catalog, buffer_size: int = 4096, truncate: bool = False
+    ) -> None:
+        self.path = Path(path)
+        if truncate:
+            for stale in (self.path, self.path.with_name(self.path.name + ".consumed")):
+                if stale.exists():
+                    stale.unlink()
+        self.catalog = catalog
+        self._digest = catalog_digest(catalog)
+        self._ids: Dict[Tuple[str, str], int] = {(it.name, it.collection): i for i, it in enumerate(catalog.items)}
+        self._buf = np.zeros(max(1, buffer_size), dtype=RECORD_DTYPE)
+        self._n_buf = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size >= HEADER_SIZE:
+            n_skins, digest = _read_header(self.path)
+            if digest != self._digest:
+                raise CorpusError(f"El shard {self.path} fue generado con otro catálogo")
+            size = self.path.stat().st_size
+            body = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize
+            if HEADER_SIZE + body != size:
+                os.truncate(self.path, HEADER_SIZE + body)
+            self._f = self.path.open("ab")
+        else:
+            self._f = self.path.open("wb")
+            header = _HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, RECORD_DTYPE.itemsize, len(catalog.items), self._digest)
+            self._f.write(header.ljust(HEADER_SIZE, b"\x00"))
+        self._count = (self._f.tell() - HEADER_SIZE) // RECORD_DTYPE.itemsize
+
+    def skin_id(self, name: str, collection: str) -> int:
+        i = self._ids.get((name, collection))
+        if i is None:
+            raise CorpusError(f"Skin no encontrada en catálogo: {name} ({collection})")
+        return i
+
+    def append(
+        self,
+        skin_ids: Sequence[int],
+        floats: Sequence[float],
+        stattrak: bool,
+        prices: Optional[Sequence[Optional[int]]] = None,
+    ) -> int:
+        """Agrega un contrato de 10 entradas y devuelve su índice dentro del shard."""
+        if len(skin_ids) != 10 or len(floats) != 10:
+            raise CorpusError("Un contrato empaquetado debe tener exactamente 10 entradas")
+        rec = self._buf[self._n_buf]
+        rec["skin"] = skin_ids
+        rec["float"] = floats
+        rec["price"] = [NO_PRICE if p is None else p for p in prices] if prices is not None else NO_PRICE
+        rec["flags"] = FLAG_STATTRAK if stattrak else 0
+        self._n_buf += 1
+        if self._n_buf == len(self._buf):
+            self.flush()
+        self._count += 1
+        return self._count - 1
+
+    def append_entries(self, entries: List[ContractEntry]) -> int:
+        """Agrega un contrato a partir de sus `ContractEntry`.
+
+        Aplica `validate_entries` y exige que la rareza de cada entrada coincida con la del
+        catálogo: el shard solo guarda un flag StatTrak por contrato y al desempaquetar la
+        rareza sale del catálogo, así que un contrato inválido quedaría válido sin este chequeo.
+
+        Raises:
+            CorpusError: si el contrato no es válido o alguna skin no está en el catálogo.
+        """
+        try:
+            _, stattrak = validate_entries(entries)
+        except ContractValidationError as e:
+            raise CorpusError(str(e)) from None
+        skin_ids = [self.skin_id(e.name, e.collection) for e in entries]
+        for e, sid in zip(entries, skin_ids):
+            expected = self.catalog.items[sid].rarity
+            if e.rarity != expected:
+                raise CorpusError(
+                    f"Rareza '{e.rarity}' de {e.name} ({e.collection}) no coincide con el catálogo ('{expected}')"
+                )
+        return self.append(skin_ids, [e.float_value for e in entries], bool(stattrak), [e.price_cents for e in entries])
+
+    def flush(self) -> None:
+        if self._n_buf:
+            self._f.write(self._buf[: self._n_buf].tobytes())
+            self._n_buf = 0
+        self._f.flush()
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CorpusReader:
+    """Lee un shard vía mmap; `records` es el array estructurado completo (sin copiar).
+
+    Valida que el shard se haya generado con el mismo catálogo (por contenido).
+    """
+
+    def __init__(self, path: Union[str, Path], catalog: Catalog) -> None:
+        self.path = Path(path)
+        self.catalog = catalog
+        n_skins, digest = _read_header(self.path)
+        if digest != catalog_digest(catalog) or n_skins != len(catalog.items):
+            raise CorpusError(f"El shard {self.path} fue generado con otro catálogo")
+        n = (self.path.stat().st_size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if n:
+            self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self._items = catalog.items
+
+    def __len__(self) -> int:
+        return int(self.records.shape[0])
+
+    def entries(self, i: int) -> List[ContractEntry]:
+        """Contrato i como `ContractEntry` (igual a leer su CSV exportado)."""
+        rec = self.records[i]
+        stattrak = bool(int(rec["flags"]) & FLAG_STATTRAK)
+        out: List[ContractEntry] = []
+        for sid, f, p in zip(rec["skin"].tolist(), rec["float"].tolist(), rec["price"].tolist()):
+            it = self._items[sid]
+            out.append(
+                ContractEntry(
+                    name=it.name,
+                    collection=it.collection,
+                    rarity=it.rarity,
+                    float_value=f,
+                    price_cents=None if p == NO_PRICE else p,
+                    stattrak=stattrak,
+                )
+            )
+        return out
+
+    def __iter__(self) -> Iterator[List[ContractEntry]]:
+        for i in range(len(self)):
+            yield self.entries(i)
+
+
+class ConsumedRecords:
+    """Registros de un shard ya ubicados en OK / FAIL / ERROR por el evaluador (`<shard>.consumed`).
+
+    El shard de origen es inmutable, así que el progreso se guarda aparte: una línea `inicio fin`
+    (rango semiabierto de índices) por tanda, append-only. `add` acumula en memoria y `flush` agrega
+    los rangos al archivo; llamarlo después de flushear los shards de destino, así un corte nunca marca
+    como consumido un registro que no llegó a escribirse. Una línea final incompleta se descarta y se
+    trunca al cargar.
+    """
+
+    def __init__(self, shard_path: Union[str, Path]) -> None:
+        shard = Path(shard_path)
+        self.path = shard.with_name(shard.name + ".consumed")
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._pending: List[int] = []
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        spans: List[Tuple[int, int]] = []
+        good = 0
+        with self.path.open("rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("línea incompleta")
+                    a, b = (int(x) for x in line.split())
+                except ValueError:
+                    # corte a mitad de un append
+                    break
+                spans.append((a, b))
+                good += len(line)
+        if good < self.path.stat().st_size:
+            with self.path.open("r+b") as f:
+                f.truncate(good)
+        self._merge(spans)
+
+    def _merge(self, spans: List[Tuple[int, int]]) -> None:
+        merged: List[List[int]] = []
+        for a, b in sorted(list(zip(self._starts, self._ends)) + spans):
+            if merged and a <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        self._starts = [a for a, _ in merged]
+        self._ends = [b for _, b in merged]
+
+    def __contains__(self, i: int) -> bool:
+        pos = bisect.bisect_right(self._starts, i) - 1
+        return pos >= 0 and i < self._ends[pos]
+
+    def __len__(self) -> int:
+        return sum(b - a for a, b in zip(self._starts, self._ends))
+
+    def add(self, i: int) -> None:
+        self._pending.append(i)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        spans: List[Tuple[int, int]] = []
+        for i in sorted(set(self._pending)):
+            if spans and i == spans[-1][1]:
+                spans[-1] = (spans[-1][0], i + 1)
+            else:
+                spans.append((i, i + 1))
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write("".join(f"{a} {b}\n" for a, b in spans))
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending.clear()
+        self._merge(spans)
+
+
+def record_name(shard_path: Union[str, Path], i: int) -> str:
+    """Nombre de archivo del contrato i de un shard al exportarlo (`<stem>__<idx>.csv`)."""
+    return f"{Path(shard_path).stem}__{i:07d}.csv"
+
+
+def write_contract_csv(path: Union[str, Path], entries: List[ContractEntry]) -> None:
+    """Escribe un contrato con el esquema de los generadores (Name,Collection,Rarity,Float,PriceCents,StatTrak)."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["Name", "Collection", "Rarity", "Float", "PriceCents", "StatTrak"])
+        for e in entries:
+            w.writerow(
+                [
+                    e.name,
+                    e.collection,
+                    e.rarity,
+                    f"{e.float_value:.12f}",
+                    "" if e.price_cents is None else e.price_cents,
+                    "true" if e.stattrak else "false",
+                ]
+            )
+
+
+def pack_contracts(
+    src_dir: Union[str, Path], out_path: Union[str, Path], catalog: Catalog
+) -> Tuple[int, List[Tuple[Path, str]]]:
+    """Empaqueta todos los CSV de contrato bajo `src_dir` (orden de ruta) en un shard.
+
+    Los CSV inválidos (ilegibles o rechazados por `CorpusWriter.append_entries`) se saltean.
+
+    Returns:
+        (cantidad empaquetada, lista de (ruta, motivo) de los CSV salteados)
+    """
+    files = sorted(Path(src_dir).rglob("*.csv"))
+    packed = 0
+    skipped: List[Tuple[Path, str]] = []
+    with CorpusWriter(out_path, catalog) as w:
+        for fp in files:
+            try:
+                w.append_entries(read_contract_csv(str(fp)))
+            except Exception as e:
+                skipped.append((fp, str(e)))
+                continue
+            packed += 1
+    return packed, skipped
+
+
+def unpack_contracts(shard_path: Union[str, Path], out_dir: Union[str, Path], catalog: Catalog) -> int:
+    """Exporta un shard a un CSV por contrato (ver `record_name`). Devuelve la cantidad."""
+    reader = CorpusReader(shard_path, catalog)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    for i in range(len(reader)):
+        write_contract_csv(out / record_name(shard_path, i), reader.entries(i))
+    return len(reader)
+
+
+__all__ = [
+    "CORPUS_SUFFIX",
+    "ConsumedRecords",
+    "CorpusError",
+    "CorpusReader",
+    "CorpusWriter",
+    "RECORD_DTYPE",
+    "catalog_digest",
+    "pack_contracts",
+    "record_name",
+    "unpack_contracts",
+    "write_contract_csv",
+]
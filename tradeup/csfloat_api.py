@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import os
+import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple, Iterable
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Iterable
 
 import requests
 from dotenv import load_dotenv
 
+from .price_cache import PriceCache
+from .ratelimit import TokenBucket
+
 # Load .env once (safe if called multiple times)
 load_dotenv(override=False)
 
@@ -34,12 +38,49 @@ def build_market_hash_name(name: str, wear_name: str, stattrak: bool) -> str:
     return f"{prefix}{name} ({wear_name})"
 
 
+def extract_next_cursor(headers: Mapping[str, str], data: Any) -> Optional[str]:
+    """Extrae cursor de siguiente página desde headers o cuerpo.
+
+    - Prefiere header 'X-Next-Cursor' (case-insensitive).
+    - Fallback: campo 'cursor' en el JSON si existe y es string.
+    """
+    # headers case-insensitive lookup
+    for k, v in headers.items():
+        if k.lower() == "x-next-cursor" and v:
+            return v
+    if isinstance(data, dict):
+        cursor = data.get("cursor")
+        if isinstance(cursor, str) and cursor:
+            return cursor
+    return None
+
+
+class _Flight:
+    """Consulta en vuelo de una clave: los demás threads esperan su resultado."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Optional[int] = None
+        self.error: Optional[BaseException] = None
+
+
 class CsfloatClient:
     """Minimal CSFloat client for GET /api/v1/listings.
 
     Notas:
     - Todos los precios están en centavos.
     - Incluye caché en memoria con TTL opcional para consultas de precio mínimo por `market_hash_name`.
+    - Se puede usar desde varios threads: cada thread usa su propia `requests.Session`, la caché
+      en memoria está protegida por un lock y las consultas concurrentes de una misma clave
+      (market_hash_name, categoría) se agrupan en una sola (single-flight; ver `stats`).
+    - Con `cache` (o la variable de entorno `CSFLOAT_PRICE_CACHE`) los precios además se
+      guardan en una caché SQLite compartida entre procesos (ver `tradeup.price_cache`).
+    - Con `rate_limiter` (o `CSFLOAT_RATE_LIMIT` = requests/min en el entorno, con
+      `CSFLOAT_RATE_LIMIT_FILE` para compartirlo entre procesos) cada request toma un token
+      antes de salir y un 429 pausa a todos los que comparten el limitador (ver `tradeup.ratelimit`).
+    - `miss_ttl_seconds` es la vigencia en memoria de un "sin listados" (None = igual que `ttl_seconds`).
     """
 
     def __init__(
@@ -49,15 +90,29 @@ class CsfloatClient:
         timeout: float = 15.0,
         ttl_seconds: Optional[float] = 300.0,
         max_pages: int = 3,
+        miss_ttl_seconds: Optional[float] = None,
+        cache: Optional[PriceCache] = None,
+        rate_limiter: Optional[TokenBucket] = None,
     ) -> None:
         self.api_key = api_key or get_api_key()
         self.base_url = base_url or BASE_URL
         self.timeout = timeout
         self.ttl_seconds = ttl_seconds
         self.max_pages = max_pages
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.cache = cache if cache is not None else PriceCache.from_env()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket.from_env()
         self.session = requests.Session()
+        # requests.Session no es thread-safe: los demás threads crean la suya (ver `_session`)
+        self._local = threading.local()
+        self._local.session = self.session
         # cache key: (market_hash_name, category) -> (price_cents_or_None, expires_at_epoch_or_0)
         self._cache: Dict[Tuple[str, int], Tuple[Optional[int], float]] = {}
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, int], _Flight] = {}
+        # lookups = llamadas; hits = caché en memoria; coalesced = esperaron la consulta de otro thread;
+        # fetched = resueltas fuera de memoria (caché en disco o API)
+        self.stats: Dict[str, int] = {"lookups": 0, "hits": 0, "coalesced": 0, "fetched": 0}
 
     def _headers(self) -> Dict[str, str]:
         headers = {"accept": "application/json"}
@@ -69,22 +124,37 @@ class CsfloatClient:
             headers["cookie"] = cookie
         return headers
 
-    
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _send(self, url: str, params: Dict[str, Any]) -> requests.Response:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return self._session().get(url, headers=self._headers(), params=params, timeout=self.timeout)
 
     def _get_with_retries(self, path: str, params: Dict[str, Any], retries: int = 4) -> Tuple[Dict[str, Any], Dict[str, str]]:
         """GET con reintentos que devuelve (data_normalizada, headers).
 
         - Normaliza listas a {"data": list} para uso interno consistente.
-        - Aplica backoff exponencial y respeta 'retry-after' en 429.
+        - Aplica backoff exponencial y respeta 'retry-after' en 429 (con limitador compartido,
+          el 429 pausa el limitador en vez de dormir solo este thread).
         """
         url = f"{self.base_url}{path}"
         backoffs = [0.5, 1.0, 2.0, 4.0]
         for attempt in range(retries):
             try:
-                resp = self.session.get(url, headers=self._headers(), params=params, timeout=self.timeout)
+                resp = self._send(url, params)
                 if resp.status_code == 429:
                     retry_after = float(resp.headers.get("retry-after", backoffs[min(attempt, len(backoffs)-1)]))
-                    time.sleep(retry_after)
+                    if self.rate_limiter is not None:
+                        # La próxima request (de cualquier worker) espera la pausa en acquire()
+                        self.rate_limiter.pause(retry_after)
+                    else:
+                        time.sleep(retry_after)
                     continue
                 if 500 <= resp.status_code < 600:
                     time.sleep(backoffs[min(attempt, len(backoffs)-1)])
@@ -100,7 +170,7 @@ class CsfloatClient:
                 time.sleep(backoffs[min(attempt, len(backoffs)-1)])
                 continue
         # intento final
-        resp = self.session.get(url, headers=self._headers(), params=params, timeout=self.timeout)
+        resp = self._send(url, params)
         resp.raise_for_status()
         data_raw = resp.json()
         if isinstance(data_raw, dict) and "data" in data_raw:
@@ -109,23 +179,6 @@ class CsfloatClient:
             return {"data": data_raw}, dict(resp.headers)
         return data_raw, dict(resp.headers)
 
-    @staticmethod
-    def _extract_next_cursor(headers: Dict[str, str], data: Dict[str, Any]) -> Optional[str]:
-        """Extrae cursor de siguiente página desde headers o cuerpo.
-
-        - Prefiere header 'X-Next-Cursor' (case-insensitive).
-        - Fallback: campo 'cursor' en el JSON si existe y es string.
-        """
-        # headers case-insensitive lookup
-        for k, v in headers.items():
-            if k.lower() == "x-next-cursor" and v:
-                return v
-        if isinstance(data, dict):
-            cursor = data.get("cursor")
-            if isinstance(cursor, str) and cursor:
-                return cursor
-        return None
-
     def iter_listings(self, **filters: Any) -> Iterable[Dict[str, Any]]:
         """Itera sobre listados paginando con cursor cuando esté disponible.
 
@@ -150,7 +203,7 @@ class CsfloatClient:
             for it in items:
                 yield it
             # siguiente página
-            next_cursor = self._extract_next_cursor(headers, data)
+            next_cursor = extract_next_cursor(headers, data)
             if not next_cursor:
                 break
             cursor = next_cursor
@@ -163,19 +216,57 @@ class CsfloatClient:
         - Filtra por `market_hash_name` exacto cuando el backend lo provee en cada item.
         - Valida la categoría con StatTrak cuando esté disponible en el item.
         - Ignora precios faltantes o no positivos.
-        - Aplica caché en memoria con TTL opcional configurada en el constructor.
+        - Aplica caché en memoria con TTL opcional configurada en el constructor y, si hay,
+          la caché persistente (un acierto en disco conserva su vencimiento original).
 
         API params relevantes:
         - category: 1 normal, 2 stattrak, 3 souvenir
         """
         category = 2 if stattrak else 1
         cache_key = (market_hash_name, category)
-        # cache hit con TTL válida
-        cached = self._cache.get(cache_key)
+        with self._cache_lock:
+            self.stats["lookups"] += 1
+            # cache hit con TTL válida
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                value, expires_at = cached
+                if expires_at == 0 or expires_at > time.time():
+                    self.stats["hits"] += 1
+                    return value
+            flight = self._inflight.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[cache_key] = _Flight()
+                self.stats["fetched"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._resolve_lowest(market_hash_name, category, stattrak)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._cache_lock:
+                del self._inflight[cache_key]
+            flight.done.set()
+        return flight.value
+
+    def _resolve_lowest(self, market_hash_name: str, category: int, stattrak: bool) -> Optional[int]:
+        """Precio mínimo fuera de la caché en memoria (caché persistente o API) y lo guarda."""
+        cache_key = (market_hash_name, category)
         now = time.time()
-        if cached is not None:
-            value, expires_at = cached
-            if expires_at == 0 or expires_at > now:
+        if self.cache is not None:
+            found, value, expires_at = self.cache.lookup(market_hash_name, category)
+            if found:
+                with self._cache_lock:
+                    self._cache[cache_key] = (value, expires_at)
                 return value
 
         params: Dict[str, Any] = {
@@ -220,12 +311,17 @@ class CsfloatClient:
                 lowest = price_int
 
         # guardar en caché (respeta TTL si se configuró, 0 = sin expiración)
-        expires_at = 0.0 if self.ttl_seconds in (None, 0) else now + float(self.ttl_seconds)
-        self._cache[cache_key] = (lowest, expires_at)
+        ttl = self.ttl_seconds if lowest is not None or self.miss_ttl_seconds is None else self.miss_ttl_seconds
+        expires_at = 0.0 if ttl in (None, 0) else now + float(ttl)
+        with self._cache_lock:
+            self._cache[cache_key] = (lowest, expires_at)
+        if self.cache is not None:
+            self.cache.put(market_hash_name, category, lowest)
         return lowest
 
 
 __all__ = [
     "CsfloatClient",
     "build_market_hash_name",
+    "extract_next_cursor",
 ]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from .csfloat_api import build_market_hash_name
+from .models import ContractEntry, Outcome, wear_from_float
+
+
+# Índice de dependencias precio → contrato
+#
+# Cada contrato evaluado registra los market_hash_name cuyo precio usó (entradas sin
+# PriceCents propio y todos sus outcomes). Ante un diff de precios solo se re-evalúan
+# los contratos que dependen de algún MHN cambiado.
+
+
+def contract_mhns(
+    entries: List[ContractEntry],
+    outcomes: List[Outcome],
+    stattrak: bool,
+    priced_inputs: Optional[Iterable[int]] = None,
+) -> Set[str]:
+    """MHNs de los que depende el resultado del contrato.
+
+    `priced_inputs` son los índices de las entradas cuyo precio se resolvió contra la fuente
+    de precios (las que traían `PriceCents` en el CSV no dependen de ella); None = todas.
+    """
+    idx = range(len(entries)) if priced_inputs is None else priced_inputs
+    mhns = {build_market_hash_name(entries[i].name, wear_from_float(entries[i].float_value), stattrak) for i in idx}
+    mhns.update(build_market_hash_name(o.name, o.wear_name, stattrak) for o in outcomes)
+    return mhns
+
+
+def price_diff(old: Mapping[str, int], new: Mapping[str, int]) -> Set[str]:
+    """MHNs con precio nuevo, eliminado o distinto entre dos snapshots."""
+    changed = {mhn for mhn, cents in new.items() if old.get(mhn) != cents}
+    changed.update(mhn for mhn in old if mhn not in new)
+    return changed
+
+
+class DependencyIndex:
+    """Índice inverso persistente (SQLite) MHN → contratos, con la ubicación y el estado de cada contrato.
+
+    Los contratos se identifican por su ruta relativa dentro del corpus (`rel`), que se
+    conserva al moverlos entre OK/FAIL/ERROR; `location` es la ruta actual del archivo.
+    Es thread-safe; las escrituras se confirman en lotes (ver `flush`/`close`).
+    """
+
+    _CHUNK = 500  # límite holgado de parámetros por consulta IN (...)
+
+    def __init__(self, path: Union[str, Path], commit_every: int = 256) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.commit_every = max(1, commit_every)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS contracts (rel TEXT PRIMARY KEY, location TEXT NOT NULL, status TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS deps (mhn TEXT NOT NULL, rel TEXT NOT NULL, PRIMARY KEY (mhn, rel)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS deps_rel ON deps(rel)")
+        self._conn.commit()
+
+    def record(self, rel: str, location: str, status: str, mhns: Iterable[str]) -> None:
+        """Registra (o reemplaza) las dependencias, ubicación y estado de un contrato."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contracts(rel, location, status) VALUES(?, ?, ?)", (rel, location, status)
+            )
+            self._conn.execute("DELETE FROM deps WHERE rel = ?", (rel,))
+            self._conn.executemany("INSERT OR IGNORE INTO deps(mhn, rel) VALUES(?, ?)", ((m, rel) for m in mhns))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+
+    def affected(self, mhns: Iterable[str]) -> List[Tuple[str, str, str]]:
+        """(rel, location, status) de los contratos que dependen de algún MHN dado, ordenados por rel."""
+        keys = list(set(mhns))
+        rels: Set[str] = set()
+        with self._lock:
+            for i in range(0, len(keys), self._CHUNK):
+                chunk = keys[i : i + self._CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rels.update(r for (r,) in self._conn.execute(f"SELECT DISTINCT rel FROM deps WHERE mhn IN ({marks})", chunk))
+            out = []
+            for rel in sorted(rels):
+                row = self._conn.execute("SELECT location, status FROM contracts WHERE rel = ?", (rel,)).fetchone()
+                if row is not None:
+                    out.append((rel, row[0], row[1]))
+        return out
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
+
+
+__all__ = [
+    "DependencyIndex",
+    "contract_mhns",
+    "price_diff",
+]
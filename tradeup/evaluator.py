@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Optional
+
+from .contracts import (
+    validate_entries,
+    fill_ranges_from_catalog,
+    compute_outcomes,
+    summary_metrics,
+)
+from .csfloat_api import CsfloatClient
+from .catalog_snapshot import load_catalog
+from .csv_loader import Catalog, read_contract_csv
+from .memo import OutcomeMemo, file_version
+from .models import ContractEntry, ContractResult
+from .registry import ItemRegistry, load_price_table
+from .pricing import (
+    DEFAULT_PRICE_WORKERS,
+    fill_prices,
+    fill_entry_prices_local,
+    fill_outcome_prices_local,
+)
+
+
+def decision_label(res: ContractResult) -> str:
+    """Etiqueta de decisión usada por la CLI y el evaluador por lotes."""
+    if res.total_inputs_cost_cents is not None and res.ev_net_cents is not None:
+        return "✅ RENTABLE" if res.ev_net_cents >= res.total_inputs_cost_cents else "❌ NO rentable"
+    return "❔ Incompleto (faltan precios)"
+
+
+def result_payload(res: ContractResult) -> Dict[str, Any]:
+    """Payload JSON (decisión + resumen + outcomes) que imprime `tradeup.cli --json`."""
+    return {
+        "decision": decision_label(res),
+        "fees_rate": res.fees_rate,
+        "summary": {
+            "total_cost_cents": res.total_inputs_cost_cents,
+            "ev_gross_cents": res.ev_gross_cents,
+            "ev_net_cents": res.ev_net_cents,
+            "pl_expected_net_cents": res.pl_expected_net_cents,
+            "roi_net": res.roi_net,
+            "prob_profit": res.prob_profit,
+            "break_even_price_cents": res.break_even_price_cents,
+            "max_break_even_cost_total_cents": res.max_break_even_cost_total_cents,
+            "max_break_even_cost_per_skin_cents": res.max_break_even_cost_per_skin_cents,
+            "ratio_avg_cost_bruta": res.roi_simple_ratio,
+            "ratio_avg_cost_neta": res.roi_simple_net_ratio,
+        },
+        "outcomes": [
+            {
+                "name": o.name,
+                "collection": o.collection,
+                "rarity": o.rarity,
+                "prob": o.prob,
+                "out_float": o.out_float,
+                "wear": o.wear_name,
+                "price_cents": o.price_cents,
+            }
+            for o in res.outcomes
+        ],
+    }
+
+
+class Evaluator:
+    """Evalúa contratos en el mismo proceso reutilizando catálogo y precios.
+
+    Carga el `Catalog` y el mapa de precios una sola vez y aplica, por contrato,
+    `validate_entries` → `fill_ranges_from_catalog` → `compute_outcomes` → `summary_metrics`.
+
+    Fuente de precios (misma prioridad que la CLI):
+    - `client`: consulta CSFloat para entradas sin `PriceCents` y para outcomes.
+    - `prices_by_mhn`: mapa local market_hash_name -> price_cents (dict o `PriceTable`).
+    - ninguno: solo se usan los `PriceCents` del contrato.
+
+    Con `memo` (ver `tradeup.memo.OutcomeMemo`) las tablas de outcomes con precio se
+    reutilizan entre contratos con la misma clave canónica. `memo_version` identifica el
+    snapshot de catálogo+precios y forma parte de la clave; con CSFloat en vivo no hay
+    snapshot estable, así que la versión lleva el prefijo `live:` y no debe persistirse.
+
+    Con `client`, los precios de entradas y outcomes de un contrato se resuelven en una
+    sola tanda de MHNs únicos, con hasta `price_workers` consultas en paralelo.
+    """
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        prices_by_mhn: Optional[Mapping[str, int]] = None,
+        client: Optional[CsfloatClient] = None,
+        fees_rate: float = 0.02,
+        memo: Optional[OutcomeMemo] = None,
+        memo_version: str = "",
+        price_workers: int = DEFAULT_PRICE_WORKERS,
+    ) -> None:
+        self.catalog = catalog
+        self.prices_by_mhn = prices_by_mhn
+        self.client = client
+        self.fees_rate = fees_rate
+        self.memo = memo
+        self.memo_version = memo_version
+        self.price_workers = price_workers
+
+    @classmethod
+    def from_paths(
+        cls,
+        catalog_path: str,
+        local_prices: Optional[str] = None,
+        fetch_prices: bool = False,
+        fees_rate: float = 0.02,
+        memo: Optional[OutcomeMemo] = None,
+        price_workers: int = DEFAULT_PRICE_WORKERS,
+    ) -> "Evaluator":
+        catalog = load_catalog(catalog_path)
+        prices_by_mhn = None
+        if local_prices:
+            prices_by_mhn = load_price_table(local_prices, ItemRegistry.from_catalog(catalog))
+        client = CsfloatClient() if fetch_prices else None
+        memo_version = ""
+        if memo is not None:
+            if client is not None:
+                prices_version = "live:csfloat"
+            elif local_prices:
+                prices_version = file_version(local_prices)
+            else:
+                prices_version = "contract"
+            memo_version = f"{file_version(catalog_path)}:{prices_version}"
+        return cls(
+            catalog,
+            prices_by_mhn=prices_by_mhn,
+            client=client,
+            fees_rate=fees_rate,
+            memo=memo,
+            memo_version=memo_version,
+            price_workers=price_workers,
+        )
+
+    def evaluate(self, entries: List[ContractEntry]) -> ContractResult:
+        """Evalúa un contrato (las entradas se completan in-place con rangos y precios).
+
+        Raises:
+            ContractValidationError: si el contrato es inválido.
+        """
+        _, stattrak = validate_entries(entries)
+        fill_ranges_from_catalog(entries, self.catalog)
+
+        if self.client is None and self.prices_by_mhn is not None:
+            fill_entry_prices_local(entries, self.prices_by_mhn, stattrak)
+
+        # La clave del memo no depende de precios: con CSFloat, entradas y outcomes (si no
+        # hay tabla memoizada) se consultan juntos en una sola tanda
+        key = self.memo.key_for(entries, self.catalog, stattrak, self.memo_version) if self.memo is not None else None
+        outcomes = self.memo.get(key, entries) if key is not None else None
+        if outcomes is None:
+            outcomes = compute_outcomes(entries, self.catalog)
+            if self.client is not None:
+                fill_prices(entries, outcomes, self.client, stattrak, self.price_workers)
+            elif self.prices_by_mhn is not None:
+                fill_outcome_prices_local(outcomes, self.prices_by_mhn, stattrak)
+            if key is not None:
+                self.memo.put(key, outcomes)
+        elif self.client is not None:
+            fill_prices(entries, [], self.client, stattrak, self.price_workers)
+
+        return summary_metrics(entries, outcomes, fees_rate=self.fees_rate)
+
+    def evaluate_file(self, path: str) -> ContractResult:
+        """Lee un CSV de contrato y lo evalúa."""
+        return self.evaluate(read_contract_csv(path))
+
+    def __repr__(self) -> str:  # pragma: no cover
+        source = "csfloat" if self.client is not None else ("local" if self.prices_by_mhn is not None else "contract")
+        return f"Evaluator(catalog={self.catalog!r}, prices={source}, fees_rate={self.fees_rate})"
+
+
+__all__ = [
+    "Evaluator",
+    "decision_label",
+    "result_payload",
+]
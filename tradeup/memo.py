@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from .contracts import compute_f_norm_avg, wear_breakpoints
+from .csv_loader import Catalog
+from .models import ContractEntry, Outcome, RARITY_NEXT
+
+
+# Memo de tablas de outcomes con precio
+#
+# Dos contratos con las mismas cantidades por colección, el mismo régimen de wear de
+# f_norm_avg (tramo entre breakpoints de `wear_breakpoints`) y el mismo StatTrak tienen
+# los mismos outcomes, probabilidades, wears y precios; solo cambia el costo de las
+# entradas y el float exacto de cada outcome (que se recalcula al reutilizar la tabla).
+
+# (rareza, ((colección, n), ...), régimen, stattrak, versión de catálogo+precios)
+ContractKey = Tuple[str, Tuple[Tuple[str, int], ...], int, bool, str]
+
+# Fila de la tabla: (name, collection, rarity, float_min, float_max, prob, wear_name, price_cents)
+OutcomeRow = Tuple[str, str, str, float, float, float, str, Optional[int]]
+
+
+def file_version(path: Union[str, Path]) -> str:
+    """Huella corta del contenido de un archivo (catálogo o CSV de precios)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def canonical_counts(entries: List[ContractEntry]) -> Tuple[Tuple[str, int], ...]:
+    """Cantidades por colección, ordenadas por nombre (independiente del orden y de las skins)."""
+    return tuple(sorted(Counter(e.collection for e in entries).items()))
+
+
+class OutcomeMemo:
+    """Cache LRU (acotada a `maxsize` tablas) de outcomes con precio por clave canónica.
+
+    Con `store_path` las tablas además se persisten en SQLite y se reutilizan entre
+    corridas; la versión en la clave (catálogo + precios) evita reutilizar tablas viejas.
+    Es thread-safe (un lock por instancia), así que se puede compartir entre workers.
+    """
+
+    def __init__(self, maxsize: int = 4096, store_path: Optional[Union[str, Path]] = None) -> None:
+        self.maxsize = max(1, maxsize)
+        self._tables: "OrderedDict[ContractKey, Tuple[OutcomeRow, ...]]" = OrderedDict()
+        self._breakpoints: "OrderedDict[Tuple[str, Tuple[str, ...]], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending = 0
+        self.store_path = Path(store_path) if store_path is not None else None
+        if self.store_path is not None:
+            path = self.store_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS outcome_tables (key TEXT PRIMARY KEY, rows TEXT NOT NULL)")
+            self._conn.commit()
+
+    # -- clave -----------------------------------------------------------------
+    def _regime_breakpoints(self, rarity: str, collections: Tuple[str, ...], catalog: Catalog) -> List[float]:
+        ck = (rarity, collections)
+        with self._lock:
+            bp = self._breakpoints.get(ck)
+            if bp is not None:
+                self._breakpoints.move_to_end(ck)
+                return bp
+        bp = wear_breakpoints(collections, rarity, catalog)
+        with self._lock:
+            self._breakpoints[ck] = bp
+            if len(self._breakpoints) > self.maxsize:
+                self._breakpoints.popitem(last=False)
+        return bp
+
+    def key_for(
+        self, entries: List[ContractEntry], catalog: Catalog, stattrak: bool, version: str
+    ) -> Optional[ContractKey]:
+        """Clave canónica del contrato (entradas ya validadas y con rangos); None si no es memoizable."""
+        rarity = entries[0].rarity
+        if not RARITY_NEXT.get(rarity):
+            return None
+        f_norm_avg = compute_f_norm_avg(entries)
+        # Fuera de [0, 1] los wears pueden caer en Unknown sin breakpoint que lo distinga
+        if not 0.0 <= f_norm_avg <= 1.0:
+            return None
+        counts = canonical_counts(entries)
+        bp = self._regime_breakpoints(rarity, tuple(c for c, _ in counts), catalog)
+        return (rarity, counts, bisect_right(bp, f_norm_avg), stattrak, version)
+
+    # -- tablas ----------------------------------------------------------------
+    @staticmethod
+    def _store_key(key: ContractKey) -> str:
+        return json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+    def get(self, key: ContractKey, entries: List[ContractEntry]) -> Optional[List[Outcome]]:
+        """Outcomes memoizados para `entries`, en el mismo orden que `compute_outcomes`.
+
+        El float de salida se recalcula con el f_norm_avg exacto de las entradas.
+        """
+        with self._lock:
+            rows = self._tables.get(key)
+            if rows is not None:
+                self._tables.move_to_end(key)
+                self.hits += 1
+            elif self._conn is not None:
+                found = self._conn.execute(
+                    "SELECT rows FROM outcome_tables WHERE key = ?", (self._store_key(key),)
+                ).fetchone()
+                if found is not None:
+                    rows = tuple(tuple(r) for r in json.loads(found[0]))
+                    self._remember(key, rows)
+                    self.disk_hits += 1
+            if rows is None:
+                self.misses += 1
+                return None
+        f_norm_avg = compute_f_norm_avg(entries)
+        # compute_outcomes agrupa por colección en orden de primera aparición en las entradas
+        rank: Dict[str, int] = {}
+        for e in entries:
+            rank.setdefault(e.collection, len(rank))
+        rows = sorted(rows, key=lambda r: rank[r[1]])
+        return [
+            Outcome(
+                name=name,
+                collection=coll,
+                rarity=rarity,
+                float_min=fmin,
+                float_max=fmax,
+                prob=prob,
+                out_float=fmin + (fmax - fmin) * f_norm_avg,
+                wear_name=wear_name,
+                price_cents=price,
+            )
+            for name, coll, rarity, fmin, fmax, prob, wear_name, price in rows
+        ]
+
+    def put(self, key: ContractKey, outcomes: List[Outcome]) -> None:
+        rows = tuple(
+            (o.name, o.collection, o.rarity, o.float_min, o.float_max, o.prob, o.wear_name, o.price_cents)
+            for o in outcomes
+        )
+        with self._lock:
+            self._remember(key, rows)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO outcome_tables(key, rows) VALUES(?, ?)",
+                    (self._store_key(key), json.dumps(rows, ensure_ascii=False, separators=(",", ":"))),
+                )
+                self._pending += 1
+                if self._pending >= 256:
+                    self._conn.commit()
+                    self._pending = 0
+
+    def _remember(self, key: ContractKey, rows: Tuple[OutcomeRow, ...]) -> None:
+        self._tables[key] = rows
+        self._tables.move_to_end(key)
+        if len(self._tables) > self.maxsize:
+            self._tables.popitem(last=False)
+
+    # -- estado ----------------------------------------------------------------
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "lookups": total,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+                "size": len(self._tables),
+            }
+
+    def summary(self) -> str:
+        s = self.stats()
+        disk = f", disco {s['disk_hits']}" if self.store_path is not None else ""
+        return (
+            f"memo outcomes: {s['lookups']} consultas, aciertos {s['hits']}{disk}, "
+            f"fallos {s['misses']} (hit rate {s['hit_rate'] * 100:.1f}%), {s['size']} tablas en memoria"
+        )
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+
+__all__ = [
+    "ContractKey",
+    "OutcomeMemo",
+    "canonical_counts",
+    "file_version",
+]
@@ -89,6 +89,23 @@ class ContractResult:
     roi_simple_net_ratio: Optional[float] = None
 
 
+@dataclass
+class EvInterval:
+    """Tramo de f_norm_avg con wears de outcomes constantes (ver `contracts.ev_curve`).
+
+    Cubre [f_lo, f_hi); el último tramo incluye f_hi = 1.0.
+    """
+    f_lo: float
+    f_hi: float
+    outcome_wears: List[str]  # mismo orden que los outcomes de compute_outcomes
+    ev_gross_cents: Optional[float] = None
+    ev_net_cents: Optional[float] = None
+    avg_outcome_price_cents: Optional[float] = None
+    pl_expected_net_cents: Optional[float] = None
+    roi_net: Optional[float] = None
+    prob_profit: Optional[float] = None
+
+
 # Utilidades de wear
 WEAR_BUCKETS: List[Tuple[str, float, float]] = [
     ("Factory New", 0.00, 0.07),
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from math import comb
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+
+# Ranking de multisets (combinaciones con repetición) en orden lexicográfico
+#
+# El orden es el de `itertools.combinations_with_replacement(range(n), k)`: la tupla no
+# decreciente (a_0 <= ... <= a_{k-1}) con rango r es la r-ésima que produce itertools.
+# Multisets de tamaño m con elementos en [v, n): C(n - v + m - 1, m).
+
+
+def multiset_count(n: int, k: int) -> int:
+    """Cantidad de multisets de tamaño k sobre n elementos: C(n + k - 1, k)."""
+    if n <= 0:
+        return 1 if k == 0 else 0
+    return comb(n + k - 1, k)
+
+
+def _tail(n: int, v: int, m: int) -> int:
+    # Multisets de tamaño m con todos los elementos en [v, n)
+    return comb(n - v + m - 1, m) if v < n else (1 if m == 0 else 0)
+
+
+def rank_multiset(combo: Sequence[int], n: int) -> int:
+    """Rango lexicográfico de una tupla no decreciente sobre range(n)."""
+    k = len(combo)
+    r = 0
+    lo = 0
+    for j, a in enumerate(combo):
+        if not lo <= a < n:
+            raise ValueError(f"Multiset inválido en posición {j}: {a} (esperado {lo}..{n - 1})")
+        m = k - j
+        # Los que empiezan (en esta posición) con un valor en [lo, a)
+        r += _tail(n, lo, m) - _tail(n, a, m)
+        lo = a
+    return r
+
+
+def unrank_multiset(r: int, n: int, k: int) -> Tuple[int, ...]:
+    """Multiset de rango r (inversa de `rank_multiset`), con k búsquedas binarias sobre n."""
+    if not 0 <= r < multiset_count(n, k):
+        raise ValueError(f"Rango fuera de [0, C(n+k-1, k)): {r}")
+    out: List[int] = []
+    lo = 0
+    for j in range(k):
+        m = k - j
+        base = _tail(n, lo, m)
+        # Mayor v en [lo, n) con (cantidad que empiezan en [lo, v)) <= r
+        a, b = lo, n - 1
+        while a < b:
+            mid = (a + b + 1) // 2
+            if base - _tail(n, mid, m) <= r:
+                a = mid
+            else:
+                b = mid - 1
+        r -= base - _tail(n, a, m)
+        out.append(a)
+        lo = a
+    return tuple(out)
+
+
+def next_multiset(combo: List[int], n: int) -> bool:
+    """Avanza `combo` in-place al siguiente multiset lexicográfico; False si era el último."""
+    k = len(combo)
+    j = k - 1
+    while j >= 0 and combo[j] == n - 1:
+        j -= 1
+    if j < 0:
+        return False
+    v = combo[j] + 1
+    for i in range(j, k):
+        combo[i] = v
+    return True
+
+
+def iter_multisets(n: int, k: int, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+    """(rango, multiset) para los rangos en [start, stop), arrancando directo en `start`."""
+    total = multiset_count(n, k)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop:
+        return
+    combo = list(unrank_multiset(start, n, k))
+    r = start
+    while True:
+        yield r, tuple(combo)
+        r += 1
+        if r >= stop or not next_multiset(combo, n):
+            return
+
+
+def iter_multisets_bounded(
+    costs: Sequence[int],
+    k: int,
+    floor: Optional[int] = None,
+    cap: Optional[int] = None,
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+    """Como `iter_multisets` sobre range(len(costs)), pero solo multisets con suma de costos en [floor, cap].
+
+    `costs` debe estar ordenado de forma no decreciente: con un prefijo fijo y el valor v en la
+    posición j, las posiciones restantes cuestan al menos `costs[v]` y a lo sumo `costs[-1]` cada una,
+    así que se descartan subárboles completos (y, por monotonía, todos los v mayores cuando se supera
+    el tope). Los rangos devueltos son los mismos que en la enumeración sin poda.
+    """
+    n = len(costs)
+    if any(costs[i] > costs[i + 1] for i in range(n - 1)):
+        raise ValueError("costs debe estar ordenado de forma no decreciente")
+    total = multiset_count(n, k)
+    stop = total if stop is None else min(stop, total)
+    if n == 0 or start >= stop:
+        return
+    c_max = costs[-1]
+    combo = [0] * k
+
+    def walk(j: int, lo_v: int, prefix: int, base: int) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+        # base = rango del primer multiset con este prefijo y combo[j] >= lo_v
+        rest = k - 1 - j
+        v = lo_v
+        if floor is not None:
+            # Menor v cuyo máximo alcanzable llega al piso (los anteriores no pueden)
+            v0 = bisect_left(costs, floor - prefix - rest * c_max, lo_v)
+            base += _tail(n, lo_v, rest + 1) - _tail(n, v0, rest + 1)
+            v = v0
+        while v < n and base < stop:
+            size = _tail(n, v, rest)
+            if cap is not None and prefix + costs[v] * (rest + 1) > cap:
+                return  # este v y todos los mayores superan el tope
+            if base + size > start:
+                combo[j] = v
+                if rest == 0:
+                    yield base, tuple(combo)
+                else:
+                    yield from walk(j + 1, v, prefix + costs[v], base)
+            base += size
+            v += 1
+
+    yield from walk(0, 0, 0, 0)
+
+
+def shard_range(lo: int, hi: int, parts: int, index: int) -> Tuple[int, int]:
+    """Tramo `index` de [lo, hi) partido en `parts` tramos contiguos de tamaño casi igual."""
+    if not 0 <= index < parts:
+        raise ValueError(f"Índice de tramo fuera de 0..{parts - 1}: {index}")
+    size = hi - lo
+    return lo + size * index // parts, lo + size * (index + 1) // parts
+
+
+__all__ = [
+    "iter_multisets",
+    "iter_multisets_bounded",
+    "multiset_count",
+    "next_multiset",
+    "rank_multiset",
+    "shard_range",
+    "unrank_multiset",
+]
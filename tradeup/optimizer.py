@@ -0,0 +1,516 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .contracts import regime_representatives, wear_thresholds
+from .csv_loader import Catalog
+from .models import ContractEntry, RARITY_NEXT, SkinCatalogItem, WEAR_BUCKETS, normalize_rarity
+
+
+# Optimizador de contratos por branch-and-bound
+#
+# Modelo: todas las entradas usan el mismo float normalizado u (f = min + (max-min)*u),
+# así que f_norm_avg = u. Dentro de un régimen de u (tramo entre breakpoints de wear de
+# entradas y outcomes) cada colección c tiene:
+#   A_c = Σ_{o∈c} precio_o   (suma de precios de sus outcomes)
+#   m_c = cantidad de outcomes
+#   C_c = precio de la entrada más barata de c
+# y un contrato queda determinado por los conteos n_c (Σ n_c = 10):
+#   EV_bruto = Σ n_c·A_c / Σ n_c·m_c        costo = Σ n_c·C_c
+# La búsqueda recorre los conteos colección por colección y poda con una relajación
+# lineal admisible (ver `_Regime`), que nunca subestima el mejor score alcanzable.
+
+PriceFn = Callable[[str, str, bool], Optional[int]]
+
+OBJECTIVES = ("ev", "roi")
+
+
+class _DeadlineReached(Exception):
+    pass
+
+
+@dataclass
+class Candidate:
+    """Contrato encontrado por el optimizador (una skin por colección usada)."""
+    stattrak: bool
+    f_norm: float
+    counts: Dict[str, int]
+    skins: Dict[str, SkinCatalogItem]
+    total_cost_cents: int
+    ev_gross_cents: float
+    ev_net_cents: float
+    score: float
+    rarity: str = ""
+
+    @property
+    def pl_expected_net_cents(self) -> float:
+        return self.ev_net_cents - self.total_cost_cents
+
+    @property
+    def roi_net(self) -> Optional[float]:
+        if self.total_cost_cents <= 0:
+            return None
+        return self.pl_expected_net_cents / self.total_cost_cents
+
+    def entries(self) -> List[ContractEntry]:
+        """Las 10 entradas del contrato (floats en f_norm dentro del rango de cada skin)."""
+        out: List[ContractEntry] = []
+        for coll, n in self.counts.items():
+            it = self.skins[coll]
+            f = it.float_min + (it.float_max - it.float_min) * self.f_norm
+            for _ in range(n):
+                out.append(
+                    ContractEntry(
+                        name=it.name,
+                        collection=coll,
+                        rarity=it.rarity,
+                        float_value=f,
+                        float_min=it.float_min,
+                        float_max=it.float_max,
+                        stattrak=self.stattrak,
+                    )
+                )
+        return out
+
+
+@dataclass
+class OptimizeResult:
+    candidates: List[Candidate]
+    complete: bool  # False si se cortó por deadline (anytime)
+    nodes: int = 0
+    regimes: int = 0
+    regimes_searched: int = 0
+    elapsed_s: float = 0.0
+
+
+class _TopK:
+    """Top-K por score, deduplicado por clave (conserva el mejor score de cada clave)."""
+
+    def __init__(self, k: int) -> None:
+        self.k = max(1, k)
+        self.items: Dict[Tuple, Tuple[float, Candidate]] = {}
+        self.threshold = -math.inf
+
+    def offer(self, key: Tuple, score: float, make: Callable[[], Candidate]) -> None:
+        if score <= self.threshold:
+            return
+        prev = self.items.get(key)
+        if prev is not None and prev[0] >= score:
+            return
+        self.items[key] = (score, make())
+        if len(self.items) > self.k:
+            worst = min(self.items, key=lambda k: self.items[k][0])
+            del self.items[worst]
+        if len(self.items) >= self.k:
+            self.threshold = min(v[0] for v in self.items.values())
+
+    def sorted(self) -> List[Candidate]:
+        return [c for _, c in sorted(self.items.values(), key=lambda v: -v[0])]
+
+
+class _Regime:
+    """Colecciones usables de un régimen y la relajación usada para podar.
+
+    Fijado el peso final W = Σ n·m, el objetivo es lineal por entrada:
+      ev:  score > T  ⇔  sa - W·(sc+T) + Σ (kA_j - W·C_j) > 0
+      roi: score > T  ⇔  sa - W·ρ·sc + Σ (kA_j - W·ρ·C_j) > 0,   ρ = T+1
+    Para las `rem` entradas que faltan, Σ v_j con Σ m_j = W - sm se acota por
+    rem · (envolvente cóncava superior de los puntos (m_j, v_j) en (W - sm)/rem),
+    que es la relajación lineal exacta de la restricción de peso.
+    """
+
+    def __init__(
+        self, cols: np.ndarray, kA: np.ndarray, C: np.ndarray, m: np.ndarray, objective: str, budget: float
+    ) -> None:
+        if objective == "roi":
+            key = kA / (m * C)
+        else:
+            key = kA / m
+        order = np.argsort(-key, kind="stable")
+        self.cols = cols[order]
+        self.kA = kA[order]
+        self.C = C[order]
+        self.m = m[order]
+        self.objective = objective
+        self.budget = budget
+        n = len(order)
+        self.suffix_min_c = np.minimum.accumulate(np.append(self.C, math.inf)[::-1])[::-1].tolist()
+        self.suffix_min_m = np.minimum.accumulate(self.m[::-1])[::-1].tolist()
+        self.suffix_max_m = np.maximum.accumulate(self.m[::-1])[::-1].tolist()
+        self.m_values = np.unique(self.m)
+        # Por sufijo i: columnas ordenadas por m (para `reduceat`), inicios de grupo y grupos presentes
+        group_of = np.searchsorted(self.m_values, self.m)
+        self._suffix_groups = []
+        for i in range(n):
+            perm = i + np.argsort(group_of[i:], kind="stable")
+            g = group_of[perm]
+            starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+            self._suffix_groups.append((perm, starts, g[starts]))
+        self.weights = np.arange(0, 10 * int(self.m.max()) + 1, dtype=np.float64)
+        self._m_float = self.m_values.astype(np.float64)
+        self._lambdas = np.array([0.0, 1.0, 4.0, 16.0, 64.0])
+        a, b = np.triu_indices(len(self.m_values), k=1)
+        self._pair_a, self._pair_b = a, b
+
+    def may_exceed(self, T: float, i: int, rem: int, sa: float, sm: int, sc: float) -> bool:
+        """False si ninguna forma de completar las `rem` entradas con colecciones >= i supera T."""
+        if self.objective == "roi":
+            rho = T + 1.0
+            if rho <= 0:
+                return True
+            x, yfac = rho * sc, rho
+        else:
+            x, yfac = sc + T, 1.0
+        w = self.weights[sm + rem * self.suffix_min_m[i] : sm + rem * self.suffix_max_m[i] + 1]
+        perm, starts, present = self._suffix_groups[i]
+        C = self.C[perm]
+        lambdas = self._lambdas if self.budget < math.inf else self._lambdas[:1]
+        # v[l, W, j] = kA_j - (W·yfac)(1+λ_l)·C_j: con el multiplicador λ_l·W·yfac del presupuesto
+        coef = (w * yfac)[None, :] * (1.0 + lambdas)[:, None]
+        v = self.kA[perm][None, None, :] - coef[:, :, None] * C[None, None, :]
+        if self.budget < math.inf:
+            # una entrada de j solo es posible si entra junto a las otras rem-1 al costo mínimo
+            v[:, :, C > self.budget - sc - (rem - 1) * self.suffix_min_c[i]] = -np.inf
+        # mejor v por valor de m (−inf si ninguna colección restante tiene ese m)
+        best = np.full(v.shape[:2] + (len(self.m_values),), -np.inf)
+        best[:, :, present] = np.maximum.reduceat(v, starts, axis=2)
+        t = ((w - sm) / rem)[None, :, None]
+        mvals = self._m_float
+        env = np.where(mvals == t, best, -np.inf).max(axis=2)
+        if len(self._pair_a):
+            ma, mb = mvals[self._pair_a], mvals[self._pair_b]
+            va, vb = best[:, :, self._pair_a], best[:, :, self._pair_b]
+            with np.errstate(invalid="ignore"):
+                interp = va + (vb - va) * ((t - ma) / (mb - ma))
+            ok = (ma <= t) & (t <= mb) & np.isfinite(va) & np.isfinite(vb)
+            env = np.maximum(env, np.where(ok, interp, -np.inf).max(axis=2))
+        slack = max(self.budget - sc, 0.0) if self.budget < math.inf else 0.0
+        g = sa - w * x + rem * env + coef * (lambdas[:, None] / (1.0 + lambdas[:, None])) * slack
+        return bool(g.min(axis=0).max() > -1e-6 * max(1.0, abs(sa)))
+
+    def scores(self, ev_net: np.ndarray, cost: np.ndarray) -> np.ndarray:
+        if self.objective == "roi":
+            return (ev_net - cost) / cost
+        return ev_net - cost
+
+    def root_bound(self, iters: int = 40) -> float:
+        """Cota superior del score de cualquier contrato del régimen (bisección sobre T)."""
+        if self.objective == "roi":
+            lo = -1.0
+            hi = float((self.kA / self.C).max() / (10.0 * self.m.min())) - 1.0
+        else:
+            lo = -10.0 * float(self.C.max()) - 1.0
+            hi = float(10.0 * (self.kA / (10.0 * self.m.min()) - self.C).max())
+        if not self.may_exceed(hi, 0, 10, 0.0, 0, 0.0):
+            return hi
+        hi_ok = hi
+        for _ in range(iters):
+            mid = (lo + hi_ok) / 2.0
+            if self.may_exceed(mid, 0, 10, 0.0, 0, 0.0):
+                lo = mid
+            else:
+                hi_ok = mid
+        return hi_ok
+
+
+class ContractOptimizer:
+    """Top-K contratos de un tier (rareza + StatTrak) por P&L neto esperado o ROI.
+
+    Args:
+        catalog: catálogo de skins.
+        rarity: rareza de las entradas.
+        price_fn: `(name, wear_name, stattrak) -> centavos | None`.
+        fees_rate: fee de venta aplicado a los outcomes.
+        max_total_cents: tope de costo total del contrato (None = sin tope).
+        objective: "ev" (EV neto − costo) o "roi" ((EV neto − costo) / costo).
+    """
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        rarity: str,
+        price_fn: PriceFn,
+        fees_rate: float = 0.02,
+        max_total_cents: Optional[int] = None,
+        objective: str = "ev",
+    ) -> None:
+        rarity = normalize_rarity(rarity)
+        if not RARITY_NEXT.get(rarity):
+            raise ValueError("No existen contratos hacia Rare/Special (cuchillos/guantes) o no hay rareza siguiente.")
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Objetivo inválido: {objective} (opciones: {', '.join(OBJECTIVES)})")
+        self.catalog = catalog
+        self.rarity = rarity
+        self.price_fn = price_fn
+        self.fees_rate = fees_rate
+        self.max_total_cents = max_total_cents
+        self.objective = objective
+
+        # Colecciones aptas: con outcomes en la rareza siguiente y entradas de rango no nulo
+        # (con rango nulo el float normalizado es 0 y no respeta f_norm_avg = u).
+        inputs: Dict[str, List[SkinCatalogItem]] = {}
+        for it in catalog.items:
+            if it.rarity == rarity and it.float_max > it.float_min and catalog.outcomes_for(it.collection, rarity):
+                inputs.setdefault(it.collection, []).append(it)
+        self.collections: List[str] = sorted(inputs)
+        self.inputs = [inputs[c] for c in self.collections]
+        self.outcomes = [catalog.outcomes_for(c, rarity) for c in self.collections]
+        self.m_c = np.array([len(o) for o in self.outcomes], dtype=np.float64)
+        self._in_items = [it for ins in self.inputs for it in ins]
+
+        points = set()
+        for items in self.inputs + self.outcomes:
+            for it in items:
+                for t in wear_thresholds(it.float_min, it.float_max):
+                    if 0.0 < t <= 1.0:
+                        points.add(t)
+        self.breakpoints = sorted(points)
+        self.regime_fnorms = regime_representatives(self.breakpoints)
+
+    # ------------------------------------------------------------------
+    # Tablas por régimen
+    # ------------------------------------------------------------------
+    def _wear_index(self, items: Sequence[SkinCatalogItem], u: np.ndarray) -> np.ndarray:
+        """(R, len(items)) índice de wear (5 = Unknown) de cada ítem para cada u."""
+        thr = np.array([wear_thresholds(it.float_min, it.float_max) for it in items], dtype=np.float64)
+        n_true = (thr[None, :, :] <= u[:, None, None]).sum(axis=2)
+        return np.where((n_true == 0) | (n_true > len(WEAR_BUCKETS)), len(WEAR_BUCKETS), n_true - 1)
+
+    def _price_matrix(self, items: Sequence[SkinCatalogItem], stattrak: bool) -> np.ndarray:
+        """(len(items), 6) precios por wear (NaN si falta; columna 5 = Unknown)."""
+        out = np.full((len(items), len(WEAR_BUCKETS) + 1), np.nan)
+        for i, it in enumerate(items):
+            for w, (wear_name, _, _) in enumerate(WEAR_BUCKETS):
+                p = self.price_fn(it.name, wear_name, stattrak)
+                if p is not None:
+                    out[i, w] = float(p)
+        return out
+
+    def _regime_tables(self, stattrak: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """A (R,K), C (R,K) y skin elegida (R,K) por régimen; NaN = colección no usable."""
+        u = np.asarray(self.regime_fnorms, dtype=np.float64)
+        R, K = len(u), len(self.collections)
+
+        out_items = [it for outs in self.outcomes for it in outs]
+        out_coll = np.repeat(np.arange(K), [len(o) for o in self.outcomes])
+        out_prices = self._price_matrix(out_items, stattrak)
+        out_w = self._wear_index(out_items, u)
+        p = out_prices[np.arange(len(out_items))[None, :], out_w]  # (R, O)
+        A = np.zeros((R, K))
+        np.add.at(A.T, out_coll, p.T)  # NaN se propaga: colección sin precio completo
+
+        in_items = self._in_items
+        in_prices = self._price_matrix(in_items, stattrak)
+        in_w = self._wear_index(in_items, u)
+        c = in_prices[np.arange(len(in_items))[None, :], in_w]  # (R, I)
+        c_masked = np.where(np.isnan(c), np.inf, c)
+        C = np.full((R, K), np.inf)
+        pick = np.zeros((R, K), dtype=np.intp)
+        starts = np.concatenate([[0], np.cumsum([len(i) for i in self.inputs])])
+        for k in range(K):
+            block = c_masked[:, starts[k] : starts[k + 1]]
+            j = block.argmin(axis=1)
+            pick[:, k] = starts[k] + j
+            C[:, k] = block[np.arange(R), j]
+        C[np.isinf(C)] = np.nan
+        return A, C, pick
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+    def _score(self, ev_net: float, cost: float) -> float:
+        if self.objective == "roi":
+            return (ev_net - cost) / cost if cost > 0 else -math.inf
+        return ev_net - cost
+
+    def _offer(
+        self,
+        top: _TopK,
+        stattrak: bool,
+        r: int,
+        used: List[Tuple[int, int]],
+        pick: np.ndarray,
+        sa: float,
+        sm: int,
+        sc: float,
+        score: float,
+    ) -> None:
+        """Ofrece al top-K el contrato `used` = [(colección, cantidad)] del régimen r."""
+        keep = 1.0 - self.fees_rate
+        key = (stattrak, tuple(sorted((self.collections[k], c, int(pick[r, k])) for k, c in used)))
+
+        def make() -> Candidate:
+            return Candidate(
+                stattrak=stattrak,
+                f_norm=self.regime_fnorms[r],
+                counts={self.collections[k]: c for k, c in used},
+                skins={self.collections[k]: self._in_items[int(pick[r, k])] for k, _ in used},
+                total_cost_cents=int(round(sc)),
+                ev_gross_cents=sa / sm / keep if keep else 0.0,
+                ev_net_cents=sa / sm,
+                score=score,
+                rarity=self.rarity,
+            )
+
+        top.offer(key, score, make)
+
+    def _seed(
+        self, top: _TopK, stattrak: bool, regimes: Dict[int, "_Regime"], pick: np.ndarray, budget: float
+    ) -> None:
+        """Incumbentes iniciales: los mejores contratos de una sola colección (10× la entrada
+        más barata) entre todos los regímenes. Suben el umbral de poda desde el arranque y
+        garantizan una respuesta razonable en modo anytime."""
+        pool: List[Tuple[float, int, int]] = []
+        for r, reg in regimes.items():
+            cost = 10.0 * reg.C
+            scores = np.where(cost <= budget, reg.scores(reg.kA / reg.m, cost), -np.inf)
+            for j in np.argsort(-scores)[: top.k].tolist():
+                if scores[j] > -np.inf:
+                    pool.append((float(scores[j]), r, j))
+        pool.sort(reverse=True)
+        for score, r, j in pool:
+            if score <= top.threshold:
+                break
+            reg = regimes[r]
+            self._offer(top, stattrak, r, [(int(reg.cols[j]), 10)], pick, 10.0 * reg.kA[j], 10 * int(reg.m[j]), 10.0 * reg.C[j], score)
+
+    def optimize(
+        self,
+        stattrak: bool = False,
+        top_k: int = 10,
+        deadline_s: Optional[float] = None,
+        top: Optional[_TopK] = None,
+    ) -> OptimizeResult:
+        """Busca los `top_k` mejores contratos.
+
+        Con `deadline_s` (modo anytime) corta al vencer el plazo —una vez que hay al menos
+        un candidato— y devuelve lo mejor encontrado hasta ese momento (`complete=False`).
+        """
+        t0 = time.perf_counter()
+        stop_at = t0 + deadline_s if deadline_s is not None else None
+        top = top or _TopK(top_k)
+        keep = 1.0 - self.fees_rate
+        budget = float(self.max_total_cents) if self.max_total_cents is not None else math.inf
+
+        A, C, pick = self._regime_tables(stattrak)
+        R = A.shape[0]
+
+        # Cota por régimen para ordenar (mejores incumbentes primero) y descartar
+        regimes: Dict[int, _Regime] = {}
+        order: List[Tuple[float, int]] = []
+        for r in range(R):
+            ok = np.flatnonzero(~np.isnan(A[r]) & ~np.isnan(C[r]))
+            if len(ok):
+                # una colección entra si al menos una entrada suya cabe con las otras 9 al mínimo
+                ok = ok[C[r, ok] + 9 * C[r, ok].min() <= budget]
+            if not len(ok):
+                continue
+            reg = _Regime(ok, keep * A[r, ok], C[r, ok], self.m_c[ok].astype(np.int64), self.objective, budget)
+            regimes[r] = reg
+            order.append((reg.root_bound(), r))
+        order.sort(reverse=True)
+        self._seed(top, stattrak, regimes, pick, budget)
+
+        nodes = 0
+        searched = 0
+        complete = True
+        try:
+            for ub, r in order:
+                if ub <= top.threshold:
+                    break
+                searched += 1
+                reg = regimes[r]
+                ks = reg.cols.tolist()
+                Ak = reg.kA.tolist()
+                Ck = reg.C.tolist()
+                mk = reg.m.tolist()
+                suffix_min_c = reg.suffix_min_c
+                n = len(ks)
+                counts = [0] * n
+
+                def leaf(sa: float, sm: int, sc: float) -> None:
+                    score = self._score(sa / sm, sc)
+                    if score > top.threshold:
+                        used = [(ks[i], counts[i]) for i in range(n) if counts[i]]
+                        self._offer(top, stattrak, r, used, pick, sa, sm, sc, score)
+
+                def dfs(i: int, rem: int, sa: float, sm: int, sc: float) -> None:
+                    nonlocal nodes
+                    nodes += 1
+                    if stop_at is not None and (nodes & 0xFF) == 0 and top.items and time.perf_counter() > stop_at:
+                        raise _DeadlineReached()
+                    if rem == 0:
+                        leaf(sa, sm, sc)
+                        return
+                    if i == n or sc + rem * suffix_min_c[i] > budget:
+                        return
+                    if rem == 1:
+                        # Última entrada: se puntúan todas las colecciones restantes de una vez
+                        ev_net = (sa + reg.kA[i:]) / (sm + reg.m[i:])
+                        cost = sc + reg.C[i:]
+                        scores = reg.scores(ev_net, cost)
+                        for j in np.flatnonzero((scores > top.threshold) & (cost <= budget)).tolist():
+                            counts[i + j] = 1
+                            leaf(sa + Ak[i + j], sm + mk[i + j], sc + Ck[i + j])
+                            counts[i + j] = 0
+                        return
+                    if top.threshold > -math.inf and not reg.may_exceed(top.threshold, i, rem, sa, sm, sc):
+                        return
+                    for c in range(rem, -1, -1):
+                        add_cost = sc + c * Ck[i]
+                        if add_cost + (rem - c) * suffix_min_c[i + 1] > budget:
+                            continue
+                        counts[i] = c
+                        dfs(i + 1, rem - c, sa + c * Ak[i], sm + c * mk[i], add_cost)
+                    counts[i] = 0
+
+                dfs(0, 10, 0.0, 0, 0.0)
+        except _DeadlineReached:
+            complete = False
+
+        return OptimizeResult(
+            candidates=top.sorted(),
+            complete=complete,
+            nodes=nodes,
+            regimes=R,
+            regimes_searched=searched,
+            elapsed_s=time.perf_counter() - t0,
+        )
+
+    def optimize_modes(
+        self,
+        stattrak_modes: Sequence[bool],
+        top_k: int = 10,
+        deadline_s: Optional[float] = None,
+    ) -> OptimizeResult:
+        """`optimize` sobre varios modos StatTrak compartiendo el top-K y el plazo."""
+        t0 = time.perf_counter()
+        top = _TopK(top_k)
+        total = OptimizeResult(candidates=[], complete=True)
+        for st in stattrak_modes:
+            remaining = None
+            if deadline_s is not None:
+                remaining = max(0.0, deadline_s - (time.perf_counter() - t0))
+            res = self.optimize(st, top_k=top_k, deadline_s=remaining, top=top)
+            total.complete = total.complete and res.complete
+            total.nodes += res.nodes
+            total.regimes += res.regimes
+            total.regimes_searched += res.regimes_searched
+            if not res.complete:
+                break
+        total.candidates = top.sorted()
+        total.elapsed_s = time.perf_counter() - t0
+        return total
+
+
+__all__ = [
+    "Candidate",
+    "ContractOptimizer",
+    "OBJECTIVES",
+    "OptimizeResult",
+]
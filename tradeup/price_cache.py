@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+
+# Caché persistente de precios de CSFloat (SQLite en modo WAL)
+#
+# Pensada para compartirse entre procesos (p. ej. un `tradeup.cli` por contrato en
+# evaluate_all_contracts): cada entrada guarda su vencimiento, los "sin listados" (None)
+# vencen antes que los precios y el tamaño se acota desalojando lo menos usado (LRU).
+
+# Variables de entorno con las que `CsfloatClient` la activa sin cambios en los callers
+ENV_PATH = "CSFLOAT_PRICE_CACHE"
+ENV_TTL = "CSFLOAT_PRICE_CACHE_TTL"
+ENV_MISS_TTL = "CSFLOAT_PRICE_CACHE_MISS_TTL"
+ENV_MAX_ENTRIES = "CSFLOAT_PRICE_CACHE_MAX"
+
+
+class PriceCache:
+    """Caché (market_hash_name, categoría) → precio en centavos o None, con TTL por entrada.
+
+    Args:
+        path: archivo SQLite (se crea si no existe).
+        ttl_seconds: vigencia de un precio encontrado (0/None = no vence).
+        miss_ttl_seconds: vigencia de un "sin listados" (0/None = no vence).
+        max_entries: tope de entradas; al superarlo se borran las de uso más antiguo.
+
+    Es thread-safe y varios procesos pueden usar el mismo archivo: WAL permite leer
+    mientras otro escribe y `busy_timeout` espera los locks de escritura. Si la base
+    sigue bloqueada, la consulta se trata como fallo y la escritura se descarta (la
+    caché nunca hace fallar una consulta de precio).
+    """
+
+    _EVICT_EVERY = 256  # escrituras entre chequeos del tope de tamaño
+    _TOUCH_EVERY_S = 60.0  # el uso (LRU) se actualiza a lo sumo una vez por minuto por entrada
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        ttl_seconds: Optional[float] = 3600.0,
+        miss_ttl_seconds: Optional[float] = 300.0,
+        max_entries: int = 200_000,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(str(self.path), timeout=busy_timeout_ms / 1000.0, check_same_thread=False)
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prices ("
+            "mhn TEXT NOT NULL, category INTEGER NOT NULL, price INTEGER, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (mhn, category)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS prices_last_used ON prices(last_used)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["PriceCache"]:
+        """Caché configurada por entorno (`CSFLOAT_PRICE_CACHE` = ruta), o None si no está activada."""
+        path = os.getenv(ENV_PATH)
+        if not path:
+            return None
+        kwargs: Dict[str, float] = {}
+        for env, name in ((ENV_TTL, "ttl_seconds"), (ENV_MISS_TTL, "miss_ttl_seconds"), (ENV_MAX_ENTRIES, "max_entries")):
+            raw = os.getenv(env)
+            if raw:
+                kwargs[name] = int(raw) if name == "max_entries" else float(raw)
+        return cls(path, **kwargs)  # type: ignore[arg-type]
+
+    def _expires_at(self, price: Optional[int], now: float) -> float:
+        ttl = self.ttl_seconds if price is not None else self.miss_ttl_seconds
+        return 0.0 if ttl in (None, 0) else now + float(ttl)
+
+    def lookup(self, mhn: str, category: int) -> Tuple[bool, Optional[int], float]:
+        """(encontrada y vigente, precio, vencimiento epoch o 0 = no vence)."""
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT price, expires_at, last_used FROM prices WHERE mhn = ? AND category = ?", (mhn, category)
+                ).fetchone()
+                if row is None or (row[1] != 0 and row[1] <= now):
+                    self.misses += 1
+                    return False, None, 0.0
+                if now - row[2] >= self._TOUCH_EVERY_S:
+                    self._conn.execute(
+                        "UPDATE prices SET last_used = ? WHERE mhn = ? AND category = ?", (now, mhn, category)
+                    )
+                    self._conn.commit()
+            except sqlite3.OperationalError:
+                self.misses += 1
+                return False, None, 0.0
+            self.hits += 1
+            return True, row[0], row[1]
+
+    def put(self, mhn: str, category: int, price: Optional[int]) -> float:
+        """Guarda un resultado y devuelve su vencimiento (epoch, 0 = no vence)."""
+        now = time.time()
+        expires_at = self._expires_at(price, now)
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO prices(mhn, category, price, expires_at, last_used) VALUES(?, ?, ?, ?, ?)",
+                    (mhn, category, price, expires_at, now),
+                )
+                self._writes += 1
+                if self._writes % self._EVICT_EVERY == 0:
+                    self._evict(now)
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                self._conn.rollback()
+        return expires_at
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM prices WHERE expires_at != 0 AND expires_at <= ?", (now,))
+        (n,) = self._conn.execute("SELECT COUNT(*) FROM prices").fetchone()
+        if n > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM prices WHERE (mhn, category) IN (SELECT mhn, category FROM prices ORDER BY last_used LIMIT ?)",
+                (n - self.max_entries,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._evict(time.time())
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                pass
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+
+__all__ = [
+    "ENV_MAX_ENTRIES",
+    "ENV_MISS_TTL",
+    "ENV_PATH",
+    "ENV_TTL",
+    "PriceCache",
+]
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import csv
+import json
+import math
+import os
+import re
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from .registry import ItemRegistry, PriceTable
+
+
+# Historial de precios por snapshots (append-only, columnar y comprimido)
+#
+# Layout de la carpeta:
+#   names.txt       : diccionario de market_hash_name, una por línea (id = número de línea, solo se agrega)
+#   manifest.jsonl  : una línea por snapshot (ts, fuente, archivo, tipo, conteos); es el punto de commit
+#   parts/*.npz     : una partición por snapshot (np.savez_compressed)
+#       ids     : u32 ids ordenados, codificados como diferencias (el primero absoluto)
+#       values  : i64 precio nuevo − precio del snapshot anterior de la misma fuente (0 si no existía)
+#       removed : u32 ids que dejaron de tener precio, también como diferencias
+#
+# Cada fuente es una cadena independiente: un keyframe (todos los precios, delta contra
+# vacío) cada `keyframe_every` snapshots y en el medio solo los precios que cambiaron.
+# Reconstruir un snapshot cuesta a lo sumo `keyframe_every` particiones chicas.
+#
+# Un solo proceso debería agregar snapshots a la vez (las lecturas concurrentes son seguras:
+# la partición se escribe antes que su línea del manifest).
+
+DEFAULT_KEYFRAME_EVERY = 32
+
+# CSV de build_prices_by_wear.py: precios en moneda (float) con timestamp por fila
+BY_WEAR_COLUMNS = ("listing_min", "listing_median", "sales_median_24h", "sales_median_7d", "sales_median_30d", "sales_median_90d")
+
+
+@dataclass
+class SnapshotInfo:
+    ts: float
+    source: str
+    file: str
+    keyframe: bool
+    n_prices: int
+    n_changed: int
+    n_removed: int
+
+
+def parse_ts(value: Union[str, float, int]) -> float:
+    """Epoch en segundos desde un número o una fecha ISO ("2025-01-31", "2025-01-31T18:00")."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    s = value.strip()
+    try:
+        return float(s)
+    except ValueError:
+        return datetime.fromisoformat(s).timestamp()
+
+
+def _encode_ids(ids: np.ndarray) -> np.ndarray:
+    return np.diff(ids.astype(np.int64), prepend=0).astype("<u4")
+
+
+def _decode_ids(encoded: np.ndarray) -> np.ndarray:
+    return np.cumsum(encoded, dtype=np.int64)
+
+
+def _diff(
+    prev_ids: np.ndarray, prev_prices: np.ndarray, ids: np.ndarray, prices: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ids cambiados o nuevos, deltas de precio, ids eliminados) entre dos estados ordenados."""
+    _, ia, ib = np.intersect1d(prev_ids, ids, assume_unique=True, return_indices=True)
+    delta = prices[ib] - prev_prices[ia]
+    moved = delta != 0
+    new_mask = np.ones(len(ids), dtype=bool)
+    new_mask[ib] = False
+    gone_mask = np.ones(len(prev_ids), dtype=bool)
+    gone_mask[ia] = False
+    changed = np.concatenate([ids[ib[moved]], ids[new_mask]])
+    values = np.concatenate([delta[moved], prices[new_mask]])
+    order = np.argsort(changed, kind="stable")
+    return changed[order], values[order], prev_ids[gone_mask]
+
+
+def _apply(
+    ids: np.ndarray, prices: np.ndarray, changed: np.ndarray, values: np.ndarray, removed: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Aplica un delta a un estado ordenado (ids, precios) y devuelve el estado nuevo."""
+    prices = prices.copy()
+    pos = np.searchsorted(ids, changed)
+    hit = pos < len(ids)
+    hit[hit] = ids[pos[hit]] == changed[hit]
+    prices[pos[hit]] += values[hit]
+    ids = np.concatenate([ids, changed[~hit]])
+    prices = np.concatenate([prices, values[~hit]])
+    if len(removed):
+        keep = ~np.isin(ids, removed, assume_unique=True)
+        ids, prices = ids[keep], prices[keep]
+    order = np.argsort(ids, kind="stable")
+    return ids[order], prices[order]
+
+
+def _complete_lines(path: Path) -> List[str]:
+    """Líneas terminadas en `\\n` de un archivo append-only.
+
+    Un resto sin `\\n` al final es una escritura cortada (el snapshot no se commiteó): se trunca
+    para que el próximo append no quede pegado a él y cambie el significado de las líneas siguientes.
+    """
+    if not path.exists():
+        return []
+    data = path.read_bytes()
+    end = data.rfind(b"\n") + 1
+    if end < len(data):
+        with path.open("r+b") as f:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+    return data[:end].decode("utf-8").splitlines()
+
+
+class PriceHistory:
+    """Historial append-only de snapshots de precios (market_hash_name -> centavos) por fuente.
+
+    - `append` guarda un snapshot (keyframe o delta contra el anterior de la misma fuente).
+    - `as_of(ts)` reconstruye los precios vigentes en `ts` como `PriceTable`, lista para
+      el Evaluator y `fill_*_prices_local`.
+    - `series(mhn)` devuelve los puntos en que cambió el precio de un ítem.
+    """
+
+    def __init__(self, root: Union[str, Path], keyframe_every: int = DEFAULT_KEYFRAME_EVERY) -> None:
+        self.root = Path(root)
+        self.keyframe_every = max(1, keyframe_every)
+        self._names_path = self.root / "names.txt"
+        self._manifest_path = self.root / "manifest.jsonl"
+        self.names: List[str] = []
+        self.name_index: Dict[str, int] = {}
+        self.snapshots: List[SnapshotInfo] = []
+        # Último estado reconstruido por fuente: (índice en snapshots, ids, precios)
+        self._states: Dict[str, Tuple[int, np.ndarray, np.ndarray]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        for name in _complete_lines(self._names_path):
+            self._intern_loaded(name)
+        for line in _complete_lines(self._manifest_path):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self.snapshots.append(SnapshotInfo(**json.loads(line)))
+            except (ValueError, TypeError):
+                continue
+
+    def _intern_loaded(self, name: str) -> None:
+        self.name_index[name] = len(self.names)
+        self.names.append(name)
+
+    # -- consultas de metadatos ------------------------------------------------
+    def sources(self) -> List[str]:
+        return sorted({s.source for s in self.snapshots})
+
+    def _chain(self, source: str) -> List[int]:
+        return [i for i, s in enumerate(self.snapshots) if s.source == source]
+
+    def _pick(self, ts: float, source: Optional[str]) -> Optional[int]:
+        """Índice del último snapshot con ts <= `ts` (de `source`, o de cualquier fuente si es None)."""
+        best = None
+        for i, s in enumerate(self.snapshots):
+            if s.ts <= ts and (source is None or s.source == source):
+                if best is None or s.ts >= self.snapshots[best].ts:
+                    best = i
+        return best
+
+    # -- particiones -------------------------------------------------------------
+    def _read(self, i: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with np.load(self.root / "parts" / self.snapshots[i].file) as part:
+            return _decode_ids(part["ids"]), part["values"].astype(np.int64), _decode_ids(part["removed"])
+
+    def _state_at(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, precios) ordenados del snapshot i, desde su keyframe o desde el último estado cacheado."""
+        source = self.snapshots[i].source
+        chain = [j for j in self._chain(source) if j <= i]
+        start = max(k for k, j in enumerate(chain) if self.snapshots[j].keyframe)
+        ids = np.zeros(0, dtype=np.int64)
+        prices = np.zeros(0, dtype=np.int64)
+        cached = self._states.get(source)
+        if cached is not None and cached[0] in chain and chain.index(cached[0]) >= start:
+            start = chain.index(cached[0]) + 1
+            ids, prices = cached[1], cached[2]
+        for j in chain[start:]:
+            changed, values, removed = self._read(j)
+            if self.snapshots[j].keyframe:
+                ids, prices = changed, values
+            else:
+                ids, prices = _apply(ids, prices, changed, values, removed)
+        self._states[source] = (i, ids, prices)
+        return ids, prices
+
+    # -- escritura ---------------------------------------------------------------
+    def append(self, prices: Mapping[str, int], source: str = "local", ts: Optional[float] = None) -> SnapshotInfo:
+        """Agrega un snapshot de precios y devuelve su entrada del manifest.
+
+        `ts` no puede ser anterior al último snapshot de la misma fuente (los deltas se
+        encadenan en orden de llegada).
+        """
+        ts = time.time() if ts is None else float(ts)
+        source = re.sub(r"[^A-Za-z0-9_.-]+", "_", source) or "local"
+        chain = self._chain(source)
+        if chain and ts < self.snapshots[chain[-1]].ts:
+            raise ValueError(
+                f"Snapshot de '{source}' con ts {ts:.0f} anterior al último ({self.snapshots[chain[-1]].ts:.0f})"
+            )
+
+        new_names = [m for m in prices if m not in self.name_index]
+        if new_names:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with self._names_path.open("a", encoding="utf-8") as f:
+                f.write("".join(f"{m}\n" for m in new_names))
+                f.flush()
+                os.fsync(f.fileno())
+            for m in new_names:
+                self._intern_loaded(m)
+
+        ids = np.fromiter((self.name_index[m] for m in prices), dtype=np.int64, count=len(prices))
+        vals = np.fromiter((int(prices[m]) for m in prices), dtype=np.int64, count=len(prices))
+        order = np.argsort(ids, kind="stable")
+        ids, vals = ids[order], vals[order]
+
+        since_keyframe = 0
+        for j in reversed(chain):
+            if self.snapshots[j].keyframe:
+                break
+            since_keyframe += 1
+        keyframe = not chain or since_keyframe + 1 >= self.keyframe_every
+        if keyframe:
+            changed, values, removed = ids, vals, ids[:0]
+        else:
+            prev_ids, prev_prices = self._state_at(chain[-1])
+            changed, values, removed = _diff(prev_ids, prev_prices, ids, vals)
+
+        parts = self.root / "parts"
+        parts.mkdir(parents=True, exist_ok=True)
+        name = f"{int(ts)}_{source}_{len(self.snapshots):06d}.npz"
+        tmp = parts / f".{name}.tmp{os.getpid()}.npz"
+        np.savez_compressed(tmp, ids=_encode_ids(changed), values=values.astype("<i8"), removed=_encode_ids(removed))
+        os.replace(tmp, parts / name)
+
+        info = SnapshotInfo(
+            ts=ts,
+            source=source,
+            file=name,
+            keyframe=keyframe,
+            n_prices=len(ids),
+            n_changed=len(changed),
+            n_removed=len(removed),
+        )
+        with self._manifest_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(info), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.snapshots.append(info)
+        self._states[source] = (len(self.snapshots) - 1, ids, vals)
+        return info
+
+    # -- consultas -----------------------------------------------------------------
+    def as_of_ids(self, ts: float, source: Optional[str] = None) -> Tuple[SnapshotInfo, np.ndarray, np.ndarray]:
+        """(snapshot usado, ids de nombre, precios) vigentes en `ts`."""
+        i = self._pick(ts, source)
+        if i is None:
+            where = f" de '{source}'" if source else ""
+            # Sin --as-of se consulta con ts=inf ("el último"): no hay fecha que mostrar
+            when = f" anteriores a {datetime.fromtimestamp(ts).isoformat()}" if math.isfinite(ts) else ""
+            raise KeyError(f"No hay snapshots{where}{when}")
+        ids, prices = self._state_at(i)
+        return self.snapshots[i], ids, prices
+
+    def as_of(self, ts: float, source: Optional[str] = None, registry: Optional[ItemRegistry] = None) -> PriceTable:
+        """Precios vigentes en `ts` como PriceTable (con `source=None`, la fuente del último snapshot <= ts)."""
+        _, ids, prices = self.as_of_ids(ts, source)
+        table = PriceTable(registry or ItemRegistry())
+        names = self.names
+        for name_id, cents in zip(ids.tolist(), prices.tolist()):
+            table.set_mhn(names[name_id], cents)
+        return table
+
+    def series(self, mhn: str, source: Optional[str] = None) -> List[Tuple[float, Optional[int]]]:
+        """Puntos (ts, centavos o None = sin precio) en que cambió el precio de `mhn`.
+
+        Con `source=None` se usa la fuente del snapshot más reciente.
+        """
+        if source is None:
+            if not self.snapshots:
+                return []
+            source = max(self.snapshots, key=lambda s: s.ts).source
+        name_id = self.name_index.get(mhn)
+        if name_id is None:
+            return []
+        out: List[Tuple[float, Optional[int]]] = []
+        value: Optional[int] = None
+        for j in self._chain(source):
+            changed, values, removed = self._read(j)
+            pos = int(np.searchsorted(changed, name_id))
+            hit = pos < len(changed) and int(changed[pos]) == name_id
+            if self.snapshots[j].keyframe:
+                new = int(values[pos]) if hit else None
+            elif hit:
+                new = (value or 0) + int(values[pos])
+            elif len(removed) and name_id in removed:
+                new = None
+            else:
+                new = value
+            if new != value:
+                out.append((self.snapshots[j].ts, new))
+            value = new
+        return out
+
+
+def read_prices_by_wear_csv(path: Union[str, Path], column: str = "sales_median_7d") -> Tuple[Dict[str, int], Optional[float], Optional[str]]:
+    """Precios en centavos de un CSV de build_prices_by_wear.py: (precios, ts, fuente).
+
+    `ts` es el mayor `last_updated_unix` y `fuente` la columna `source` (en minúsculas).
+    """
+    if column not in BY_WEAR_COLUMNS:
+        raise ValueError(f"Columna de precio inválida: {column} (opciones: {', '.join(BY_WEAR_COLUMNS)})")
+    prices: Dict[str, int] = {}
+    ts: Optional[float] = None
+    source: Optional[str] = None
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            mhn = (row.get("market_hash_name") or "").strip()
+            raw = (row.get(column) or "").strip()
+            if not mhn or not raw:
+                continue
+            try:
+                prices[mhn] = int(round(float(raw) * 100))
+            except ValueError:
+                continue
+            updated = (row.get("last_updated_unix") or "").strip()
+            if updated:
+                ts = max(ts or 0.0, float(updated))
+            source = source or (row.get("source") or "").strip().lower() or None
+    return prices, ts, source
+
+
+def is_prices_by_wear_csv(path: Union[str, Path]) -> bool:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f), [])
+    return "market_hash_name" in header and "last_updated_unix" in header
+
+
+__all__ = [
+    "BY_WEAR_COLUMNS",
+    "DEFAULT_KEYFRAME_EVERY",
+    "PriceHistory",
+    "SnapshotInfo",
+    "is_prices_by_wear_csv",
+    "parse_ts",
+    "read_prices_by_wear_csv",
+]
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from .catalog_snapshot import SnapshotError, _align, _file_sha256
+from .registry import MISSING_PRICE, N_WEARS, WEAR_INDEX, ItemRegistry, PriceTable, read_price_table_csv
+
+
+# Índice binario de precios locales (compilado desde un CSV de --local-prices)
+#
+# Layout (little-endian, secciones alineadas a 8 bytes):
+#   header       : magic, versión, tamaño/mtime/sha256 del CSV de origen, conteos y offsets
+#   mhn_offsets  : u32[n+1] offsets + blob UTF-8 de market_hash_name (ordenados por bytes, únicos)
+#   prices       : i64[n] centavos (mismo orden que los MHN)
+#   entry_name   : u32[n] id del nombre de skin de cada entrada
+#   entry_code   : u8[n] wear_id*2 + stattrak, o `EXTRA_CODE` si el MHN no tiene formato "Name (Wear)"
+#   name_offsets : u32[n_names+1] offsets + blob UTF-8 de nombres de skin (ordenados por bytes, únicos)
+#
+# Se compila solo la primera vez que se carga un CSV (o cuando cambia): las corridas
+# siguientes y cada proceso worker abren el índice vía mmap sin parsear el CSV.
+
+INDEX_MAGIC = b"TUPRICE\x00"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".tuprice"
+EXTRA_CODE = 255
+
+_HEADER = struct.Struct("<8sIIQQ32sII" + "Q" * 7)
+_SECTIONS = (
+    "mhn_offsets",
+    "mhn_blob",
+    "prices",
+    "entry_name",
+    "entry_code",
+    "name_offsets",
+    "name_blob",
+)
+
+
+def default_index_path(csv_path: Union[str, Path]) -> Path:
+    return Path(csv_path).with_suffix(INDEX_SUFFIX)
+
+
+def _string_table(strings: List[bytes]) -> Tuple[np.ndarray, bytes]:
+    offsets = np.zeros(len(strings) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in strings], out=offsets[1:])
+    return offsets, b"".join(strings)
+
+
+def compile_price_index(csv_path: Union[str, Path], out_path: Optional[Union[str, Path]] = None) -> Path:
+    """Compila un CSV de precios (cualquier formato de `read_price_table_csv`) a un índice binario.
+
+    La escritura es atómica (archivo temporal + `os.replace`): varios procesos pueden
+    compilar a la vez el mismo CSV y los lectores nunca ven un índice a medio escribir.
+    """
+    csv_path = Path(csv_path)
+    out = Path(out_path) if out_path else default_index_path(csv_path)
+    st = csv_path.stat()
+    digest = _file_sha256(csv_path)
+    table = read_price_table_csv(str(csv_path))
+    registry = table.registry
+
+    # (mhn, centavos, nombre, código) por entrada; los MHN sin formato canónico quedan sin nombre
+    rows: List[Tuple[bytes, int, str, int]] = []
+    for item_id in np.flatnonzero(table.prices != MISSING_PRICE).tolist():
+        name, wear_name, stattrak = registry.decode(item_id)
+        code = WEAR_INDEX[wear_name] * 2 + (1 if stattrak else 0)
+        rows.append((registry.mhn(item_id).encode("utf-8"), int(table.prices[item_id]), name, code))
+    for mhn, cents in table.extra.items():
+        rows.append((mhn.encode("utf-8"), int(cents), "", EXTRA_CODE))
+    rows.sort(key=lambda r: r[0])
+
+    names = sorted({r[2] for r in rows if r[3] != EXTRA_CODE}, key=lambda s: s.encode("utf-8"))
+    nid = {s: i for i, s in enumerate(names)}
+    mhn_offsets, mhn_blob = _string_table([r[0] for r in rows])
+    name_offsets, name_blob = _string_table([s.encode("utf-8") for s in names])
+
+    body = bytearray()
+    offsets: List[int] = []
+    base = _HEADER.size + (-_HEADER.size % 8)
+    parts = [
+        mhn_offsets.tobytes(),
+        mhn_blob,
+        np.array([r[1] for r in rows], dtype="<i8").tobytes(),
+        np.array([nid.get(r[2], 0) for r in rows], dtype="<u4").tobytes(),
+        np.array([r[3] for r in rows], dtype="u1").tobytes(),
+        name_offsets.tobytes(),
+        name_blob,
+    ]
+    for part in parts:
+        offsets.append(base + _align(body))
+        body.extend(part)
+
+    header = _HEADER.pack(
+        INDEX_MAGIC,
+        INDEX_VERSION,
+        0,
+        st.st_size,
+        st.st_mtime_ns,
+        digest,
+        len(rows),
+        len(names),
+        *offsets,
+    )
+    fd, tmp = tempfile.mkstemp(prefix="price_index_", suffix=".tuprice", dir=str(out.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(b"\x00" * (base - len(header)))
+            f.write(body)
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+
+class PriceIndex(Mapping[str, int]):
+    """Vista de solo lectura (mmap) de un índice de precios: market_hash_name -> centavos.
+
+    `__getitem__` es una búsqueda binaria sobre los MHN ordenados; `to_table` arma la
+    `PriceTable` densa que usan los caminos calientes sin volver a parsear strings.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # archivo vacío
+                raise SnapshotError(f"Índice de precios vacío: {self.path}") from e
+        if len(self._mm) < _HEADER.size:
+            raise SnapshotError(f"Índice de precios truncado: {self.path}")
+        fields = _HEADER.unpack_from(self._mm, 0)
+        magic, version = fields[0], fields[1]
+        if magic != INDEX_MAGIC:
+            raise SnapshotError(f"No es un índice de precios: {self.path}")
+        if version != INDEX_VERSION:
+            raise SnapshotError(f"Versión de índice {version} no soportada (esperada {INDEX_VERSION})")
+        (
+            self.source_size,
+            self.source_mtime_ns,
+            self.source_sha256,
+            self.n_entries,
+            self.n_names,
+        ) = fields[3:8]
+        off = dict(zip(_SECTIONS, fields[8:]))
+        n = self.n_entries
+        self._mhn_offsets = np.frombuffer(self._mm, dtype="<u4", count=n + 1, offset=off["mhn_offsets"])
+        self._mhn_base = off["mhn_blob"]
+        self.prices = np.frombuffer(self._mm, dtype="<i8", count=n, offset=off["prices"])
+        self.entry_name = np.frombuffer(self._mm, dtype="<u4", count=n, offset=off["entry_name"])
+        self.entry_code = np.frombuffer(self._mm, dtype="u1", count=n, offset=off["entry_code"])
+        self._name_offsets = np.frombuffer(self._mm, dtype="<u4", count=self.n_names + 1, offset=off["name_offsets"])
+        self._name_base = off["name_blob"]
+
+    # -- strings -------------------------------------------------------------
+    def _mhn_bytes(self, i: int) -> bytes:
+        return self._mm[self._mhn_base + int(self._mhn_offsets[i]) : self._mhn_base + int(self._mhn_offsets[i + 1])]
+
+    def mhn(self, i: int) -> str:
+        return self._mhn_bytes(i).decode("utf-8")
+
+    def name(self, i: int) -> str:
+        a = self._name_base + int(self._name_offsets[i])
+        b = self._name_base + int(self._name_offsets[i + 1])
+        return self._mm[a:b].decode("utf-8")
+
+    def position(self, mhn: str) -> Optional[int]:
+        """Posición de un market_hash_name en el índice (búsqueda binaria), o None."""
+        key = mhn.encode("utf-8")
+        lo, hi = 0, self.n_entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._mhn_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_entries and self._mhn_bytes(lo) == key:
+            return lo
+        return None
+
+    # -- Mapping[str, int] -----------------------------------------------------
+    def __getitem__(self, mhn: str) -> int:
+        i = self.position(mhn)
+        if i is None:
+            raise KeyError(mhn)
+        return int(self.prices[i])
+
+    def __contains__(self, mhn: object) -> bool:
+        return isinstance(mhn, str) and self.position(mhn) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self.n_entries):
+            yield self.mhn(i)
+
+    def __len__(self) -> int:
+        return self.n_entries
+
+    # -- PriceTable --------------------------------------------------------------
+    def to_table(self, registry: Optional[ItemRegistry] = None) -> PriceTable:
+        """PriceTable con todos los precios del índice (ids según `registry`, que se extiende si hace falta)."""
+        table = PriceTable(registry or ItemRegistry())
+        name_ids = np.array([table.registry.intern(self.name(i)) for i in range(self.n_names)], dtype=np.int64)
+        codes = self.entry_code.astype(np.int64)
+        canonical = codes != EXTRA_CODE
+        code = codes[canonical]
+        item_ids = (name_ids[self.entry_name[canonical]] * N_WEARS + code // 2) * 2 + code % 2
+        table.set_ids(item_ids, self.prices[canonical])
+        for i in np.flatnonzero(~canonical).tolist():
+            table.extra[self.mhn(i)] = int(self.prices[i])
+        return table
+
+    # -- frescura ----------------------------------------------------------------
+    def is_fresh(self, csv_path: Union[str, Path]) -> bool:
+        """True si el índice corresponde al contenido actual del CSV (tamaño+mtime, o sha256)."""
+        try:
+            st = os.stat(csv_path)
+        except OSError:
+            return False
+        if st.st_size != self.source_size:
+            return False
+        if st.st_mtime_ns == self.source_mtime_ns:
+            return True
+        return _file_sha256(csv_path) == self.source_sha256
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"PriceIndex(path={str(self.path)!r}, entries={self.n_entries})"
+
+
+def _open_fresh(path: Path, csv_path: Union[str, Path]) -> Optional[PriceIndex]:
+    if not path.exists():
+        return None
+    try:
+        index = PriceIndex(path)
+    except (OSError, SnapshotError, struct.error, ValueError):
+        return None
+    return index if index.is_fresh(csv_path) else None
+
+
+def open_price_index(
+    csv_path: Union[str, Path], index_path: Optional[Union[str, Path]] = None, compile_missing: bool = True
+) -> Optional[PriceIndex]:
+    """Índice al día del CSV de precios; si falta o quedó viejo lo (re)compila.
+
+    Devuelve None si no se puede escribir el índice (p. ej. directorio de solo lectura)
+    o con `TRADEUP_NO_SNAPSHOT=1`; en ese caso el caller lee el CSV. Un CSV ausente o
+    con encabezados inválidos propaga el mismo error que la lectura directa.
+    """
+    if os.environ.get("TRADEUP_NO_SNAPSHOT", "").strip() not in ("", "0"):
+        return None
+    path = Path(index_path) if index_path else default_index_path(csv_path)
+    index = _open_fresh(path, csv_path)
+    if index is not None or not compile_missing:
+        return index
+    if not Path(csv_path).exists():
+        raise FileNotFoundError(str(csv_path))
+    try:
+        compile_price_index(csv_path, path)
+    except OSError:
+        return None
+    return _open_fresh(path, csv_path)
+
+
+def load_price_index(csv_path: Union[str, Path]) -> Mapping[str, int]:
+    """market_hash_name -> centavos desde el índice (compilándolo si hace falta) o, si no, desde el CSV."""
+    index = open_price_index(csv_path)
+    return index if index is not None else read_price_table_csv(str(csv_path))
+
+
+__all__ = [
+    "EXTRA_CODE",
+    "PriceIndex",
+    "compile_price_index",
+    "default_index_path",
+    "load_price_index",
+    "open_price_index",
+]
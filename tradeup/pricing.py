@@ -1,30 +1,72 @@
 from __future__ import annotations
 
-import csv
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Dict, Mapping, Optional, Sequence, Tuple
 
 from .models import ContractEntry, Outcome, wear_from_float
 from .csfloat_api import CsfloatClient, build_market_hash_name
+from .price_index import load_price_index
+from .registry import PriceTable
 
 
-def fill_entry_prices(entries: List[ContractEntry], client: CsfloatClient, stattrak: bool) -> None:
-    for e in entries:
-        if e.price_cents is not None:
-            continue
-        wear_name = wear_from_float(e.float_value)
-        mhn = build_market_hash_name(e.name, wear_name, stattrak)
-        price = client.get_lowest_price_cents(mhn, stattrak=stattrak)
-        e.price_cents = price
+DEFAULT_PRICE_WORKERS = 8
+
 
+def resolve_prices(
+    client: CsfloatClient, mhns: Iterable[str], stattrak: bool, max_workers: int = DEFAULT_PRICE_WORKERS
+) -> Dict[str, Optional[int]]:
+    """Precio mínimo de cada market_hash_name único, consultando en paralelo.
 
-def fill_outcome_prices(outcomes: List[Outcome], client: CsfloatClient, stattrak: bool) -> None:
+    A lo sumo `max_workers` consultas en vuelo; cada una pasa por la caché y los
+    reintentos/429 de `CsfloatClient.get_lowest_price_cents`. La latencia es la de
+    la consulta más lenta (por tanda de `max_workers`) en vez de la suma de todas.
+    """
+    unique = list(dict.fromkeys(mhns))
+    if max_workers <= 1 or len(unique) <= 1:
+        return {mhn: client.get_lowest_price_cents(mhn, stattrak=stattrak) for mhn in unique}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as ex:
+        prices = ex.map(lambda mhn: client.get_lowest_price_cents(mhn, stattrak=stattrak), unique)
+        return dict(zip(unique, prices))
+
+
+def fill_prices(
+    entries: Sequence[ContractEntry],
+    outcomes: Sequence[Outcome],
+    client: CsfloatClient,
+    stattrak: bool,
+    max_workers: int = DEFAULT_PRICE_WORKERS,
+) -> None:
+    """Completa en una sola tanda los precios de entradas (sin `PriceCents`) y outcomes.
+
+    Junta los market_hash_name únicos de ambos, los resuelve con `resolve_prices` y
+    reparte los resultados; entradas u outcomes que comparten MHN se consultan una vez.
+    """
+    pending: List[Tuple[object, str]] = []
+    for e in entries:
+        if e.price_cents is None:
+            pending.append((e, build_market_hash_name(e.name, wear_from_float(e.float_value), stattrak)))
     for o in outcomes:
-        mhn = build_market_hash_name(o.name, o.wear_name, stattrak)
-        price = client.get_lowest_price_cents(mhn, stattrak=stattrak)
-        o.price_cents = price
+        pending.append((o, build_market_hash_name(o.name, o.wear_name, stattrak)))
+    if not pending:
+        return
+    prices = resolve_prices(client, (mhn for _, mhn in pending), stattrak, max_workers)
+    for item, mhn in pending:
+        item.price_cents = prices[mhn]  # type: ignore[attr-defined]
+
+
+def fill_entry_prices(
+    entries: List[ContractEntry], client: CsfloatClient, stattrak: bool, max_workers: int = DEFAULT_PRICE_WORKERS
+) -> None:
+    fill_prices(entries, [], client, stattrak, max_workers)
+
+
+def fill_outcome_prices(
+    outcomes: List[Outcome], client: CsfloatClient, stattrak: bool, max_workers: int = DEFAULT_PRICE_WORKERS
+) -> None:
+    fill_prices([], outcomes, client, stattrak, max_workers)
 
 
-def load_local_prices_csv(path: str) -> Dict[str, int]:
+def load_local_prices_csv(path: str) -> Mapping[str, int]:
     """Carga un CSV local de precios y devuelve un mapa {market_hash_name -> price_cents}.
 
     Formatos soportados (encabezados):
@@ -37,56 +79,33 @@ def load_local_prices_csv(path: str) -> Dict[str, int]:
     - Los precios deben estar en centavos.
     - Si se provee "StatTrak", se usará para construir el market_hash_name.
     - El wear debe coincidir con los buckets estándar (p. ej., "Field-Tested").
+    - El mapa es de solo lectura: se lee del índice compilado junto al CSV
+      (`tradeup.price_index`), que se regenera solo cuando el CSV cambia.
     """
-    prices: Dict[str, int] = {}
-    with open(path, "r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        fieldnames = set(reader.fieldnames or [])
-        if {"MarketHashName", "PriceCents"}.issubset(fieldnames):
-            for row in reader:
-                mhn = (row.get("MarketHashName") or "").strip()
-                price_raw = (row.get("PriceCents") or "").strip()
-                if not mhn or not price_raw:
-                    continue
-                try:
-                    prices[mhn] = int(price_raw)
-                except Exception:
-                    continue
-            return prices
-        elif {"Name", "Wear", "PriceCents"}.issubset(fieldnames):
-            for row in reader:
-                name = (row.get("Name") or "").strip()
-                wear = (row.get("Wear") or "").strip()
-                price_raw = (row.get("PriceCents") or "").strip()
-                stattrak_raw = (row.get("StatTrak") or "").strip().lower()
-                stattrak = stattrak_raw in {"1", "true", "t", "yes", "y"}
-                if not name or not wear or not price_raw:
-                    continue
-                try:
-                    price = int(price_raw)
-                except Exception:
-                    continue
-                mhn = build_market_hash_name(name, wear, stattrak)
-                prices[mhn] = price
-            return prices
-        else:
-            raise ValueError(
-                "CSV de precios inválido. Esperado 'MarketHashName,PriceCents' o 'Name,Wear,PriceCents[,StatTrak]'."
-            )
+    return load_price_index(path)
+
 
+def fill_entry_prices_local(entries: List[ContractEntry], prices_by_mhn: Mapping[str, int], stattrak: bool) -> None:
+    """Completa precios de entradas usando un mapa local de market_hash_name -> price_cents.
 
-def fill_entry_prices_local(entries: List[ContractEntry], prices_by_mhn: Dict[str, int], stattrak: bool) -> None:
-    """Completa precios de entradas usando un mapa local de market_hash_name -> price_cents."""
+    Con una `PriceTable` se resuelve por item id, sin construir el market_hash_name.
+    """
+    table = prices_by_mhn if isinstance(prices_by_mhn, PriceTable) else None
     for e in entries:
         if e.price_cents is not None:
             continue
         wear_name = wear_from_float(e.float_value)
-        mhn = build_market_hash_name(e.name, wear_name, stattrak)
-        e.price_cents = prices_by_mhn.get(mhn)
+        if table is not None:
+            e.price_cents = table.price(e.name, wear_name, stattrak)
+        else:
+            e.price_cents = prices_by_mhn.get(build_market_hash_name(e.name, wear_name, stattrak))
 
 
-def fill_outcome_prices_local(outcomes: List[Outcome], prices_by_mhn: Dict[str, int], stattrak: bool) -> None:
+def fill_outcome_prices_local(outcomes: List[Outcome], prices_by_mhn: Mapping[str, int], stattrak: bool) -> None:
     """Completa precios de outcomes usando un mapa local de market_hash_name -> price_cents."""
+    table = prices_by_mhn if isinstance(prices_by_mhn, PriceTable) else None
     for o in outcomes:
-        mhn = build_market_hash_name(o.name, o.wear_name, stattrak)
-        o.price_cents = prices_by_mhn.get(mhn)
+        if table is not None:
+            o.price_cents = table.price(o.name, o.wear_name, stattrak)
+        else:
+            o.price_cents = prices_by_mhn.get(build_market_hash_name(o.name, o.wear_name, stattrak))
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+
+# Token bucket compartido por threads y procesos
+#
+# El estado (tokens disponibles, último refill y pausa global) vive en un archivo chico
+# protegido con un lock exclusivo del sistema operativo (flock / msvcrt.locking), así que
+# todos los procesos que usan el mismo archivo comparten el presupuesto de requests.
+# Un 429 con Retry-After pausa a toda la flota una sola vez (`pause`).
+
+# Variables de entorno con las que `CsfloatClient` lo activa sin cambios en los callers
+ENV_RATE = "CSFLOAT_RATE_LIMIT"  # requests por minuto
+ENV_BURST = "CSFLOAT_RATE_BURST"
+ENV_FILE = "CSFLOAT_RATE_LIMIT_FILE"
+
+_STATE = struct.Struct("<ddd")  # tokens, último refill (epoch), pausado hasta (epoch)
+
+
+class TokenBucket:
+    """Limitador de tasa: `rate_per_minute` requests sostenidas con ráfagas de hasta `burst`.
+
+    Con `path` el estado se comparte entre procesos (archivo + lock del SO); sin `path`
+    solo entre los threads del proceso.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: Optional[float] = None,
+        path: Optional[Union[str, Path]] = None,
+    ) -> None:
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute debe ser > 0")
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1.0, float(burst) if burst is not None else 1.0)
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._state: Tuple[float, float, float] = (self.burst, time.time(), 0.0)
+        self.waited_s = 0.0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch(exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["TokenBucket"]:
+        """Limitador configurado por entorno (`CSFLOAT_RATE_LIMIT` = requests/min), o None."""
+        raw = os.getenv(ENV_RATE)
+        if not raw or float(raw) <= 0:
+            return None
+        burst = os.getenv(ENV_BURST)
+        return cls(float(raw), float(burst) if burst else None, os.getenv(ENV_FILE) or None)
+
+    # -- estado compartido -------------------------------------------------------
+    def _update(self, fn) -> float:
+        """Aplica fn(tokens, last, paused_until, now) -> (estado nuevo, espera) bajo lock."""
+        with self._lock:
+            if self.path is None:
+                state, wait = fn(*self._state, time.time())
+                self._state = state
+                return wait
+            with self.path.open("r+b") as f:
+                _lock_file(f)
+                try:
+                    raw = f.read(_STATE.size)
+                    now = time.time()
+                    current = _STATE.unpack(raw) if len(raw) == _STATE.size else (self.burst, now, 0.0)
+                    state, wait = fn(*current, now)
+                    f.seek(0)
+                    f.write(_STATE.pack(*state))
+                    f.flush()
+                finally:
+                    _unlock_file(f)
+            return wait
+
+    def _take(self, tokens: float, last: float, paused_until: float, now: float):
+        if paused_until > now:
+            return (tokens, last, paused_until), paused_until - now
+        tokens = min(self.burst, tokens + max(0.0, now - max(last, paused_until)) * self.rate)
+        if tokens >= 1.0:
+            return (tokens - 1.0, now, paused_until), 0.0
+        return (tokens, now, paused_until), (1.0 - tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Bloquea hasta obtener un token (o hasta que termine una pausa global)."""
+        while True:
+            wait = self._update(self._take)
+            if wait <= 0:
+                return
+            self.waited_s += wait
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> bool:
+        """Pausa a toda la flota `seconds` (p. ej. Retry-After de un 429).
+
+        Si ya hay una pausa que cubre ese plazo no se extiende: N workers que reciben el
+        mismo 429 pausan una sola vez. Devuelve True si esta llamada movió la pausa.
+        """
+        moved = [False]
+
+        def fn(tokens: float, last: float, paused_until: float, now: float):
+            until = now + max(0.0, seconds)
+            if until > paused_until + 0.5:
+                moved[0] = True
+                # Al reanudar, arrancar sin ráfaga acumulada
+                return (0.0, until, until), 0.0
+            return (tokens, last, paused_until), 0.0
+
+        self._update(fn)
+        return moved[0]
+
+
+def _lock_file(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:  # pragma: no cover - Windows
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, _STATE.size)
+                break
+            except OSError:
+                continue
+    f.seek(0)
+
+
+def _unlock_file(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:  # pragma: no cover - Windows
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, _STATE.size)
+
+
+__all__ = [
+    "ENV_BURST",
+    "ENV_FILE",
+    "ENV_RATE",
+    "TokenBucket",
+]
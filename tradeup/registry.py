@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import csv
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .models import WEAR_BUCKETS
+
+
+# Ids densos de ítems de mercado: (skin, wear, stattrak) -> int
+#   item_id = (name_id * N_WEARS + wear_id) * 2 + stattrak
+# name_id es el índice del nombre de skin en el registro; wear_id el índice en WEAR_BUCKETS.
+
+STATTRAK_PREFIX = "StatTrak™ "
+WEAR_NAMES: Tuple[str, ...] = tuple(name for name, _, _ in WEAR_BUCKETS)
+WEAR_INDEX: Dict[str, int] = {name: i for i, name in enumerate(WEAR_NAMES)}
+N_WEARS = len(WEAR_NAMES)
+
+# Precio ausente en PriceTable
+MISSING_PRICE = -1
+
+
+class ItemRegistry:
+    """Registro de nombres de skin internados y codificación densa de ítems de mercado.
+
+    `encode`/`decode` son O(1) (dict + aritmética). Los nombres nuevos se agregan al
+    final con `intern`, así que los ids existentes no cambian.
+    """
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self.names: List[str] = []
+        self.name_index: Dict[str, int] = {}
+        for n in names:
+            self.intern(n)
+
+    @classmethod
+    def from_catalog(cls, catalog) -> "ItemRegistry":
+        """Registro con los nombres del catálogo (orden alfabético, ids deterministas)."""
+        return cls(sorted({it.name for it in catalog.items}))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def size(self) -> int:
+        """Cantidad de ids posibles (tamaño de una PriceTable sobre este registro)."""
+        return len(self.names) * N_WEARS * 2
+
+    def intern(self, name: str) -> int:
+        idx = self.name_index.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.names.append(name)
+            self.name_index[name] = idx
+        return idx
+
+    @staticmethod
+    def item_id(name_id: int, wear_id: int, stattrak: bool) -> int:
+        return (name_id * N_WEARS + wear_id) * 2 + (1 if stattrak else 0)
+
+    def encode(self, name: str, wear_name: str, stattrak: bool) -> Optional[int]:
+        """Id de (skin, wear, stattrak); None si el nombre no está registrado o el wear es Unknown."""
+        n = self.name_index.get(name)
+        w = WEAR_INDEX.get(wear_name)
+        if n is None or w is None:
+            return None
+        return (n * N_WEARS + w) * 2 + (1 if stattrak else 0)
+
+    def decode(self, item_id: int) -> Tuple[str, str, bool]:
+        """(name, wear_name, stattrak) de un id."""
+        rest, st = divmod(item_id, 2)
+        n, w = divmod(rest, N_WEARS)
+        return self.names[n], WEAR_NAMES[w], bool(st)
+
+    def mhn(self, item_id: int) -> str:
+        """market_hash_name de un id (mismo formato que `build_market_hash_name`)."""
+        name, wear_name, st = self.decode(item_id)
+        return f"{STATTRAK_PREFIX if st else ''}{name} ({wear_name})"
+
+    def parse_mhn(self, mhn: str, intern: bool = False) -> Optional[int]:
+        """Id de un market_hash_name canónico; None si no tiene formato "Name (Wear)" conocido."""
+        st = mhn.startswith(STATTRAK_PREFIX)
+        s = mhn[len(STATTRAK_PREFIX) :] if st else mhn
+        if not s.endswith(")"):
+            return None
+        name, sep, wear_name = s[:-1].rpartition(" (")
+        w = WEAR_INDEX.get(wear_name)
+        if not sep or w is None:
+            return None
+        n = self.intern(name) if intern else self.name_index.get(name)
+        if n is None:
+            return None
+        return (n * N_WEARS + w) * 2 + (1 if st else 0)
+
+
+class PriceTable(Mapping[str, int]):
+    """Precios en centavos en un array plano indexado por item id (`MISSING_PRICE` = sin precio).
+
+    Implementa la interfaz de `Mapping[str, int]` (market_hash_name -> centavos) para
+    poder reemplazar al dict de `load_local_prices_csv`; los caminos calientes usan
+    `price` / `get_id` sin construir strings.
+    """
+
+    def __init__(self, registry: ItemRegistry, prices: Optional[np.ndarray] = None) -> None:
+        self.registry = registry
+        self.prices = prices if prices is not None else np.full(registry.size, MISSING_PRICE, dtype=np.int64)
+        # MHN que no respetan el formato "Name (Wear)": se conservan tal cual
+        self.extra: Dict[str, int] = {}
+        self._count = int((self.prices != MISSING_PRICE).sum())
+
+    def _ensure_size(self) -> None:
+        size = self.registry.size
+        if len(self.prices) < size:
+            grown = np.full(max(size, 2 * len(self.prices)), MISSING_PRICE, dtype=np.int64)
+            grown[: len(self.prices)] = self.prices
+            self.prices = grown
+
+    @classmethod
+    def from_mapping(cls, prices_by_mhn: Mapping[str, int], registry: Optional[ItemRegistry] = None) -> "PriceTable":
+        table = cls(registry or ItemRegistry())
+        for mhn, cents in prices_by_mhn.items():
+            table.set_mhn(mhn, int(cents))
+        return table
+
+    # -- escritura -------------------------------------------------------------
+    def set_id(self, item_id: int, cents: int) -> None:
+        self._ensure_size()
+        if self.prices[item_id] == MISSING_PRICE:
+            self._count += 1
+        self.prices[item_id] = cents
+
+    def set_ids(self, item_ids: np.ndarray, cents: np.ndarray) -> None:
+        """Asignación vectorizada de precios a ids (sin repetidos)."""
+        self._ensure_size()
+        ids = np.asarray(item_ids, dtype=np.intp)
+        self._count += int((self.prices[ids] == MISSING_PRICE).sum())
+        self.prices[ids] = cents
+
+    def set_mhn(self, mhn: str, cents: int) -> None:
+        item_id = self.registry.parse_mhn(mhn, intern=True)
+        if item_id is None:
+            self.extra[mhn] = cents
+        else:
+            self.set_id(item_id, cents)
+
+    # -- lectura ---------------------------------------------------------------
+    def get_id(self, item_id: Optional[int]) -> Optional[int]:
+        if item_id is None or item_id >= len(self.prices):
+            return None
+        v = int(self.prices[item_id])
+        return None if v == MISSING_PRICE else v
+
+    def price(self, name: str, wear_name: str, stattrak: bool) -> Optional[int]:
+        """Precio de (skin, wear, stattrak) sin construir el market_hash_name."""
+        return self.get_id(self.registry.encode(name, wear_name, stattrak))
+
+    def ids_prices(self, item_ids: np.ndarray) -> np.ndarray:
+        """Precios vectorizados (float, NaN si falta) para un array de ids."""
+        ids = np.asarray(item_ids, dtype=np.intp)
+        out = np.full(ids.shape, np.nan)
+        ok = (ids >= 0) & (ids < len(self.prices))
+        vals = self.prices[ids[ok]]
+        out[ok] = np.where(vals == MISSING_PRICE, np.nan, vals)
+        return out
+
+    # -- Mapping[str, int] -----------------------------------------------------
+    def __getitem__(self, mhn: str) -> int:
+        v = self.get_id(self.registry.parse_mhn(mhn))
+        if v is None:
+            return self.extra[mhn]
+        return v
+
+    def __iter__(self) -> Iterator[str]:
+        for item_id in np.flatnonzero(self.prices != MISSING_PRICE):
+            yield self.registry.mhn(int(item_id))
+        yield from self.extra
+
+    def __len__(self) -> int:
+        return self._count + len(self.extra)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"PriceTable(names={len(self.registry)}, prices={len(self)})"
+
+
+def load_price_table(path: str, registry: Optional[ItemRegistry] = None) -> PriceTable:
+    """Carga un CSV local de precios en una PriceTable.
+
+    Usa el índice binario compilado junto al CSV (`tradeup.price_index`, se crea o se
+    actualiza solo); si no se puede usar, lee el CSV con `read_price_table_csv`.
+    """
+    from .price_index import open_price_index  # price_index depende de este módulo
+
+    index = open_price_index(path)
+    if index is not None:
+        return index.to_table(registry)
+    return read_price_table_csv(path, registry)
+
+
+def read_price_table_csv(path: str, registry: Optional[ItemRegistry] = None) -> PriceTable:
+    """Parsea un CSV local de precios ('MarketHashName,PriceCents' o 'Name,Wear,PriceCents[,StatTrak]')."""
+    table = PriceTable(registry or ItemRegistry())
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        fieldnames = set(reader.fieldnames or [])
+        if {"MarketHashName", "PriceCents"}.issubset(fieldnames):
+            for row in reader:
+                mhn = (row.get("MarketHashName") or "").strip()
+                price_raw = (row.get("PriceCents") or "").strip()
+                if not mhn or not price_raw:
+                    continue
+                try:
+                    table.set_mhn(mhn, int(price_raw))
+                except Exception:
+                    continue
+        elif {"Name", "Wear", "PriceCents"}.issubset(fieldnames):
+            registry = table.registry
+            for row in reader:
+                name = (row.get("Name") or "").strip()
+                wear = (row.get("Wear") or "").strip()
+                price_raw = (row.get("PriceCents") or "").strip()
+                stattrak = (row.get("StatTrak") or "").strip().lower() in {"1", "true", "t", "yes", "y"}
+                if not name or not wear or not price_raw:
+                    continue
+                try:
+                    price = int(price_raw)
+                except Exception:
+                    continue
+                w = WEAR_INDEX.get(wear)
+                if w is None:
+                    table.extra[f"{STATTRAK_PREFIX if stattrak else ''}{name} ({wear})"] = price
+                else:
+                    table.set_id(registry.item_id(registry.intern(name), w, stattrak), price)
+        else:
+            raise ValueError(
+                "CSV de precios inválido. Esperado 'MarketHashName,PriceCents' o 'Name,Wear,PriceCents[,StatTrak]'."
+            )
+    return table
+
+
+__all__ = [
+    "ItemRegistry",
+    "MISSING_PRICE",
+    "N_WEARS",
+    "PriceTable",
+    "WEAR_INDEX",
+    "WEAR_NAMES",
+    "load_price_table",
+    "read_price_table_csv",
+]